@@ -38,6 +38,13 @@ interface AutoupdateFormat {
     all_data: boolean;
 }
 
+/**
+ * A part of all data, that the server sends before an autoupdate with all_data.
+ */
+interface AutoupdateChunk {
+    [collectionString: string]: object[];
+}
+
 /**
  * Handles the initial update and automatic updates using the {@link WebsocketService}
  * Incoming objects, usually BaseModels, will be saved in the dataStore (`this.DS`)
@@ -49,6 +56,11 @@ interface AutoupdateFormat {
     providedIn: 'root'
 })
 export class AutoupdateService extends OpenSlidesComponent {
+    /**
+     * The models of the received chunks. They are stored with the next autoupdate.
+     */
+    private chunkElements: BaseModel[] = [];
+
     /**
      * Constructor to create the AutoupdateService. Calls the constructor of the parent class.
      * @param websocketService
@@ -61,9 +73,29 @@ export class AutoupdateService extends OpenSlidesComponent {
         private modelMapper: CollectionStringModelMapperService
     ) {
         super();
+        this.websocketService.getOberservable<AutoupdateChunk>('autoupdateChunk').subscribe(chunk => {
+            this.storeChunk(chunk);
+        });
         this.websocketService.getOberservable<AutoupdateFormat>('autoupdate').subscribe(response => {
             this.storeResponse(response);
         });
+        // The server skipped autoupdates, because the client was too slow.
+        this.websocketService.getOberservable<{ change_id: number }>('resync').subscribe(() => {
+            this.requestChanges();
+        });
+    }
+
+    /**
+     * Collects the models of a chunk. The server sends all data in chunks, if
+     * they are requested with stream. The following autoupdate marks the end
+     * of the data.
+     *
+     * @param chunk The chunk
+     */
+    private storeChunk(chunk: AutoupdateChunk): void {
+        Object.keys(chunk).forEach(collection => {
+            this.chunkElements.push(...this.mapObjectsToBaseModels(collection, chunk[collection]));
+        });
     }
 
     /**
@@ -91,7 +123,8 @@ export class AutoupdateService extends OpenSlidesComponent {
      * @param autoupdate The autoupdate
      */
     private async storeAllData(autoupdate: AutoupdateFormat): Promise<void> {
-        let elements: BaseModel[] = [];
+        let elements: BaseModel[] = this.chunkElements;
+        this.chunkElements = [];
         Object.keys(autoupdate.changed).forEach(collection => {
             elements = elements.concat(this.mapObjectsToBaseModels(collection, autoupdate.changed[collection]));
         });
@@ -150,6 +183,6 @@ export class AutoupdateService extends OpenSlidesComponent {
      */
     public requestChanges(): void {
         console.log('requesting changed objects with DS max change id', this.DS.maxChangeId + 1);
-        this.websocketService.send('getElements', { change_id: this.DS.maxChangeId + 1 });
+        this.websocketService.send('getElements', { change_id: this.DS.maxChangeId + 1, stream: true });
     }
 }
@@ -99,6 +99,8 @@ export class WebsocketService {
 
         if (options.changeId !== undefined) {
             queryParams.change_id = options.changeId;
+            // Receive all data in chunks, see AutoupdateService.
+            queryParams.stream = true;
         }
 
         // Create the websocket
@@ -52,6 +52,7 @@ export class HistoryListComponent extends ListViewBaseComponent<ViewHistory> imp
         this.repo.getViewModelListObservable().subscribe(history => {
             this.sortAndPublish(history);
         });
+        this.repo.loadHistory();
     }
 
     /**
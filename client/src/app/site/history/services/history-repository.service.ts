@@ -54,11 +54,23 @@ export class HistoryRepositoryService extends BaseRepository<ViewHistory, Histor
     }
 
     /**
-     * Sends a post-request to delete history objects
+     * Loads the history from the server into the DataStore. The history is not
+     * part of the autoupdate, so it has to be requested explicitly.
+     */
+    public async loadHistory(): Promise<void> {
+        const restPath = 'rest/core/history/';
+        const history = await this.httpService.get<History[]>(restPath);
+        await this.DS.add(history.map(entry => new History(entry)));
+    }
+
+    /**
+     * Sends a post-request to delete history objects and loads the new history
      */
     public async delete(): Promise<void> {
         const restPath = 'rest/core/history/clear_history/';
         await this.httpService.post(restPath);
+        await this.DS.remove('core/history', this.DS.getAll(History).map(history => history.id));
+        await this.loadHistory();
     }
 
     /**
@@ -39,6 +39,7 @@ class CoreAppConfig(AppConfig):
             GetElementsWebsocketClientMessage,
             AutoupdateWebsocketClientMessage,
             ListenToProjectors,
+            GetHistoryWebsocketClientMessage,
         )
         from ..utils.access_permissions import required_user
         from ..utils.cache import element_cache
@@ -113,6 +114,7 @@ class CoreAppConfig(AppConfig):
         register_client_message(GetElementsWebsocketClientMessage())
         register_client_message(AutoupdateWebsocketClientMessage())
         register_client_message(ListenToProjectors())
+        register_client_message(GetHistoryWebsocketClientMessage())
 
         # register required_users
         required_user.add_collection_string(
@@ -128,6 +130,9 @@ class CoreAppConfig(AppConfig):
         """
         Yields all Cachables required on startup i. e. opening the websocket
         connection.
+
+        The history is not cached. Only admins can see it and it is loaded
+        from the database, when it is requested.
         """
         for model_name in (
             "Projector",
@@ -136,7 +141,6 @@ class CoreAppConfig(AppConfig):
             "ProjectorMessage",
             "Countdown",
             "ConfigStore",
-            "History",
         ):
             yield self.get_model(model_name)
 
@@ -69,8 +69,9 @@ class ConfigHandler:
         before this is called.
         """
         self.key_to_id = {}
-        all_data = await element_cache.get_all_full_data()
-        elements = all_data[self.get_collection_string()]
+        elements = await element_cache.get_collection_full_data(
+            self.get_collection_string()
+        )
         for element in elements:
             self.key_to_id[element["key"]] = element["id"]
 
@@ -0,0 +1,108 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:35
+
+import json
+from typing import Any, Dict
+
+import django.db.models.deletion
+import jsonfield.encoder
+import jsonfield.fields
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+from openslides.utils.utils import apply_json_diff, get_json_diff
+
+
+# A diff is only saved, if it is smaller than this part of the full_data.
+MAX_DIFF_RATIO = 0.5
+
+
+def compress_history(apps, schema_editor):
+    """
+    Replaces the full_data of the existing history entries with the
+    difference to the last snapshot of the element, if the difference is small
+    enough.
+    """
+    History = apps.get_model("core", "History")
+    HistoryData = apps.get_model("core", "HistoryData")
+    snapshots: Dict[str, Any] = {}
+    for history in (
+        History.objects.select_related("full_data")
+        .order_by("element_id", "id")
+        .iterator()
+    ):
+        data = history.full_data
+        snapshot = snapshots.get(history.element_id)
+        if snapshot is None or snapshot.full_data is None or data.full_data is None:
+            snapshots[history.element_id] = data
+            continue
+        diff = get_json_diff(snapshot.full_data, data.full_data)
+        if len(json.dumps(diff, cls=DjangoJSONEncoder)) > MAX_DIFF_RATIO * len(
+            json.dumps(data.full_data, cls=DjangoJSONEncoder)
+        ):
+            snapshots[history.element_id] = data
+            continue
+        HistoryData.objects.filter(pk=data.pk).update(
+            full_data=None, diff=diff, base=snapshot
+        )
+
+
+def expand_history(apps, schema_editor):
+    """
+    Saves the full_data of all history entries again.
+    """
+    HistoryData = apps.get_model("core", "HistoryData")
+    for data in (
+        HistoryData.objects.filter(base__isnull=False).select_related("base").iterator()
+    ):
+        HistoryData.objects.filter(pk=data.pk).update(
+            full_data=apply_json_diff(data.base.full_data, data.diff),
+            diff=None,
+            base=None,
+        )
+    # The old field does not allow NULL. Deleted elements were saved as JSON.
+    HistoryData.objects.filter(full_data__isnull=True).update(
+        full_data=models.Value("null")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("core", "0011_auto_20190119_0958")]
+
+    operations = [
+        migrations.AddField(
+            model_name="historydata",
+            name="base",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="core.HistoryData",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historydata",
+            name="diff",
+            field=jsonfield.fields.JSONField(
+                dump_kwargs={
+                    "cls": jsonfield.encoder.JSONEncoder,
+                    "separators": (",", ":"),
+                },
+                load_kwargs={},
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historydata",
+            name="full_data",
+            field=jsonfield.fields.JSONField(
+                dump_kwargs={
+                    "cls": jsonfield.encoder.JSONEncoder,
+                    "separators": (",", ":"),
+                },
+                load_kwargs={},
+                null=True,
+            ),
+        ),
+        migrations.RunPython(compress_history, expand_history),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_history_diff'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='history',
+            name='element_id',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='history',
+            name='now',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -1,12 +1,17 @@
+import itertools
+import json
+
 from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
 from django.utils.timezone import now
 from jsonfield import JSONField
 
 from ..utils.autoupdate import Element
 from ..utils.cache import element_cache, get_element_id
-from ..utils.models import RESTModelMixin
+from ..utils.models import RESTModelMixin, bulk_create_with_pks
+from ..utils.utils import apply_json_diff, get_json_diff
 from .access_permissions import (
     ChatMessageAccessPermissions,
     ConfigAccessPermissions,
@@ -247,13 +252,74 @@ class HistoryData(models.Model):
 
     This is not a RESTModel. It is not cachable and can only be reached by a
     special viewset.
+
+    The data is either a snapshot in full_data or the difference to the
+    snapshot base in diff.
     """
 
-    full_data = JSONField()
+    full_data = JSONField(null=True)
+
+    diff = JSONField(null=True)
+
+    base = models.ForeignKey(
+        "self", null=True, on_delete=models.CASCADE, related_name="+"
+    )
+
+    # A diff is only saved, if it is smaller than this part of the full_data.
+    max_diff_ratio = 0.5
 
     class Meta:
         default_permissions = ()
 
+    @classmethod
+    def get_diff(cls, snapshot, full_data):
+        """
+        Returns the diff from the snapshot to the full_data or None, if a new
+        snapshot should be saved.
+        """
+        if snapshot is None or full_data is None:
+            return None
+        diff = get_json_diff(snapshot, full_data)
+        if len(json.dumps(diff, cls=DjangoJSONEncoder)) > cls.max_diff_ratio * len(
+            json.dumps(full_data, cls=DjangoJSONEncoder)
+        ):
+            return None
+        return diff
+
+    def get_full_data(self, snapshots=None):
+        """
+        Returns the full_data of the element.
+
+        To read many entries, use a dict as snapshots. It is used as cache
+        from the ids to the full_data of the snapshots, so each snapshot is
+        only loaded once, if the entries are read in the order of their ids.
+        """
+        if self.base_id is None:
+            if snapshots is not None:
+                snapshots[self.pk] = self.full_data
+            return self.full_data
+        if snapshots is None:
+            return apply_json_diff(self.base.full_data, self.diff)
+        if self.base_id not in snapshots:
+            snapshots[self.base_id] = self.base.full_data
+        return apply_json_diff(snapshots[self.base_id], self.diff)
+
+    @classmethod
+    def load_snapshots(cls, data_instances, snapshots):
+        """
+        Loads the snapshots of the data_instances into the dict snapshots,
+        that are not there yet, with one query.
+        """
+        missing_ids = {
+            data.base_id
+            for data in data_instances
+            if data.base_id is not None and data.base_id not in snapshots
+        }
+        if missing_ids:
+            snapshots.update(
+                cls.objects.filter(id__in=missing_ids).values_list("id", "full_data")
+            )
+
 
 class HistoryManager(models.Manager):
     """
@@ -263,35 +329,122 @@ class HistoryManager(models.Manager):
     def add_elements(self, elements):
         """
         Method to add elements to the history. This does not trigger autoupdate.
+
+        The history data and the history instances are inserted with one
+        bulk_create each. The data is saved as difference to the last
+        snapshot of the element, if the difference is small enough.
         """
         with transaction.atomic():
-            instances = []
             history_time = now()
-            for element in elements:
-                if (
-                    element["disable_history"]
-                    or element["collection_string"]
-                    == self.model.get_collection_string()
-                ):
-                    # Do not update history for history elements itself or if history is disabled.
-                    continue
-                # HistoryData is not a root rest element so there is no autoupdate and not history saving here.
-                data = HistoryData.objects.create(full_data=element["full_data"])
-                instance = self.model(
-                    element_id=get_element_id(
-                        element["collection_string"], element["id"]
-                    ),
-                    now=history_time,
-                    information=element["information"],
-                    user_id=element["user_id"],
-                    full_data=data,
+            history_elements = [
+                element
+                for element in elements
+                # Do not update history for history elements itself or if history is disabled.
+                if not element["disable_history"]
+                and element["collection_string"] != self.model.get_collection_string()
+            ]
+            element_ids = [
+                get_element_id(element["collection_string"], element["id"])
+                for element in history_elements
+            ]
+            snapshots = self.get_snapshots(set(element_ids))
+
+            # HistoryData is not a root rest element so there is no autoupdate and not history saving here.
+            data_instances = []
+            new_snapshots = []
+            for element_id, element in zip(element_ids, history_elements):
+                snapshot = snapshots.get(element_id)
+                diff = HistoryData.get_diff(
+                    None if snapshot is None else snapshot.full_data,
+                    element["full_data"],
                 )
-                instance.save(
-                    skip_autoupdate=True
-                )  # Skip autoupdate and of course history saving.
-                instances.append(instance)
+                if diff is None:
+                    data = HistoryData(full_data=element["full_data"])
+                    snapshots[element_id] = data
+                    new_snapshots.append(data)
+                else:
+                    data = HistoryData(full_data=None, diff=diff, base=snapshot)
+                data_instances.append(data)
+
+            # Create the snapshots first, so the diffs can reference them.
+            bulk_create_with_pks(HistoryData, new_snapshots)
+            diffs = [data for data in data_instances if data.base is not None]
+            for data in diffs:
+                data.base_id = data.base.pk
+            bulk_create_with_pks(HistoryData, diffs)
+
+            # Skip autoupdate and of course history saving.
+            instances = bulk_create_with_pks(
+                self.model,
+                [
+                    self.model(
+                        element_id=element_id,
+                        now=history_time,
+                        information=element["information"],
+                        user_id=element["user_id"],
+                        full_data=data,
+                    )
+                    for element_id, element, data in zip(
+                        element_ids, history_elements, data_instances
+                    )
+                ],
+            )
         return instances
 
+    def get_snapshots(self, element_ids):
+        """
+        Returns the snapshot of the newest history entry for each element_id.
+        """
+        snapshots = {}
+        element_ids = list(element_ids)
+        # Split the element_ids, so the queries do not have too many
+        # parameters.
+        for start in range(0, len(element_ids), 500):
+            end = start + 500
+            newest_ids = (
+                self.filter(element_id__in=element_ids[start:end])
+                .values("element_id")
+                .annotate(newest_id=models.Max("id"))
+                .values_list("newest_id", flat=True)
+            )
+            for instance in self.filter(id__in=newest_ids).select_related(
+                "full_data", "full_data__base"
+            ):
+                data = instance.full_data
+                snapshots[instance.element_id] = (
+                    data if data.base is None else data.base
+                )
+        return snapshots
+
+    def filter_entries(self, element_id=None, cursor=None):
+        """
+        Returns the queryset of the history entries ordered by their ids.
+
+        Use element_id to get only the entries of one element and cursor to
+        get only the entries after the entry with this id.
+        """
+        queryset = self.order_by("id")
+        if element_id:
+            queryset = queryset.filter(element_id=element_id)
+        if cursor:
+            queryset = queryset.filter(id__gt=cursor)
+        return queryset
+
+    def iter_chunks(self, queryset, chunk_size):
+        """
+        Yields the instances of the queryset in lists of at most chunk_size
+        instances.
+
+        The rows are read with a server-side cursor, if the database supports
+        it, so the history is never loaded into memory at once.
+        """
+        instances = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(itertools.islice(instances, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+
     def build_history(self):
         """
         Method to add all cachables to the history.
@@ -329,9 +482,9 @@ class History(RESTModelMixin, models.Model):
 
     objects = HistoryManager()
 
-    element_id = models.CharField(max_length=255)
+    element_id = models.CharField(max_length=255, db_index=True)
 
-    now = models.DateTimeField()
+    now = models.DateTimeField(db_index=True)
 
     information = models.CharField(max_length=255)
 
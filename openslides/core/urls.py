@@ -7,4 +7,9 @@ urlpatterns = [
     url(r"^servertime/$", views.ServerTime.as_view(), name="core_servertime"),
     url(r"^version/$", views.VersionView.as_view(), name="core_version"),
     url(r"^history/$", views.HistoryView.as_view(), name="core_history"),
+    url(
+        r"^websocket_metrics/$",
+        views.WebsocketMetricsView.as_view(),
+        name="core_websocket_metrics",
+    ),
 ]
@@ -1,22 +1,26 @@
 import datetime
+import json
 import os
 from typing import Any, Dict, List
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.contrib.staticfiles import finders
 from django.contrib.staticfiles.views import serve
 from django.db.models import F
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.utils.timezone import now
 from django.views import static
 from django.views.generic.base import View
 from mypy_extensions import TypedDict
+from rest_framework.utils.encoders import JSONEncoder
 
 from .. import __license__ as license, __url__ as url, __version__ as version
 from ..utils import views as utils_views
 from ..utils.arguments import arguments
 from ..utils.auth import GROUP_ADMIN_PK, anonymous_is_enabled, has_perm, in_some_groups
 from ..utils.autoupdate import inform_changed_data, inform_deleted_data
+from ..utils.cache import element_cache
 from ..utils.plugins import (
     get_plugin_description,
     get_plugin_license,
@@ -34,6 +38,7 @@ from ..utils.rest_api import (
     detail_route,
     list_route,
 )
+from ..utils.websocket import send_queue_metrics
 from .access_permissions import (
     ChatMessageAccessPermissions,
     ConfigAccessPermissions,
@@ -477,11 +482,110 @@ class CountdownViewSet(ModelViewSet):
         return result
 
 
-class HistoryViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class HistoryStreamMixin:
+    """
+    Mixin for views, that stream history entries.
+
+    Use query parameter element_id to get only the entries of one element.
+
+    Use query parameter limit to get at most this number of entries. Then the
+    response is an object with the entries in "results" and the cursor for
+    the next entries in "next_cursor". Use it as query parameter cursor to
+    get the next entries. "next_cursor" is None, if there are no more entries.
+
+    The response is streamed, so the entries are never all in memory.
+    """
+
+    # Number of entries that are loaded from the database at once.
+    chunk_size = 500
+
+    def get_entries(self, queryset):
+        """
+        Yields the id and the serialized entry of each instance in queryset.
+        """
+        raise NotImplementedError("HistoryStreamMixin needs get_entries().")
+
+    def get_integer_param(self, name):
+        """
+        Returns the query parameter name as integer or None, if it is not set.
+        """
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError(
+                {"detail": f"Invalid input. {name} should be an integer."}
+            )
+
+    def get_entries_queryset(self):
+        """
+        Returns the history entries filtered by the query parameters
+        element_id and cursor.
+        """
+        return History.objects.filter_entries(
+            element_id=self.request.query_params.get("element_id"),
+            cursor=self.get_integer_param("cursor"),
+        )
+
+    def get_streaming_response(self, queryset):
+        """
+        Returns the streamed entries of the queryset as list or, with the
+        query parameter limit, as one page.
+        """
+        limit = self.get_integer_param("limit")
+        if limit is None:
+            content = self.stream_entries(queryset)
+        else:
+            if limit < 1:
+                raise ValidationError(
+                    {"detail": "Invalid input. Limit has to be positive."}
+                )
+            content = self.stream_page(queryset, limit)
+        return StreamingHttpResponse(content, content_type="application/json")
+
+    def stream_entries(self, queryset):
+        """
+        Yields the JSON list of the entries.
+        """
+        yield "["
+        separator = ""
+        for __, entry in self.get_entries(queryset):
+            yield separator + json.dumps(entry, cls=JSONEncoder)
+            separator = ","
+        yield "]"
+
+    def stream_page(self, queryset, limit):
+        """
+        Yields the JSON object with at most limit entries and the cursor of
+        the next page.
+        """
+        # Get one more entry to know, if there is a next page.
+        entries = self.get_entries(queryset[: limit + 1])
+        yield '{"results":['
+        next_cursor = None
+        last_id = None
+        for index, (id, entry) in enumerate(entries):
+            if index == limit:
+                next_cursor = last_id
+                break
+            yield ("," if index else "") + json.dumps(entry, cls=JSONEncoder)
+            last_id = id
+        yield f'],"next_cursor":{json.dumps(next_cursor)}}}'
+
+
+class HistoryViewSet(
+    HistoryStreamMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet
+):
     """
     API endpoint for History.
 
     There are the following views: list, retrieve, clear_history.
+
+    The history is not cached. The list is streamed from the database and
+    supports the query parameters element_id, cursor and limit. See
+    HistoryStreamMixin.
     """
 
     access_permissions = HistoryAccessPermissions()
@@ -497,26 +601,40 @@ class HistoryViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
             result = False
         return result
 
+    def list(self, request, *args, **kwargs):
+        """
+        Streams the history entries from the database.
+        """
+        return self.get_streaming_response(self.get_entries_queryset())
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Returns one history entry from the database.
+        """
+        try:
+            instance = History.objects.get(pk=int(self.kwargs["pk"]))
+        except (ValueError, History.DoesNotExist):
+            raise Http404
+        return Response(instance.get_full_data())
+
+    def get_entries(self, queryset):
+        """
+        Yields the entries without their full_data like the HistorySerializer.
+        """
+        for chunk in History.objects.iter_chunks(queryset, self.chunk_size):
+            for instance in chunk:
+                yield instance.id, instance.get_full_data()
+
     @list_route(methods=["post"])
     def clear_history(self, request):
         """
         Deletes and rebuilds the history.
         """
-        # Collect all history objects with their collection_string and id.
-        args = []
-        for history_obj in History.objects.all():
-            args.append((history_obj.get_collection_string(), history_obj.pk))
-
         # Delete history data and history (via CASCADE)
         HistoryData.objects.all().delete()
 
-        # Trigger autoupdate.
-        if args:
-            inform_deleted_data(args)
-
         # Rebuild history.
-        history_instances = History.objects.build_history()
-        inform_changed_data(history_instances)
+        History.objects.build_history()
 
         # Setup response.
         return Response({"detail": "History was deleted successfully."})
@@ -574,43 +692,76 @@ class VersionView(utils_views.APIView):
         return result
 
 
-class HistoryView(utils_views.APIView):
+class WebsocketMetricsView(utils_views.APIView):
+    """
+    Returns metrics about the send queues of the websocket connections of
+    this process and the size of the change_id log of the element cache.
+    Only for admins.
+    """
+
+    http_method_names = ["get"]
+
+    def get_context_data(self, **context):
+        if not in_some_groups(self.request.user.pk or 0, [GROUP_ADMIN_PK]):
+            self.permission_denied(self.request)
+        return {
+            **send_queue_metrics.get_data(),
+            "change_id_log_size": async_to_sync(element_cache.get_change_id_log_size)(),
+        }
+
+
+class HistoryView(HistoryStreamMixin, utils_views.APIView):
     """
     View to retrieve the history data of OpenSlides.
 
     Use query paramter timestamp (UNIX timestamp) to get all elements from begin
-    until (including) this timestamp.
+    until (including) this timestamp. Use from_timestamp to get only the
+    elements since (including) this timestamp. The query parameters
+    element_id, cursor and limit are described in HistoryStreamMixin.
     """
 
     http_method_names = ["get"]
 
-    def get_context_data(self, **context):
+    def get(self, request, *args, **kwargs):
         """
-        Checks if user is in admin group. If yes all history data until
-        (including) timestamp are added to the response data.
+        Checks if user is in admin group. If yes the history data is streamed.
         """
         if not in_some_groups(self.request.user.pk or 0, [GROUP_ADMIN_PK]):
             self.permission_denied(self.request)
-        try:
-            timestamp = int(self.request.query_params.get("timestamp", 0))
-        except ValueError:
-            raise ValidationError(
-                {"detail": "Invalid input. Timestamp  should be an integer."}
-            )
-        data = []
-        queryset = History.objects.select_related("full_data")
+
+        queryset = self.get_entries_queryset().select_related("full_data")
+        timestamp = self.get_integer_param("timestamp")
         if timestamp:
             queryset = queryset.filter(
-                now__lte=datetime.datetime.fromtimestamp(timestamp)
+                now__lte=datetime.datetime.fromtimestamp(
+                    timestamp, datetime.timezone.utc
+                )
             )
-        for instance in queryset:
-            data.append(
-                {
-                    "full_data": instance.full_data.full_data,
+        from_timestamp = self.get_integer_param("from_timestamp")
+        if from_timestamp:
+            queryset = queryset.filter(
+                now__gte=datetime.datetime.fromtimestamp(
+                    from_timestamp, datetime.timezone.utc
+                )
+            )
+        return self.get_streaming_response(queryset)
+
+    def get_entries(self, queryset):
+        """
+        Yields the entries with their full_data.
+
+        The missing snapshots of each chunk are loaded with one query.
+        """
+        snapshots: Dict[int, Any] = {}
+        for chunk in History.objects.iter_chunks(queryset, self.chunk_size):
+            HistoryData.load_snapshots(
+                [instance.full_data for instance in chunk], snapshots
+            )
+            for instance in chunk:
+                yield instance.id, {
+                    "full_data": instance.full_data.get_full_data(snapshots),
                     "element_id": instance.element_id,
                     "timestamp": instance.now.timestamp(),
                     "information": instance.information,
-                    "user_id": instance.user.pk if instance.user else None,
+                    "user_id": instance.user_id,
                 }
-            )
-        return data
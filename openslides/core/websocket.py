@@ -1,12 +1,17 @@
-from typing import Any
+from typing import Any, Dict, List, Optional
+
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
 
 from ..utils.constants import get_constants
-from ..utils.projector import get_projectot_data
+from ..utils.projector import get_projector_group_name, get_projectot_data
 from ..utils.websocket import (
     BaseWebsocketClientMessage,
     ProtocollAsyncJsonWebsocketConsumer,
-    get_element_data,
+    get_user_group_name,
+    send_element_data,
 )
+from .models import History
 
 
 class NotifyWebsocketClientMessage(BaseWebsocketClientMessage):
@@ -23,7 +28,7 @@ class NotifyWebsocketClientMessage(BaseWebsocketClientMessage):
         "properties": {
             "name": {"description": "The name of the notify message", "type": "string"},
             "content": {"description": "The actual content of this message."},
-            "reply_channels": {
+            "replyChannels": {
                 "description": "A list of channels to send this message to.",
                 "type": "array",
                 "items": {"type": "string"},
@@ -48,15 +53,36 @@ class NotifyWebsocketClientMessage(BaseWebsocketClientMessage):
     async def receive_content(
         self, consumer: "ProtocollAsyncJsonWebsocketConsumer", content: Any, id: str
     ) -> None:
-        await consumer.channel_layer.group_send(
-            "site",
-            {
-                "type": "send_notify",
-                "incomming": content,
-                "senderChannelName": consumer.channel_name,
-                "senderUserId": consumer.scope["user"]["id"],
-            },
-        )
+        """
+        Sends the message only to the groups of the users and to the reply
+        channels. If users is True or if there are no users and no reply
+        channels, the message is sent to all clients.
+        """
+        message = {
+            "type": "send_notify",
+            "incomming": content,
+            "senderChannelName": consumer.channel_name,
+            "senderUserId": consumer.scope["user"]["id"],
+        }
+        users = content.get("users")
+        reply_channels = content.get("replyChannels")
+        if users is True or (users is None and reply_channels is None):
+            await consumer.channel_layer.group_send("site", message)
+            return
+
+        for user_id in set(users or []):
+            await consumer.channel_layer.group_send(
+                get_user_group_name(user_id), message
+            )
+        for channel_name in set(reply_channels or []):
+            try:
+                await consumer.channel_layer.send(
+                    channel_name, {**message, "replyChannel": True}
+                )
+            except (TypeError, ChannelFull):
+                # The channel name is invalid or the channel does not exist
+                # anymore.
+                pass
 
 
 class ConstantsWebsocketClientMessage(BaseWebsocketClientMessage):
@@ -89,7 +115,9 @@ class GetElementsWebsocketClientMessage(BaseWebsocketClientMessage):
         "type": "object",
         "properties": {
             # change_id is not required
-            "change_id": {"type": "integer"}
+            "change_id": {"type": "integer"},
+            # Send all data in chunks. See send_element_data().
+            "stream": {"type": "boolean"},
         },
     }
 
@@ -98,15 +126,14 @@ class GetElementsWebsocketClientMessage(BaseWebsocketClientMessage):
     ) -> None:
         requested_change_id = content.get("change_id", 0)
         try:
-            element_data = await get_element_data(
-                consumer.scope["user"]["id"], requested_change_id
+            await send_element_data(
+                consumer,
+                requested_change_id,
+                content.get("stream", False),
+                in_response=id,
             )
         except ValueError as error:
             await consumer.send_json(type="error", content=str(error), in_response=id)
-        else:
-            await consumer.send_json(
-                type="autoupdate", content=element_data, in_response=id
-            )
 
 
 class AutoupdateWebsocketClientMessage(BaseWebsocketClientMessage):
@@ -155,22 +182,90 @@ class ListenToProjectors(BaseWebsocketClientMessage):
     async def receive_content(
         self, consumer: "ProtocollAsyncJsonWebsocketConsumer", content: Any, id: str
     ) -> None:
+        # Listen only to the groups of the requested projectors.
+        old_projector_ids = set(consumer.listen_projector_ids)
         consumer.listen_projector_ids = content["projector_ids"]
-        if consumer.listen_projector_ids:
-            # listen to projector group
-            await consumer.channel_layer.group_add("projector", consumer.channel_name)
-        else:
-            # do not listen to projector group
+        for projector_id in old_projector_ids - set(consumer.listen_projector_ids):
             await consumer.channel_layer.group_discard(
-                "projector", consumer.channel_name
+                get_projector_group_name(projector_id), consumer.channel_name
+            )
+        for projector_id in set(consumer.listen_projector_ids) - old_projector_ids:
+            await consumer.channel_layer.group_add(
+                get_projector_group_name(projector_id), consumer.channel_name
             )
 
         # Send projector data
         if consumer.listen_projector_ids:
             projector_data = await get_projectot_data(consumer.listen_projector_ids)
-            for projector_id, data in projector_data.items():
-                consumer.projector_hash[projector_id] = hash(str(data))
-
             await consumer.send_json(
                 type="projector", content=projector_data, in_response=id
             )
+
+
+class GetHistoryWebsocketClientMessage(BaseWebsocketClientMessage):
+    """
+    The client requests one page of the history entries.
+
+    The history is not in the element cache, so it is loaded from the
+    database. Only admins can see it.
+
+    The answer contains at most limit entries in "results" and the cursor for
+    the next page in "next_cursor". The client sends it as cursor to get the
+    next page. "next_cursor" is None, if there are no more entries.
+    """
+
+    identifier = "getHistory"
+
+    # Maximum number of entries in one page.
+    page_size = 500
+
+    schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "titel": "getHistory request",
+        "description": "Request from the client to get one page of the history.",
+        "type": "object",
+        "properties": {
+            "cursor": {"type": "integer"},
+            "limit": {"type": "integer", "minimum": 1, "maximum": page_size},
+            "element_id": {"type": "string"},
+        },
+    }
+
+    async def receive_content(
+        self, consumer: "ProtocollAsyncJsonWebsocketConsumer", content: Any, id: str
+    ) -> None:
+        if not await History.get_access_permissions().async_check_permissions(
+            consumer.scope["user"]["id"]
+        ):
+            await consumer.send_json(
+                type="error",
+                content="You are not allowed to see the history.",
+                in_response=id,
+            )
+            return
+
+        page = await database_sync_to_async(self.get_page)(
+            content.get("limit", self.page_size),
+            cursor=content.get("cursor"),
+            element_id=content.get("element_id"),
+        )
+        await consumer.send_json(type="history", content=page, in_response=id)
+
+    def get_page(
+        self, limit: int, cursor: Optional[int] = None, element_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Returns at most limit entries after the cursor and the cursor of the
+        next page.
+        """
+        # Get one more entry to know, if there is a next page.
+        queryset = History.objects.filter_entries(element_id, cursor)[: limit + 1]
+        results: List[Dict[str, Any]] = []
+        next_cursor = None
+        for chunk in History.objects.iter_chunks(queryset, limit + 1):
+            for instance in chunk:
+                if len(results) == limit:
+                    next_cursor = results[-1]["id"]
+                    break
+                results.append(instance.get_full_data())
+        return {"results": results, "next_cursor": next_cursor}
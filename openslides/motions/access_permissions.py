@@ -22,6 +22,46 @@ class MotionAccessPermissions(BaseAccessPermissions):
         some unauthorized users. Ensures that a user can only see his own
         personal notes.
         """
+        return await self.restrict_motions(
+            full_data, user_id, shared=True, personal=True
+        )
+
+    async def get_shared_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Like get_restricted_data but without the motions that the user can
+        only see because he is a submitter.
+        """
+        return await self.restrict_motions(
+            full_data, user_id, shared=True, personal=False
+        )
+
+    async def get_personal_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns only the motions that the user can see because he is a
+        submitter.
+        """
+        return await self.restrict_motions(
+            full_data, user_id, shared=False, personal=True
+        )
+
+    async def restrict_motions(
+        self,
+        full_data: List[Dict[str, Any]],
+        user_id: int,
+        shared: bool,
+        personal: bool,
+    ) -> List[Dict[str, Any]]:
+        """
+        Helper for the get_restricted_data methods.
+
+        If shared is True, the motions that the user can see because of his
+        permissions are returned. If personal is True, the motions that the user
+        can see because he is a submitter are returned.
+        """
         # Parse data.
         if await async_has_perm(user_id, "motions.can_see"):
             # TODO: Refactor this after personal_notes system is refactored.
@@ -38,12 +78,15 @@ class MotionAccessPermissions(BaseAccessPermissions):
 
                 # Check see permission for this motion.
                 required_permission_to_see = full["state_required_permission_to_see"]
-                permission = (
+                has_permission = (
                     not required_permission_to_see
                     or await async_has_perm(user_id, required_permission_to_see)
                     or await async_has_perm(user_id, "motions.can_manage")
-                    or is_submitter
                 )
+                if has_permission:
+                    permission = shared
+                else:
+                    permission = personal and is_submitter
 
                 # Parse single motion.
                 if permission:
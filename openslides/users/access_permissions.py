@@ -18,6 +18,42 @@ class UserAccessPermissions(BaseAccessPermissions):
         for the user. Removes several fields for non admins so that they do
         not get the fields they should not get.
         """
+        return await self.restrict_users(full_data, user_id, shared=True, personal=True)
+
+    async def get_shared_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Like get_restricted_data but without the own user, if the user can
+        only see himself because of his identity.
+        """
+        return await self.restrict_users(
+            full_data, user_id, shared=True, personal=False
+        )
+
+    async def get_personal_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the own user, if the user can not see the names of all users.
+        """
+        return await self.restrict_users(
+            full_data, user_id, shared=False, personal=True
+        )
+
+    async def restrict_users(
+        self,
+        full_data: List[Dict[str, Any]],
+        user_id: int,
+        shared: bool,
+        personal: bool,
+    ) -> List[Dict[str, Any]]:
+        """
+        Helper for the get_restricted_data methods.
+
+        If shared is True, the users that the user can see because of his
+        permissions are returned. If personal is True, the user can see himself.
+        """
         from .serializers import (
             USERCANSEESERIALIZER_FIELDS,
             USERCANSEEEXTRASERIALIZER_FIELDS,
@@ -50,6 +86,8 @@ class UserAccessPermissions(BaseAccessPermissions):
 
         # Check user permissions.
         if await async_has_perm(user_id, "users.can_see_name"):
+            if not shared:
+                return []
             if await async_has_perm(user_id, "users.can_see_extra_data"):
                 if await async_has_perm(user_id, "users.can_manage"):
                     data = [filtered_data(full, all_data_fields) for full in full_data]
@@ -64,22 +102,24 @@ class UserAccessPermissions(BaseAccessPermissions):
             # that is required e. g. as speaker, motion submitter or
             # assignment candidate.
 
-            can_see_collection_strings: Set[str] = set()
-            for collection_string in required_user.get_collection_strings():
-                if await async_has_perm(
-                    user_id,
-                    get_model_from_collection_string(
-                        collection_string
-                    ).can_see_permission,
-                ):
-                    can_see_collection_strings.add(collection_string)
-
-            user_ids = await required_user.get_required_users(
-                can_see_collection_strings
-            )
+            user_ids: Set[int] = set()
+            if shared:
+                can_see_collection_strings: Set[str] = set()
+                for collection_string in required_user.get_collection_strings():
+                    if await async_has_perm(
+                        user_id,
+                        get_model_from_collection_string(
+                            collection_string
+                        ).can_see_permission,
+                    ):
+                        can_see_collection_strings.add(collection_string)
+
+                user_ids = await required_user.get_required_users(
+                    can_see_collection_strings
+                )
 
             # Add oneself.
-            if user_id:
+            if user_id and personal:
                 user_ids.add(user_id)
 
             # Parse data.
@@ -123,3 +163,19 @@ class PersonalNoteAccessPermissions(BaseAccessPermissions):
                 data = []
 
         return data
+
+    async def get_shared_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Personal notes are never shared.
+        """
+        return []
+
+    async def get_personal_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the own personal notes.
+        """
+        return await self.get_restricted_data(full_data, user_id)
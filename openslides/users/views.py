@@ -358,12 +358,11 @@ class GroupViewSet(ModelViewSet):
                 signal_results = permission_change.send(
                     None, permissions=new_permissions, action="added"
                 )
-                all_full_data = async_to_sync(element_cache.get_all_full_data)()
                 for __, signal_collections in signal_results:
                     for cachable in signal_collections:
-                        for full_data in all_full_data.get(
-                            cachable.get_collection_string(), {}
-                        ):
+                        for full_data in async_to_sync(
+                            element_cache.get_collection_full_data
+                        )(cachable.get_collection_string()):
                             elements.append(
                                 Element(
                                     id=full_data["id"],
@@ -53,6 +53,31 @@ class BaseAccessPermissions:
         """
         return full_data if await self.async_check_permissions(user_id) else []
 
+    async def get_shared_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the part of the restricted data that only depends on the
+        groups of the user.
+
+        The result is shared between all users with the same groups. Access
+        permissions that show elements to a user because of his identity have
+        to override this method and get_personal_restricted_data(). Default:
+        Returns the same as get_restricted_data.
+        """
+        return await self.get_restricted_data(full_data, user_id)
+
+    async def get_personal_restricted_data(
+        self, full_data: List[Dict[str, Any]], user_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the elements that the user can see additionally to the shared
+        restricted data because of his identity, e. g. his own personal notes.
+
+        Default: Returns an empty list.
+        """
+        return []
+
 
 class RequiredUsers:
     """
@@ -85,13 +110,16 @@ class RequiredUsers:
         """
         user_ids: Set[int] = set()
 
-        all_full_data = await element_cache.get_all_full_data()
         for collection_string in collection_strings:
             # Get the callable for the collection_string
             get_user_ids = self.callables.get(collection_string)
-            elements = all_full_data.get(collection_string, {})
-            if not (get_user_ids and elements):
-                # if the collection_string is unknown or it has no data, do nothing
+            if not get_user_ids:
+                # if the collection_string is unknown, do nothing
+                continue
+
+            elements = await element_cache.get_collection_full_data(collection_string)
+            if not elements:
+                # if the collection has no data, do nothing
                 continue
 
             for element in elements:
@@ -1,15 +1,35 @@
+import asyncio
 import itertools
+import logging
 import threading
-from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from collections import OrderedDict, defaultdict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
-from asgiref.sync import async_to_sync
+from asgiref.sync import SyncToAsync, async_to_sync
+from channels.db import database_sync_to_async
 from channels.layers import get_channel_layer
+from django.conf import settings
 from django.db.models import Model
 from mypy_extensions import TypedDict
 
-from .cache import element_cache, get_element_id
-from .projector import get_projectot_data
+from .cache import ElementCache, element_cache, get_element_id, merge_restricted_data
+from .cache_codecs import dumps_json
+from .projector import get_changed_projector_data, get_projector_group_name
+from .utils import split_element_id
+
 
+logger = logging.getLogger(__name__)
 
 Element = TypedDict(
     "Element",
@@ -35,6 +55,173 @@ AutoupdateFormat = TypedDict(
 )
 
 
+def format_autoupdate(
+    changed_elements: Dict[str, List[Dict[str, Any]]],
+    deleted_element_ids: List[str],
+    change_id: int,
+    from_change_id: Optional[int] = None,
+) -> AutoupdateFormat:
+    """
+    Returns the autoupdate for the elements of one change_id or, if
+    from_change_id is given, of all change_ids from from_change_id until
+    change_id.
+    """
+    deleted_elements: Dict[str, List[int]] = defaultdict(list)
+    for element_id in deleted_element_ids:
+        collection_string, id = split_element_id(element_id)
+        deleted_elements[collection_string].append(id)
+    return AutoupdateFormat(
+        changed=changed_elements,
+        deleted=deleted_elements,
+        from_change_id=change_id if from_change_id is None else from_change_id,
+        to_change_id=change_id,
+        all_data=False,
+    )
+
+
+def encode_autoupdate(autoupdate: AutoupdateFormat) -> str:
+    """
+    Returns the websocket message for an autoupdate as it is sent by
+    ProtocollAsyncJsonWebsocketConsumer.send_json().
+    """
+    return dumps_json({"type": "autoupdate", "content": autoupdate})
+
+
+class AutoupdateFanout:
+    """
+    Builds the autoupdate messages for all consumers of one process.
+
+    The restricted data of a change_id is computed and encoded only once for
+    each permission class. Only users, that see personal elements in the
+    change, get an own message.
+
+    The results are kept for the last max_change_ids change_ids.
+    """
+
+    def __init__(
+        self, element_cache: ElementCache = element_cache, max_change_ids: int = 10
+    ) -> None:
+        self.element_cache = element_cache
+        self.max_change_ids = max_change_ids
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.futures: "OrderedDict[int, Dict[str, asyncio.Future]]" = OrderedDict()
+
+    def get_future(
+        self, change_id: int, key: str, coroutine_function: Callable[[], Awaitable]
+    ) -> asyncio.Future:
+        """
+        Returns a future with the result of coroutine_function for the
+        change_id and the key.
+
+        The coroutine_function is only called, if there is no future yet.
+        """
+        loop = asyncio.get_event_loop()
+        if loop is not self.loop:
+            # Futures can only be awaited in the loop they were created in.
+            self.loop = loop
+            self.futures.clear()
+
+        if change_id not in self.futures:
+            self.futures[change_id] = {}
+            while len(self.futures) > self.max_change_ids:
+                self.futures.popitem(last=False)
+
+        futures = self.futures[change_id]
+        if key not in futures:
+            futures[key] = asyncio.ensure_future(coroutine_function())
+        return futures[key]
+
+    async def get_permission_class(self, user_id: int) -> Optional[str]:
+        """
+        Returns the permission class of the user or None, if the user does not
+        exist (anymore).
+        """
+        try:
+            return await self.element_cache.get_permission_class(user_id)
+        except RuntimeError:
+            return None
+
+    async def get_full_data(
+        self, change_id: int
+    ) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        """
+        Returns the full_data of the change_id. It is loaded only once.
+        """
+        return await self.get_future(
+            change_id,
+            "full_data",
+            lambda: self.element_cache.get_full_data(change_id, change_id),
+        )
+
+    async def get_message(self, user_id: int, change_id: int) -> str:
+        """
+        Returns the encoded autoupdate message for the user and the change_id.
+
+        The message is the same as it would be built from
+        element_cache.get_restricted_data(user_id, change_id, change_id).
+
+        The permission class of each user is looked up only once for each
+        change_id, also if the user has more then one consumer.
+        """
+        permission_class = await self.get_future(
+            change_id,
+            f"permission_class:{user_id}",
+            lambda: self.get_permission_class(user_id),
+        )
+        if permission_class is None:
+            # The user does not exist (anymore), so he has no restricted data
+            # in the restricted_data_cache. Restrict the full_data only for him.
+            changed_elements, deleted_element_ids = await self.get_full_data(change_id)
+            restricted_elements = {}
+            for collection_string, elements in changed_elements.items():
+                cachable = self.element_cache.cachables[collection_string]
+                restricter = cachable.restrict_elements
+                restricted_elements[collection_string] = await restricter(
+                    user_id, elements
+                )
+            return encode_autoupdate(
+                format_autoupdate(restricted_elements, deleted_element_ids, change_id)
+            )
+
+        full_data: Optional[Tuple[Dict[str, List[Dict[str, Any]]], List[str]]] = None
+        if not self.element_cache.use_restricted_data_cache:
+            full_data = await self.get_full_data(change_id)
+
+        async def get_shared_data() -> Tuple[
+            Tuple[Dict[str, List[Dict[str, Any]]], List[str]], str
+        ]:
+            shared_data = await self.element_cache.get_restricted_data_part(
+                user_id, False, change_id, change_id, full_data, permission_class
+            )
+            return (
+                shared_data,
+                encode_autoupdate(format_autoupdate(*shared_data, change_id)),
+            )
+
+        shared_data, shared_message = await self.get_future(
+            change_id, permission_class, get_shared_data
+        )
+        if not user_id:
+            # The anonymous user has no personal data.
+            return shared_message
+
+        personal_data = await self.element_cache.get_restricted_data_part(
+            user_id, True, change_id, change_id, full_data
+        )
+        if not any(personal_data[0].values()):
+            # If the user sees no personal elements, all elements, that are
+            # deleted in the shared data, are also deleted in the personal data.
+            return shared_message
+        return encode_autoupdate(
+            format_autoupdate(
+                *merge_restricted_data([shared_data, personal_data]), change_id
+            )
+        )
+
+
+autoupdate_fanout = AutoupdateFanout()
+
+
 def inform_changed_data(
     instances: Union[Iterable[Model], Model],
     information: str = "",
@@ -46,6 +233,9 @@ def inform_changed_data(
 
     The argument instances can be one instance or an iterable over instances.
 
+    Inside of an autoupdate bundle, the full_data of the instances is created
+    when the bundle is sent, so each instance is serialized only once.
+
     History creation is enabled.
     """
     root_instances = set()
@@ -59,9 +249,18 @@ def inform_changed_data(
             # Instance has no method get_root_rest_element. Just ignore it.
             pass
 
+    bundle = autoupdate_bundle.get(threading.get_ident())
+    if bundle is not None:
+        # Put all instances into the autoupdate_bundle.
+        for root_instance in root_instances:
+            bundle.add_instance(root_instance, information, user_id)
+        return
+
     elements: Dict[str, Element] = {}
     for root_instance in root_instances:
-        key = root_instance.get_collection_string() + str(root_instance.get_rest_pk())
+        key = get_element_id(
+            root_instance.get_collection_string(), root_instance.get_rest_pk()
+        )
         elements[key] = Element(
             id=root_instance.get_rest_pk(),
             collection_string=root_instance.get_collection_string(),
@@ -71,13 +270,8 @@ def inform_changed_data(
             disable_history=False,
         )
 
-    bundle = autoupdate_bundle.get(threading.get_ident())
-    if bundle is not None:
-        # Put all elements into the autoupdate_bundle.
-        bundle.update(elements)
-    else:
-        # Send autoupdate directly
-        handle_changed_elements(elements.values())
+    # Send autoupdate directly
+    handle_changed_elements(elements.values())
 
 
 def inform_deleted_data(
@@ -93,7 +287,7 @@ def inform_deleted_data(
     """
     elements: Dict[str, Element] = {}
     for deleted_element in deleted_elements:
-        key = deleted_element[0] + str(deleted_element[1])
+        key = get_element_id(deleted_element[0], deleted_element[1])
         elements[key] = Element(
             id=deleted_element[1],
             collection_string=deleted_element[0],
@@ -122,7 +316,9 @@ def inform_changed_elements(changed_elements: Iterable[Element]) -> None:
     """
     elements = {}
     for changed_element in changed_elements:
-        key = changed_element["collection_string"] + str(changed_element["id"])
+        key = get_element_id(
+            changed_element["collection_string"], changed_element["id"]
+        )
         elements[key] = changed_element
 
     bundle = autoupdate_bundle.get(threading.get_ident())
@@ -134,29 +330,95 @@ def inform_changed_elements(changed_elements: Iterable[Element]) -> None:
         handle_changed_elements(elements.values())
 
 
+class AutoupdateBundle:
+    """
+    Collects the changed elements of one request.
+
+    For changed instances, only the model and the id are saved. Their
+    full_data is created in get_elements() with one query for each model.
+    """
+
+    def __init__(self) -> None:
+        self.elements: Dict[str, Element] = {}
+        # Element ids of the elements, that have to be serialized, to their
+        # model.
+        self.models: Dict[str, Type[Model]] = {}
+
+    def add_instance(
+        self, instance: Model, information: str, user_id: Optional[int]
+    ) -> None:
+        """
+        Adds a changed instance.
+        """
+        key = get_element_id(instance.get_collection_string(), instance.get_rest_pk())
+        self.elements[key] = Element(
+            id=instance.get_rest_pk(),
+            collection_string=instance.get_collection_string(),
+            full_data=None,
+            information=information,
+            user_id=user_id,
+            disable_history=False,
+        )
+        self.models[key] = type(instance)
+
+    def update(self, elements: Dict[str, Element]) -> None:
+        """
+        Adds elements, that already have their full_data or that are deleted.
+        """
+        self.elements.update(elements)
+        for key in elements:
+            self.models.pop(key, None)
+
+    def get_elements(self) -> List[Element]:
+        """
+        Returns all elements with their full_data.
+
+        Instances, that do not exist anymore, are sent as deleted elements.
+        """
+        ids_by_model: Dict[Type[Model], List[int]] = defaultdict(list)
+        for key, model in self.models.items():
+            ids_by_model[model].append(self.elements[key]["id"])
+
+        for model, ids in ids_by_model.items():
+            collection_string = model.get_collection_string()  # type: ignore
+            for full_data in model.get_elements(ids):  # type: ignore
+                key = get_element_id(collection_string, full_data["id"])
+                self.elements[key]["full_data"] = full_data
+        self.models.clear()
+        return list(self.elements.values())
+
+
 """
 Global container for autoupdate bundles
 """
-autoupdate_bundle: Dict[int, Dict[str, Element]] = {}
+autoupdate_bundle: Dict[int, AutoupdateBundle] = {}
 
 
 class AutoupdateBundleMiddleware:
     """
     Middleware to handle autoupdate bundling.
+
+    With AUTOUPDATE_IN_BACKGROUND, the response is returned before the cache
+    is updated. A following request can still read the old data from the
+    cache.
     """
 
     def __init__(self, get_response: Any) -> None:
         self.get_response = get_response
         # One-time configuration and initialization.
+        self.in_background = getattr(settings, "AUTOUPDATE_IN_BACKGROUND", False)
 
     def __call__(self, request: Any) -> Any:
         thread_id = threading.get_ident()
-        autoupdate_bundle[thread_id] = {}
+        autoupdate_bundle[thread_id] = AutoupdateBundle()
 
         response = self.get_response(request)
 
-        bundle: Dict[str, Element] = autoupdate_bundle.pop(thread_id)
-        handle_changed_elements(bundle.values())
+        bundle = autoupdate_bundle.pop(thread_id)
+        if self.in_background:
+            autoupdate_dispatcher.dispatch(bundle.get_elements())
+        else:
+            handle_changed_elements(bundle.get_elements())
         return response
 
 
@@ -167,64 +429,161 @@ def handle_changed_elements(elements: Iterable[Element]) -> None:
 
     Does nothing if elements is empty.
     """
+    elements = list(elements)
+    if elements:
+        # Save histroy here using sync code. The history is not part of the
+        # cache, so there is no autoupdate for it.
+        save_history(elements)
 
-    async def update_cache(elements: Iterable[Element]) -> int:
-        """
-        Async helper function to update the cache.
-
-        Returns the change_id
-        """
-        cache_elements: Dict[str, Optional[Dict[str, Any]]] = {}
-        for element in elements:
-            element_id = get_element_id(element["collection_string"], element["id"])
-            cache_elements[element_id] = element["full_data"]
-        return await element_cache.change_elements(cache_elements)
+        # Update cache and send autoupdate using async code.
+        async_to_sync(async_handle_changed_elements)(elements)
 
-    async def async_handle_collection_elements(elements: Iterable[Element]) -> None:
-        """
-        Async helper function to update cache and send autoupdate.
-        """
-        # Update cache
-        change_id = await update_cache(elements)
 
-        # Send autoupdate
-        channel_layer = get_channel_layer()
+async def async_handle_changed_elements(elements: Iterable[Element]) -> None:
+    """
+    Updates the cache and sends the autoupdate and the projector data.
+    """
+    # Update cache
+    cache_elements: Dict[str, Optional[Dict[str, Any]]] = {}
+    for element in elements:
+        element_id = get_element_id(element["collection_string"], element["id"])
+        cache_elements[element_id] = element["full_data"]
+    change_id = await element_cache.change_elements(cache_elements)
+
+    # Send autoupdate
+    channel_layer = get_channel_layer()
+    await channel_layer.group_send(
+        "autoupdate", {"type": "send_data", "change_id": change_id}
+    )
+
+    # Send the data of the changed projectors only to the clients, that listen
+    # to them.
+    for projector_id, data in (await get_changed_projector_data()).items():
         await channel_layer.group_send(
-            "autoupdate", {"type": "send_data", "change_id": change_id}
+            get_projector_group_name(projector_id),
+            {"type": "projector_changed", "data": {projector_id: data}},
         )
 
-        projector_data = await get_projectot_data()
-        # Send projector
-        channel_layer = get_channel_layer()
-        await channel_layer.group_send(
-            "projector", {"type": "projector_changed", "data": projector_data}
-        )
 
-    if elements:
-        # Save histroy here using sync code.
-        history_instances = save_history(elements)
-
-        # Convert history instances to Elements.
-        history_elements: List[Element] = []
-        for history_instance in history_instances:
-            history_elements.append(
-                Element(
-                    id=history_instance.get_rest_pk(),
-                    collection_string=history_instance.get_collection_string(),
-                    full_data=history_instance.get_full_data(),
-                    information="",
-                    user_id=None,
-                    disable_history=True,  # This does not matter because history elements can never be part of the history itself.
-                )
-            )
+class AutoupdateDispatcher:
+    """
+    Handles the changed elements of the requests in the background, so the
+    response does not wait for the history, the cache and the autoupdate.
 
-        # Chain elements and history elements.
-        itertools.chain(elements, history_elements)
+    The elements are put into a queue of the event loop of the server and are
+    handled by one task in the order they were dispatched, so the change_ids
+    are in the same order as the requests. If the queue is full, dispatch()
+    blocks until there is space again.
 
-        # Update cache and send autoupdate using async code.
-        async_to_sync(async_handle_collection_elements)(
-            itertools.chain(elements, history_elements)
-        )
+    Changes that come in fast one after another are coalesced: after a change,
+    the dispatcher waits coalesce_window seconds for the next one and handles
+    all of them with one change_id and one autoupdate. A change waits at most
+    coalesce_max_delay seconds.
+
+    If there is no running event loop of the server, for example in management
+    commands, the elements are handled directly.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 1000,
+        coalesce_window: float = 0,
+        coalesce_max_delay: float = 0.2,
+    ) -> None:
+        self.max_queue_size = max_queue_size
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_delay = coalesce_max_delay
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker_task: Optional[asyncio.Future] = None
+
+    def dispatch(self, elements: Iterable[Element]) -> None:
+        """
+        Puts the elements into the queue. Has to be called from a thread of
+        the server, for example from a view.
+        """
+        elements = list(elements)
+        if not elements:
+            return
+
+        # SyncToAsync saves the event loop of the server for each thread it
+        # runs sync code in.
+        loop = getattr(SyncToAsync.threadlocal, "main_event_loop", None)
+        if loop is None or not loop.is_running():
+            handle_changed_elements(elements)
+            return
+        asyncio.run_coroutine_threadsafe(self.put(elements), loop).result()
+
+    async def put(self, elements: List[Element]) -> None:
+        """
+        Puts the elements into the queue of the current event loop. Waits, if
+        the queue is full.
+        """
+        loop = asyncio.get_event_loop()
+        if self.queue is None or self.loop is not loop:
+            self.loop = loop
+            self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self.worker_task = None
+        await self.queue.put(elements)
+        if self.worker_task is None or self.worker_task.done():
+            # There is only one worker at a time, so the elements are handled
+            # in order.
+            self.worker_task = asyncio.ensure_future(self.worker(self.queue))
+
+    async def worker(self, queue: asyncio.Queue) -> None:
+        """
+        Handles the elements of the queue one after another until the queue
+        is empty.
+
+        All bundles, that are in the queue or that come in during the
+        coalesce window, are handled together with one change_id.
+        """
+        loop = asyncio.get_event_loop()
+        while not queue.empty():
+            bundles = [queue.get_nowait()]
+            deadline = loop.time() + self.coalesce_max_delay
+            while True:
+                while not queue.empty():
+                    bundles.append(queue.get_nowait())
+                timeout = min(self.coalesce_window, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    bundles.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Save the history for each change, but send each element only
+            # once.
+            all_elements = list(itertools.chain.from_iterable(bundles))
+            elements: Dict[str, Element] = {}
+            for element in all_elements:
+                element_id = get_element_id(element["collection_string"], element["id"])
+                elements[element_id] = element
+            try:
+                await database_sync_to_async(save_history)(all_elements)
+                await async_handle_changed_elements(list(elements.values()))
+            except Exception:
+                # The request that changed the elements is already answered.
+                # Log the error and go on with the next elements.
+                logger.exception("Error while handling the changed elements.")
+            finally:
+                for __ in bundles:
+                    queue.task_done()
+
+    async def join(self) -> None:
+        """
+        Waits until all elements of the queue are handled.
+        """
+        if self.queue is not None:
+            await self.queue.join()
+
+
+autoupdate_dispatcher = AutoupdateDispatcher(
+    max_queue_size=getattr(settings, "AUTOUPDATE_QUEUE_SIZE", 1000),
+    coalesce_window=getattr(settings, "AUTOUPDATE_COALESCE_WINDOW", 0.05),
+    coalesce_max_delay=getattr(settings, "AUTOUPDATE_COALESCE_MAX_DELAY", 0.2),
+)
 
 
 def save_history(
@@ -1,13 +1,31 @@
 import asyncio
+import atexit
+import hashlib
 import json
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from time import sleep
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from time import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.db import connections
 
+from .cache_codecs import ElementCodec, JSONCodec, get_codec
 from .cache_providers import (
     Cachable,
     ElementCacheProvider,
@@ -15,6 +33,7 @@ from .cache_providers import (
     RedisCacheProvider,
     get_all_cachables,
 )
+from .cache_snapshot import ElementCacheSnapshot
 from .redis import use_redis
 from .utils import get_element_id, split_element_id
 
@@ -25,11 +44,14 @@ class ElementCache:
 
     Saves the full_data and if enabled the restricted data.
 
-    There is one redis Hash (simular to python dict) for the full_data and one
-    Hash for every user.
+    There is one redis Hash (simular to python dict) for the full_data of each
+    collection. The restricted_data is shared between all users with the same
+    groups. So there is one Hash for every permission class and one Hash for
+    every user with the elements that the user can see because of his identity.
 
     The key of the Hashes is COLLECTIONSTRING:ID where COLLECTIONSTRING is the
-    collection_string of a collection and id the id of an element.
+    collection_string of a collection and id the id of an element. The values
+    are the elements encoded with the codec of the cache, json by default.
 
     All elements have to be in the cache. If one element is missing, the cache
     is invalid, but this can not be detected. When a plugin with a new
@@ -40,24 +62,69 @@ class ElementCache:
     id. With this key it is possible, to get all elements as full_data or as
     restricted_data that are newer then a specific change id.
 
+    Each process keeps the decoded full_data together with the change_id it
+    belongs to. When the change_id in the cache provider moves, only the
+    elements changed since then are fetched and decoded. Set
+    decoded_data_cache_size to 0 to disable this.
+
     All method of this class are async. You either have to call them with
     await in an async environment or use asgiref.sync.async_to_sync().
     """
 
+    # Seconds after which the locks expire, when the worker that holds them
+    # does not release them, for example because it crashed.
+    ensure_cache_lock_timeout: float = 600
+    restricted_data_lock_timeout: float = 60
+
+    # Maximum number of elements, that are loaded from the database after a
+    # snapshot is read. If there are more changed elements, the cache is
+    # rebuild.
+    snapshot_replay_limit: int = 10000
+
     def __init__(
         self,
         use_restricted_data_cache: bool = False,
         cache_provider_class: Type[ElementCacheProvider] = RedisCacheProvider,
         cachable_provider: Callable[[], List[Cachable]] = get_all_cachables,
         start_time: int = None,
+        decoded_data_cache_size: int = 0,
+        codec: ElementCodec = None,
+        change_id_retention_count: Optional[int] = None,
+        change_id_retention_age: Optional[float] = None,
+        build_workers: int = 1,
+        build_batch_size: int = 1000,
+        snapshot: Optional[ElementCacheSnapshot] = None,
     ) -> None:
         """
         Initializes the cache.
 
         When restricted_data_cache is false, no restricted data is saved.
+
+        codec encodes the elements for the cache provider. The default is the
+        JSONCodec.
+
+        decoded_data_cache_size is the maximum number of decoded elements that
+        are kept in the memory of this process. If the full_data has more
+        elements, they are not kept.
+
+        change_id_retention_count is the number of change_ids and
+        change_id_retention_age the time in seconds, that the change_ids are
+        kept. Older change_ids are removed, so clients with an older change_id
+        get all data. None means that the change_ids are kept forever.
+
+        build_workers is the number of threads that load the cachables when
+        the cache is built. build_batch_size is the number of elements that
+        are written to the cache provider at once.
+
+        If snapshot is given, the full_data is written to it after the cache
+        was built and when the process exits. The next process reads the
+        snapshot instead of building the cache, if it is still valid.
         """
         self.use_restricted_data_cache = use_restricted_data_cache
         self.cache_provider = cache_provider_class()
+        self.codec = codec or JSONCodec()
+        self.build_workers = build_workers
+        self.build_batch_size = build_batch_size
         self.cachable_provider = cachable_provider
         self._cachables: Optional[Dict[str, Cachable]] = None
 
@@ -70,11 +137,34 @@ class ElementCache:
         self.start_time = start_time
 
         # Contains Futures to controll, that only one client updates the restricted_data.
-        self.restricted_data_cache_updater: Dict[int, asyncio.Future] = {}
+        self.restricted_data_cache_updater: Dict[str, asyncio.Future] = {}
 
         # Tells if self.ensure_cache was called.
         self.ensured = False
 
+        # Decoded full_data of this process as tuple of the change_id and the
+        # data ordered like in get_all_full_data_ordered. The dicts are
+        # replaced but never changed after they are set.
+        self.decoded_data_cache_size = decoded_data_cache_size
+        self.decoded_full_data: Optional[
+            Tuple[int, Dict[str, Dict[int, Dict[str, Any]]]]
+        ] = None
+
+        self.change_id_retention_count = change_id_retention_count
+        self.change_id_retention_age = change_id_retention_age
+        # The change_ids, that this process has generated, with the time they
+        # were generated. Only used with change_id_retention_age.
+        self.change_id_times: Deque[Tuple[float, int]] = deque()
+        # The lowest change_id, that this process has set.
+        self.compacted_change_id: Optional[int] = None
+
+        self.snapshot = snapshot
+        # Fingerprint and position for the snapshot of the full_data of this
+        # process. The position is taken before the full_data is loaded, so
+        # the snapshot never misses a change.
+        self.snapshot_fingerprint: Optional[str] = None
+        self.snapshot_position: Optional[int] = None
+
     @property
     def cachables(self) -> Dict[str, Cachable]:
         """
@@ -101,27 +191,183 @@ class ElementCache:
         if reset or not cache_exists:
             lock_name = "ensure_cache"
             # Set a lock so only one process builds the cache
-            if async_to_sync(self.cache_provider.set_lock)(lock_name):
+            token = async_to_sync(self.cache_provider.set_lock)(
+                lock_name, self.ensure_cache_lock_timeout
+            )
+            if token:
                 try:
-                    mapping = {}
-                    for collection_string, cachable in self.cachables.items():
-                        for element in cachable.get_elements():
-                            mapping.update(
-                                {
-                                    get_element_id(
-                                        collection_string, element["id"]
-                                    ): json.dumps(element)
-                                }
-                            )
-                    async_to_sync(self.cache_provider.reset_full_cache)(mapping)
+                    self.prepare_snapshot()
+                    if reset or not self.load_snapshot():
+                        self.build_full_data_cache()
+                        self.write_snapshot()
                 finally:
-                    async_to_sync(self.cache_provider.del_lock)(lock_name)
+                    async_to_sync(self.cache_provider.del_lock)(lock_name, token)
             else:
-                while async_to_sync(self.cache_provider.get_lock)(lock_name):
-                    sleep(0.01)
+                async_to_sync(self.cache_provider.wait_for_lock)(lock_name)
 
+        # The data could have been changed without a new change_id.
+        self.decoded_full_data = None
         self.ensured = True
 
+    def build_full_data_cache(self) -> None:
+        """
+        Loads all elements from the cachables and replaces the full_data in
+        the cache provider.
+
+        The cachables are loaded in build_workers threads. The elements of each
+        cachable are written in batches of build_batch_size elements to the
+        staging area of the cache provider, as soon as the cachable is loaded.
+        At the end, the staged elements replace the full_data at once.
+        """
+        async_to_sync(self.cache_provider.del_staged_elements)()
+
+        if self.build_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.build_workers) as executor:
+                futures = [
+                    executor.submit(self.load_cachable_in_thread, cachable)
+                    for cachable in self.cachables.values()
+                ]
+                for future in as_completed(futures):
+                    self.stage_elements(*future.result())
+        else:
+            for collection_string, cachable in self.cachables.items():
+                self.stage_elements(collection_string, cachable.get_elements())
+
+        async_to_sync(self.cache_provider.commit_staged_elements)()
+
+    def prepare_snapshot(self) -> None:
+        """
+        Gets the fingerprint and the position for the snapshot, before the
+        full_data is built or loaded.
+
+        The snapshot is written again, when the process exits, so the next
+        start has to load less elements from the database.
+        """
+        if self.snapshot is None:
+            return
+        self.snapshot_fingerprint = self.snapshot.get_fingerprint(
+            self.cachables.keys(), self.codec.name
+        )
+        if self.snapshot_position is None:
+            atexit.register(self.write_snapshot)
+        self.snapshot_position = self.snapshot.get_position()
+
+    def load_snapshot(self) -> bool:
+        """
+        Replaces the full_data in the cache provider with the snapshot.
+
+        The elements that were changed after the snapshot was written, are
+        loaded from the database.
+
+        Returns False, if there is no valid snapshot. Then the cache has to be
+        built.
+        """
+        if self.snapshot is None or self.snapshot_position is None:
+            return False
+
+        snapshot_data = self.snapshot.read()
+        if (
+            snapshot_data is None
+            or snapshot_data.fingerprint != self.snapshot_fingerprint
+            or snapshot_data.position > self.snapshot_position
+        ):
+            return False
+        element_ids = self.snapshot.get_changed_element_ids(snapshot_data.position)
+        if len(element_ids) > self.snapshot_replay_limit:
+            return False
+
+        async_to_sync(self.cache_provider.del_staged_elements)()
+        elements = list(snapshot_data.elements.items())
+        for start in range(0, len(elements), self.build_batch_size):
+            end = start + self.build_batch_size
+            async_to_sync(self.cache_provider.add_staged_elements)(
+                {key.decode(): value for key, value in elements[start:end]}
+            )
+        async_to_sync(self.cache_provider.commit_staged_elements)()
+
+        # The new change_ids have to be higher then the change_ids, that the
+        # clients got before the restart.
+        self.start_time = max(self.start_time, snapshot_data.change_id)
+
+        changed_elements = self.load_elements(element_ids)
+        if changed_elements:
+            async_to_sync(self.change_elements)(changed_elements)
+        return True
+
+    def write_snapshot(self) -> None:
+        """
+        Writes the full_data of the cache provider to the snapshot.
+
+        Does nothing, if this process has not built or loaded the cache.
+        """
+        if (
+            self.snapshot is None
+            or self.snapshot_fingerprint is None
+            or self.snapshot_position is None
+        ):
+            return
+        self.snapshot.write(
+            self.snapshot_fingerprint,
+            async_to_sync(self.get_current_change_id)(),
+            self.snapshot_position,
+            async_to_sync(self.cache_provider.get_all_data)(),
+        )
+
+    def load_elements(
+        self, element_ids: Iterable[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Loads the elements from the cachables.
+
+        Returns a dict like change_elements expects it. Elements that do not
+        exist anymore are None. Elements of unknown collections are ignored.
+        """
+        ids: Dict[str, List[int]] = defaultdict(list)
+        for element_id in element_ids:
+            collection_string, id = split_element_id(element_id)
+            if collection_string in self.cachables:
+                ids[collection_string].append(id)
+
+        out: Dict[str, Optional[Dict[str, Any]]] = {}
+        for collection_string, collection_ids in ids.items():
+            for id in collection_ids:
+                out[get_element_id(collection_string, id)] = None
+            for element in self.cachables[collection_string].get_elements(
+                collection_ids
+            ):
+                out[get_element_id(collection_string, element["id"])] = element
+        return out
+
+    def load_cachable_in_thread(
+        self, cachable: Cachable
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Returns the collection_string and the elements of a cachable.
+
+        Closes the database connections of the thread afterwards.
+        """
+        try:
+            return cachable.get_collection_string(), cachable.get_elements()
+        finally:
+            connections.close_all()
+
+    def stage_elements(
+        self, collection_string: str, elements: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Encodes the elements of one collection and writes them to the staging
+        area of the cache provider in batches.
+        """
+        for start in range(0, len(elements), self.build_batch_size):
+            end = start + self.build_batch_size
+            mapping = {
+                get_element_id(collection_string, element["id"]): self.codec.dumps(
+                    element
+                )
+                for element in elements[start:end]
+            }
+            async_to_sync(self.cache_provider.add_staged_elements)(mapping)
+
     async def change_elements(
         self, elements: Dict[str, Optional[Dict[str, Any]]]
     ) -> int:
@@ -134,12 +380,12 @@ class ElementCache:
         Returns the new generated change_id.
         """
         deleted_elements = []
-        changed_elements = []
+        changed_elements: List[Union[str, bytes]] = []
         for element_id, data in elements.items():
             if data:
                 # The arguments for redis.hset is pairs of key value
                 changed_elements.append(element_id)
-                changed_elements.append(json.dumps(data))
+                changed_elements.append(self.codec.dumps(data))
             else:
                 deleted_elements.append(element_id)
 
@@ -148,9 +394,65 @@ class ElementCache:
         if deleted_elements:
             await self.cache_provider.del_elements(deleted_elements)
 
-        return await self.cache_provider.add_changed_elements(
+        change_id = await self.cache_provider.add_changed_elements(
             self.start_time + 1, elements.keys()
         )
+        await self.compact_change_ids(change_id)
+        return change_id
+
+    async def compact_change_ids(self, change_id: int) -> None:
+        """
+        Removes the change_ids that are older then the retention policy
+        allows. change_id has to be the current change_id.
+
+        The cache provider is only called, when the lowest change_id moves by
+        at least one percent of the retention count (or 100 change_ids when
+        only the retention age is used). The provider only moves the lowest
+        change_id forward and returns it, so each process continues from the
+        compaction of all processes.
+        """
+        lowest_change_id = 0
+        if self.change_id_retention_count is not None:
+            lowest_change_id = change_id - self.change_id_retention_count + 1
+
+        if self.change_id_retention_age is not None:
+            now = time()
+            self.change_id_times.append((now, change_id))
+            while self.change_id_times[0][0] < now - self.change_id_retention_age:
+                old_change_id = self.change_id_times.popleft()[1]
+                # All change_ids up to the old change_id are older.
+                lowest_change_id = max(lowest_change_id, old_change_id + 1)
+
+        if self.change_id_retention_count is not None:
+            compaction_step = max(self.change_id_retention_count // 100, 1)
+        else:
+            compaction_step = 100
+        if lowest_change_id > 0 and (
+            self.compacted_change_id is None
+            or lowest_change_id >= self.compacted_change_id + compaction_step
+        ):
+            self.compacted_change_id = await self.cache_provider.compact_change_ids(
+                lowest_change_id
+            )
+
+    async def get_change_id_log_size(self) -> int:
+        """
+        Returns the number of entries in the change_id log of the cache
+        provider.
+
+        This can be used to monitor the retention of the change_ids.
+        """
+        return await self.cache_provider.get_change_id_log_size()
+
+    async def update_projector_hashes(self, hashes: Dict[int, str]) -> List[int]:
+        """
+        Saves the hashes of the data of all projectors and returns the ids of
+        the projectors, whose data has changed since the last call.
+
+        The hashes are saved in the cache provider, so the changes are detected
+        only once, even with more then one server.
+        """
+        return await self.cache_provider.update_projector_hashes(hashes)
 
     async def get_all_full_data(self) -> Dict[str, List[Dict[str, Any]]]:
         """
@@ -170,14 +472,114 @@ class ElementCache:
         """
         Like get_all_full_data but orders the element of one collection by there
         id.
+
+        The elements are shared with the decoded data cache. Do not change them.
+        """
+        all_data = await self.get_decoded_full_data()
+
+        # Copy the outer dicts, so the caller can change them.
+        return {
+            collection_string: dict(elements)
+            for collection_string, elements in all_data.items()
+        }
+
+    async def get_decoded_full_data(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        """
+        Returns the data of the decoded data cache. Updates it, if it is
+        outdated.
+
+        The returned dicts must not be changed.
+        """
+        if not self.decoded_data_cache_size:
+            return await self.load_all_full_data_ordered()
+
+        # Read the change_id before the data. If the data is newer, the next
+        # update gets the same elements again.
+        change_id = await self.get_current_change_id()
+        cached = self.decoded_full_data
+        all_data: Optional[Dict[str, Dict[int, Dict[str, Any]]]] = None
+        if cached is not None and cached[0] == change_id:
+            all_data = cached[1]
+        else:
+            if cached is not None and cached[0] < change_id:
+                all_data = await self.update_decoded_full_data(*cached, change_id)
+            if all_data is None:
+                all_data = await self.load_all_full_data_ordered()
+
+            element_count = sum(len(elements) for elements in all_data.values())
+            if element_count <= self.decoded_data_cache_size:
+                self.decoded_full_data = (change_id, all_data)
+            else:
+                self.decoded_full_data = None
+        return all_data
+
+    async def load_all_full_data_ordered(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        """
+        Loads and decodes all full_data from the cache provider.
         """
         out: Dict[str, Dict[int, Dict[str, Any]]] = defaultdict(dict)
         full_data = await self.cache_provider.get_all_data()
         for element_id, data in full_data.items():
             collection_string, id = split_element_id(element_id)
-            out[collection_string][id] = json.loads(data.decode())
+            out[collection_string][id] = self.codec.loads(data)
         return dict(out)
 
+    async def update_decoded_full_data(
+        self,
+        old_change_id: int,
+        old_data: Dict[str, Dict[int, Dict[str, Any]]],
+        change_id: int,
+    ) -> Optional[Dict[str, Dict[int, Dict[str, Any]]]]:
+        """
+        Returns a copy of old_data with all changes after old_change_id until
+        change_id (including).
+
+        Only the dicts of changed collections are copied. Returns None, if the
+        changes are not known anymore and all data has to be loaded.
+        """
+        try:
+            changed_elements, deleted_elements = await self.get_full_data(
+                old_change_id + 1, change_id
+            )
+        except RuntimeError:
+            return None
+
+        new_data = dict(old_data)
+        copied_collections: Set[str] = set()
+
+        def get_collection(collection_string: str) -> Dict[int, Dict[str, Any]]:
+            if collection_string not in copied_collections:
+                new_data[collection_string] = dict(new_data.get(collection_string, {}))
+                copied_collections.add(collection_string)
+            return new_data[collection_string]
+
+        for collection_string, elements in changed_elements.items():
+            collection = get_collection(collection_string)
+            for element in elements:
+                collection[element["id"]] = element
+        for element_id in deleted_elements:
+            collection_string, id = split_element_id(element_id)
+            get_collection(collection_string).pop(id, None)
+        return new_data
+
+    async def get_collection_full_data(
+        self, collection_string: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns all full_data of one collection.
+
+        Uses the decoded data cache, if it is filled. Else only the elements
+        of the collection are loaded from the cache provider.
+        """
+        if self.decoded_full_data is not None:
+            all_data = await self.get_decoded_full_data()
+            return list(all_data.get(collection_string, {}).values())
+
+        collection_data = await self.cache_provider.get_collection_data(
+            collection_string
+        )
+        return [self.codec.loads(data) for data in collection_data.values()]
+
     async def get_full_data(
         self, change_id: int = 0, max_change_id: int = -1
     ) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
@@ -216,7 +618,7 @@ class ElementCache:
         )
         return (
             {
-                collection_string: [json.loads(value.decode()) for value in value_list]
+                collection_string: [self.codec.loads(value) for value in value_list]
                 for collection_string, value_list in raw_changed_elements.items()
             },
             deleted_elements,
@@ -236,7 +638,58 @@ class ElementCache:
 
         if element is None:
             return None
-        return json.loads(element.decode())
+        return self.codec.loads(element)
+
+    async def get_permission_class(self, user_id: int) -> str:
+        """
+        Returns the key of the restricted_data_cache that is shared between
+        all users with the same groups.
+
+        The key contains a hash of the permissions of the groups, so it changes
+        when the permissions of a group change.
+        """
+        from .auth import (
+            GROUP_DEFAULT_PK,
+            group_collection_string,
+            user_collection_string,
+        )
+
+        if user_id:
+            user = await self.get_element_full_data(user_collection_string, user_id)
+            if user is None:
+                raise RuntimeError(f"User with id {user_id} does not exist.")
+            # Users without groups have the permissions of the default group.
+            group_ids = sorted(user["groups_id"]) or [GROUP_DEFAULT_PK]
+            name = "groups:" + ",".join(str(group_id) for group_id in group_ids)
+        else:
+            group_ids = [GROUP_DEFAULT_PK]
+            name = "anonymous"
+
+        permissions = []
+        for group_id in group_ids:
+            group = await self.get_element_full_data(group_collection_string, group_id)
+            permissions.append(sorted(group["permissions"]) if group else [])
+        permissions_hash = hashlib.sha1(json.dumps(permissions).encode()).hexdigest()
+        return f"{name}:{permissions_hash}"
+
+    def get_personal_restriction_key(self, user_id: int) -> str:
+        """
+        Returns the key of the restricted_data_cache with the elements that an
+        user can see because of his identity.
+        """
+        return f"user:{user_id}"
+
+    async def get_restriction_keys(self, user_id: int) -> List[str]:
+        """
+        Returns the keys of all restricted_data_caches of an user.
+
+        The first key is the permission class. The second key is the personal
+        key. The anonymous user has no personal data.
+        """
+        restriction_keys = [await self.get_permission_class(user_id)]
+        if user_id:
+            restriction_keys.append(self.get_personal_restriction_key(user_id))
+        return restriction_keys
 
     async def exists_restricted_data(self, user_id: int) -> bool:
         """
@@ -245,80 +698,159 @@ class ElementCache:
         if not self.use_restricted_data_cache:
             return False
 
-        return await self.cache_provider.data_exists(user_id)
+        return await self.cache_provider.data_exists(
+            await self.get_permission_class(user_id)
+        )
 
     async def del_user(self, user_id: int) -> None:
         """
-        Removes one user from the resticted_data_cache.
+        Removes the personal data of one user from the resticted_data_cache.
+
+        The shared data does not have to be removed. If the groups of the user
+        change, he gets another permission class.
         """
-        await self.cache_provider.del_restricted_data(user_id)
+        if user_id:
+            await self.cache_provider.del_restricted_data(
+                self.get_personal_restriction_key(user_id)
+            )
 
     async def update_restricted_data(self, user_id: int) -> None:
         """
         Updates the restricted data for an user from the full_data_cache.
         """
+        await self.get_updated_restriction_keys(user_id)
+
+    async def get_updated_restriction_keys(self, user_id: int) -> List[str]:
+        """
+        Updates the restricted data for an user and returns the keys of his
+        restricted_data_caches. See get_restriction_keys().
+        """
+        if not self.use_restricted_data_cache:
+            # If the restricted_data_cache is not used, there is nothing to do
+            return []
+
+        restriction_keys = await self.get_restriction_keys(user_id)
+        for restriction_key in restriction_keys:
+            await self.update_restricted_data_cache(
+                restriction_key,
+                user_id,
+                personal=restriction_key != restriction_keys[0],
+            )
+        return restriction_keys
+
+    async def update_restricted_data_cache(
+        self, restriction_key: str, user_id: int, personal: bool
+    ) -> None:
+        """
+        Updates one restricted_data_cache from the full_data_cache.
+
+        The user with user_id has to be in the permission class or, if personal
+        is True, the user of the personal data.
+        """
         # TODO: When elements are changed at the same time then this method run
         #       this could make the cache invalid.
         #       This could be fixed when get_full_data would be used with a
         #       max change_id.
-        if not self.use_restricted_data_cache:
-            # If the restricted_data_cache is not used, there is nothing to do
-            return
 
         # Try to write a special key.
         # If this succeeds, there is noone else currently updating the cache.
-        # TODO: Make a timeout. Else this could block forever
-        lock_name = f"restricted_data_{user_id}"
-        if await self.cache_provider.set_lock(lock_name):
+        lock_name = f"restricted_data_{restriction_key}"
+        token = await self.cache_provider.set_lock(
+            lock_name, self.restricted_data_lock_timeout
+        )
+        if token:
             future: asyncio.Future = asyncio.Future()
-            self.restricted_data_cache_updater[user_id] = future
-            # Get change_id for this user
-            value = await self.cache_provider.get_change_id_user(user_id)
-            # If the change id is not in the cache yet, use -1 to get all data since 0
-            user_change_id = int(value) if value else -1
-            change_id = await self.get_current_change_id()
-            if change_id > user_change_id:
-                try:
-                    full_data_elements, deleted_elements = await self.get_full_data(
-                        user_change_id + 1
-                    )
-                except RuntimeError:
-                    # The user_change_id is lower then the lowest change_id in the cache.
-                    # The whole restricted_data for that user has to be recreated.
-                    full_data_elements = await self.get_all_full_data()
-                    await self.cache_provider.del_restricted_data(user_id)
-                else:
+            self.restricted_data_cache_updater[restriction_key] = future
+            try:
+                # Get the change_id of this restricted_data_cache, the current
+                # change_id and the full_data changed since then at once.
+                (
+                    value,
+                    current_change_id,
+                    data_since,
+                ) = await self.cache_provider.get_restricted_data_changes(
+                    restriction_key
+                )
+                # If the change id is not in the cache yet, use -1 to get all data since 0
+                restricted_change_id = value if value is not None else -1
+                change_id = (
+                    current_change_id
+                    if current_change_id is not None
+                    else self.start_time
+                )
+                if change_id > restricted_change_id:
+                    if data_since is None:
+                        # The restricted_data_cache is new or its change_id is
+                        # lower then the lowest change_id in the cache. The whole
+                        # restricted_data has to be recreated.
+                        full_data_elements = await self.get_all_full_data()
+                        deleted_elements: List[str] = []
+                        changed_elements = False
+                        await self.cache_provider.del_restricted_data(restriction_key)
+                    else:
+                        raw_changed_elements, deleted_elements = data_since
+                        full_data_elements = {
+                            collection_string: [
+                                self.codec.loads(element) for element in value_list
+                            ]
+                            for collection_string, value_list in raw_changed_elements.items()
+                        }
+                        changed_elements = True
+
+                    mapping: Dict[str, Union[str, bytes]] = {}
+                    for collection_string, full_data in full_data_elements.items():
+                        cachable = self.cachables[collection_string]
+                        if personal:
+                            restricter = cachable.restrict_elements_personal
+                        else:
+                            restricter = cachable.restrict_elements_shared
+                        elements = await restricter(user_id, full_data)
+                        for element in elements:
+                            mapping.update(
+                                {
+                                    get_element_id(
+                                        collection_string, element["id"]
+                                    ): self.codec.dumps(element)
+                                }
+                            )
+                        if changed_elements:
+                            # Remove changed elements, that can not be seen anymore.
+                            for element in full_data:
+                                element_id = get_element_id(
+                                    collection_string, element["id"]
+                                )
+                                if element_id not in mapping:
+                                    deleted_elements.append(element_id)
+
                     # Remove deleted elements
                     if deleted_elements:
                         await self.cache_provider.del_elements(
-                            deleted_elements, user_id
+                            deleted_elements, restriction_key
                         )
-
-                mapping = {}
-                for collection_string, full_data in full_data_elements.items():
-                    restricter = self.cachables[collection_string].restrict_elements
-                    elements = await restricter(user_id, full_data)
-                    for element in elements:
-                        mapping.update(
-                            {
-                                get_element_id(
-                                    collection_string, element["id"]
-                                ): json.dumps(element)
-                            }
-                        )
-                mapping["_config:change_id"] = str(change_id)
-                await self.cache_provider.update_restricted_data(user_id, mapping)
-            # Unset the lock
-            await self.cache_provider.del_lock(lock_name)
-            future.set_result(1)
+                    mapping["_config:change_id"] = str(change_id)
+                    await self.cache_provider.update_restricted_data(
+                        restriction_key, mapping
+                    )
+            except BaseException as error:
+                # Wake up the waiters in this process with the error. The lock
+                # is released below, so the next caller tries again.
+                if isinstance(error, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+                raise
+            else:
+                future.set_result(1)
+            finally:
+                self.restricted_data_cache_updater.pop(restriction_key, None)
+                await self.cache_provider.del_lock(lock_name, token)
         else:
             # Wait until the update if finshed
-            if user_id in self.restricted_data_cache_updater:
+            if restriction_key in self.restricted_data_cache_updater:
                 # The active worker is on the same asgi server, we can use the future
-                await self.restricted_data_cache_updater[user_id]
+                await self.restricted_data_cache_updater[restriction_key]
             else:
-                while await self.cache_provider.get_lock(lock_name):
-                    await asyncio.sleep(0.01)
+                await self.cache_provider.wait_for_lock(lock_name)
 
     async def get_all_restricted_data(
         self, user_id: int
@@ -336,17 +868,156 @@ class ElementCache:
                 all_restricted_data[collection_string] = elements
             return all_restricted_data
 
-        await self.update_restricted_data(user_id)
+        # The personal data is read last, so it overrides the shared data.
+        out: Dict[str, Dict[int, Dict[str, Any]]] = defaultdict(dict)
+        for restriction_key in await self.get_updated_restriction_keys(user_id):
+            restricted_data = await self.cache_provider.get_all_data(restriction_key)
+            for element_id, data in restricted_data.items():
+                if element_id.decode().startswith("_config"):
+                    continue
+                collection_string, id = split_element_id(element_id)
+                out[collection_string][id] = self.codec.loads(data)
+        return {
+            collection_string: list(elements.values())
+            for collection_string, elements in out.items()
+        }
+
+    async def iter_all_restricted_data(
+        self, user_id: int, chunk_size: int
+    ) -> AsyncIterator[Dict[str, List[Dict[str, Any]]]]:
+        """
+        Like get_all_restricted_data but yields the data in chunks with about
+        chunk_size elements.
+
+        Only one chunk is loaded at a time, so the memory does not depend on
+        the size of the data, only the element_ids are remembered. Elements of
+        one collection can be in more then one chunk.
+
+        Redis can return an element more then once while a hash is rehashed
+        during the scan. Such elements are skipped, so each element is only
+        sent once.
+        """
+        if not self.use_restricted_data_cache:
+            for collection_string, cachable in self.cachables.items():
+                async for full_data in self.iter_collection_full_data(
+                    collection_string, chunk_size
+                ):
+                    elements = await cachable.restrict_elements(user_id, full_data)
+                    if elements:
+                        yield {collection_string: elements}
+            return
+
+        # The personal data is small. It overrides the shared data.
+        restriction_keys = await self.get_updated_restriction_keys(user_id)
+        personal_data: Dict[bytes, bytes] = {}
+        if len(restriction_keys) > 1:
+            personal_data = await self.cache_provider.get_all_data(restriction_keys[1])
+
+        seen_element_ids: Set[bytes] = set()
+        cursor = 0
+        while True:
+            cursor, scanned_data = await self.cache_provider.scan_data(
+                cursor, chunk_size, restriction_key=restriction_keys[0]
+            )
+            restricted_data: Dict[bytes, bytes] = {}
+            for element_id, data in scanned_data.items():
+                if element_id in seen_element_ids:
+                    continue
+                seen_element_ids.add(element_id)
+                restricted_data[element_id] = personal_data.pop(element_id, data)
+            chunk = self.decode_restricted_data(restricted_data)
+            if chunk:
+                yield chunk
+            if not cursor:
+                break
+
+        personal_element_ids = list(personal_data)
+        for start in range(0, len(personal_element_ids), chunk_size):
+            end = start + chunk_size
+            chunk = self.decode_restricted_data(
+                {
+                    element_id: personal_data[element_id]
+                    for element_id in personal_element_ids[start:end]
+                }
+            )
+            if chunk:
+                yield chunk
+
+    async def iter_collection_full_data(
+        self, collection_string: str, chunk_size: int
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yields the full_data of one collection in chunks with about chunk_size
+        elements.
+
+        Uses the decoded data cache, if it is filled. It is shared by all
+        users, so it does not have to be loaded in chunks.
+        """
+        if self.decoded_full_data is not None:
+            all_data = await self.get_decoded_full_data()
+            elements = list(all_data.get(collection_string, {}).values())
+            for start in range(0, len(elements), chunk_size):
+                end = start + chunk_size
+                yield elements[start:end]
+            return
 
+        # Redis can return an element more then once, see
+        # iter_all_restricted_data.
+        seen_element_ids: Set[bytes] = set()
+        cursor = 0
+        while True:
+            cursor, full_data = await self.cache_provider.scan_data(
+                cursor, chunk_size, collection_string
+            )
+            elements = [
+                self.codec.loads(data)
+                for element_id, data in full_data.items()
+                if element_id not in seen_element_ids
+            ]
+            seen_element_ids.update(full_data)
+            if elements:
+                yield elements
+            if not cursor:
+                break
+
+    def decode_restricted_data(
+        self, restricted_data: Dict[bytes, bytes]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Decodes elements from the restricted_data_cache and orders them by
+        their collection. The config values of the restricted data are skipped.
+        """
         out: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-        restricted_data = await self.cache_provider.get_all_data(user_id)
         for element_id, data in restricted_data.items():
             if element_id.decode().startswith("_config"):
                 continue
             collection_string, __ = split_element_id(element_id)
-            out[collection_string].append(json.loads(data.decode()))
+            out[collection_string].append(self.codec.loads(data))
         return dict(out)
 
+    async def get_collection_restricted_data(
+        self, user_id: int, collection_string: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Like get_collection_full_data but with restricted_data for an user.
+        """
+        if not self.use_restricted_data_cache:
+            full_data = await self.get_collection_full_data(collection_string)
+            if not full_data:
+                return []
+            restricter = self.cachables[collection_string].restrict_elements
+            return await restricter(user_id, full_data)
+
+        out: Dict[int, Dict[str, Any]] = {}
+        for restriction_key in await self.get_updated_restriction_keys(user_id):
+            restricted_data = await self.cache_provider.get_collection_data(
+                collection_string, restriction_key
+            )
+            for element_id, data in restricted_data.items():
+                __, id = split_element_id(element_id)
+                out[id] = self.codec.loads(data)
+        return list(out.values())
+
     async def get_restricted_data(
         self, user_id: int, change_id: int = 0, max_change_id: int = -1
     ) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
@@ -368,6 +1039,57 @@ class ElementCache:
                 restricted_data[collection_string] = elements
             return restricted_data, deleted_elements
 
+        # The personal data is read last, so it overrides the shared data.
+        parts = [
+            await self.get_restricted_data_part(
+                user_id, False, change_id, max_change_id
+            )
+        ]
+        if user_id:
+            parts.append(
+                await self.get_restricted_data_part(
+                    user_id, True, change_id, max_change_id
+                )
+            )
+        return merge_restricted_data(parts)
+
+    async def get_restricted_data_part(
+        self,
+        user_id: int,
+        personal: bool,
+        change_id: int,
+        max_change_id: int = -1,
+        full_data: Optional[Tuple[Dict[str, List[Dict[str, Any]]], List[str]]] = None,
+        permission_class: Optional[str] = None,
+    ) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        """
+        Like get_restricted_data but returns only the shared data of the
+        permission class of the user or, if personal is True, only the personal
+        data of the user. change_id has to be higher then 0.
+
+        The shared data is the same for all users with the same permission
+        class. Use merge_restricted_data() to build the restricted_data of the
+        user from both parts.
+
+        If the restricted_data_cache is not used, full_data can be the result
+        of get_full_data(change_id, max_change_id), so it is not loaded again.
+        Like this, permission_class can be the result of
+        get_permission_class(user_id).
+        """
+        if not self.use_restricted_data_cache:
+            if full_data is None:
+                full_data = await self.get_full_data(change_id, max_change_id)
+            changed_elements, deleted_elements = full_data
+            restricted_data = {}
+            for collection_string, elements in changed_elements.items():
+                cachable = self.cachables[collection_string]
+                if personal:
+                    restricter = cachable.restrict_elements_personal
+                else:
+                    restricter = cachable.restrict_elements_shared
+                restricted_data[collection_string] = await restricter(user_id, elements)
+            return restricted_data, deleted_elements
+
         lowest_change_id = await self.get_lowest_change_id()
         if change_id < lowest_change_id:
             # When change_id is lower then the lowest change_id in redis, we can
@@ -377,16 +1099,23 @@ class ElementCache:
                 "Catch this exception and rerun the method with change_id=0."
             )
 
+        if personal:
+            restriction_key = self.get_personal_restriction_key(user_id)
+        elif permission_class is not None:
+            restriction_key = permission_class
+        else:
+            restriction_key = await self.get_permission_class(user_id)
+
         # If another coroutine or another daphne server also updates the restricted
         # data, this waits until it is done.
-        await self.update_restricted_data(user_id)
+        await self.update_restricted_data_cache(restriction_key, user_id, personal)
 
         raw_changed_elements, deleted_elements = await self.cache_provider.get_data_since(
-            change_id, user_id, max_change_id
+            change_id, restriction_key, max_change_id
         )
         return (
             {
-                collection_string: [json.loads(value.decode()) for value in value_list]
+                collection_string: [self.codec.loads(value) for value in value_list]
                 for collection_string, value_list in raw_changed_elements.items()
             },
             deleted_elements,
@@ -408,12 +1137,16 @@ class ElementCache:
             restricted_data = await restricter(user_id, [full_data])
             return restricted_data[0] if restricted_data else None
 
-        await self.update_restricted_data(user_id)
-
-        out = await self.cache_provider.get_element(
-            get_element_id(collection_string, id), user_id
-        )
-        return json.loads(out.decode()) if out else None
+        # Look in the personal data first.
+        for restriction_key in reversed(
+            await self.get_updated_restriction_keys(user_id)
+        ):
+            out = await self.cache_provider.get_element(
+                get_element_id(collection_string, id), restriction_key
+            )
+            if out:
+                return self.codec.loads(out)
+        return None
 
     async def get_current_change_id(self) -> int:
         """
@@ -440,7 +1173,45 @@ class ElementCache:
         return value
 
 
-def load_element_cache(restricted_data: bool = True) -> ElementCache:
+def merge_restricted_data(
+    parts: List[Tuple[Dict[str, List[Dict[str, Any]]], List[str]]]
+) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+    """
+    Merges the results of ElementCache.get_restricted_data_part().
+
+    The elements of later parts override the elements of earlier parts. An
+    element is only deleted, if it is deleted in all parts.
+    """
+    changed: Dict[str, Dict[int, Dict[str, Any]]] = defaultdict(dict)
+    deleted: Optional[List[str]] = None
+    for changed_elements, deleted_elements in parts:
+        for collection_string, elements in changed_elements.items():
+            for element in elements:
+                changed[collection_string][element["id"]] = element
+        if deleted is None:
+            deleted = deleted_elements
+        else:
+            deleted = [
+                element_id for element_id in deleted if element_id in deleted_elements
+            ]
+    return (
+        {
+            collection_string: list(elements.values())
+            for collection_string, elements in changed.items()
+        },
+        deleted or [],
+    )
+
+
+def load_element_cache(
+    restricted_data: bool = True,
+    decoded_data_cache_size: int = 0,
+    codec: str = "json",
+    change_id_retention_count: Optional[int] = None,
+    change_id_retention_age: Optional[float] = None,
+    build_workers: int = 1,
+    snapshot_path: Optional[str] = None,
+) -> ElementCache:
     """
     Generates an element cache instance.
     """
@@ -452,9 +1223,29 @@ def load_element_cache(restricted_data: bool = True) -> ElementCache:
     return ElementCache(
         cache_provider_class=cache_provider_class,
         use_restricted_data_cache=restricted_data,
+        decoded_data_cache_size=decoded_data_cache_size,
+        codec=get_codec(codec),
+        change_id_retention_count=change_id_retention_count,
+        change_id_retention_age=change_id_retention_age,
+        build_workers=build_workers,
+        snapshot=ElementCacheSnapshot(snapshot_path) if snapshot_path else None,
     )
 
 
 # Set the element_cache
 use_restricted_data = getattr(settings, "RESTRICTED_DATA_CACHE", True)
-element_cache = load_element_cache(restricted_data=use_restricted_data)
+decoded_data_cache_size = getattr(settings, "DECODED_DATA_CACHE_SIZE", 100_000)
+element_cache_codec = getattr(settings, "ELEMENT_CACHE_CODEC", "json")
+change_id_retention_count = getattr(settings, "CHANGE_ID_RETENTION_COUNT", 100_000)
+change_id_retention_age = getattr(settings, "CHANGE_ID_RETENTION_AGE", None)
+build_workers = getattr(settings, "ELEMENT_CACHE_BUILD_WORKERS", 4)
+snapshot_path = getattr(settings, "ELEMENT_CACHE_SNAPSHOT_PATH", None)
+element_cache = load_element_cache(
+    restricted_data=use_restricted_data,
+    decoded_data_cache_size=decoded_data_cache_size,
+    codec=element_cache_codec,
+    change_id_retention_count=change_id_retention_count,
+    change_id_retention_age=change_id_retention_age,
+    build_workers=build_workers,
+    snapshot_path=snapshot_path,
+)
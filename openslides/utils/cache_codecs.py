@@ -0,0 +1,119 @@
+import json
+from typing import Any, Dict, Union
+
+from django.conf import settings
+from typing_extensions import Protocol
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # type: ignore
+
+
+class ElementCodec(Protocol):
+    """
+    Base class for codecs, that encode the elements in the element cache.
+
+    See JSONCodec as reverence implementation.
+    """
+
+    name: str
+
+    def dumps(self, element: Dict[str, Any]) -> Union[str, bytes]:
+        ...
+
+    def loads(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        ...
+
+
+class JSONCodec:
+    """
+    Codec that uses the json module of the standard library.
+    """
+
+    name = "json"
+
+    def dumps(self, element: Dict[str, Any]) -> Union[str, bytes]:
+        return json.dumps(element)
+
+    def loads(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """
+    Codec that uses orjson. The encoded elements are the same json as with
+    the JSONCodec, so both codecs can read the data of each other.
+    """
+
+    name = "orjson"
+
+    def dumps(self, element: Dict[str, Any]) -> Union[str, bytes]:
+        return orjson.dumps(element, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    """
+    Codec that uses msgpack. The encoded elements are smaller then json.
+
+    In contrast to json, msgpack does not convert the keys of dicts to
+    strings.
+    """
+
+    name = "msgpack"
+
+    def dumps(self, element: Dict[str, Any]) -> Union[str, bytes]:
+        return msgpack.packb(element, use_bin_type=True)
+
+    def loads(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        return msgpack.unpackb(data, raw=False)
+
+
+def get_available_codecs() -> Dict[str, ElementCodec]:
+    """
+    Returns all codecs, whose library is installed, ordered by there names.
+    """
+    codecs: Dict[str, ElementCodec] = {"json": JSONCodec()}
+    if orjson is not None:
+        codecs["orjson"] = OrjsonCodec()
+    if msgpack is not None:
+        codecs["msgpack"] = MsgpackCodec()
+    return codecs
+
+
+def get_codec(name: str) -> ElementCodec:
+    """
+    Returns the codec with the name.
+
+    Falls back to the JSONCodec, if the library of the codec is not installed.
+    Raises a ValueError if the codec is unknown.
+    """
+    if name not in ("json", "orjson", "msgpack"):
+        raise ValueError(f"Unknown element cache codec {name}.")
+    return get_available_codecs().get(name, JSONCodec())
+
+
+def dumps_json(data: Any) -> str:
+    """
+    Encodes data to json.
+
+    This is used for the messages to the websocket clients. Uses orjson only
+    if it is installed and configured as ELEMENT_CACHE_CODEC. orjson writes
+    compact json with unescaped unicode, so the messages are not byte
+    identical to the messages of the json module.
+    """
+    if (
+        orjson is not None
+        and getattr(settings, "ELEMENT_CACHE_CODEC", "json") == "orjson"
+    ):
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data)
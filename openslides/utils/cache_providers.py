@@ -1,11 +1,16 @@
+import asyncio
+import hashlib
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from time import monotonic
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union, cast
+from uuid import uuid4
 
 from django.apps import apps
 from typing_extensions import Protocol
 
 from .redis import use_redis
-from .utils import split_element_id, str_dict_to_bytes
+from .utils import split_element_id, str_dict_to_bytes, to_bytes
 
 
 if use_redis:
@@ -22,17 +27,23 @@ class ElementCacheProvider(Protocol):
     async def clear_cache(self) -> None:
         ...
 
-    async def reset_full_cache(self, data: Dict[str, str]) -> None:
+    async def del_staged_elements(self) -> None:
         ...
 
-    async def data_exists(self, user_id: Optional[int] = None) -> bool:
+    async def add_staged_elements(self, data: Dict[str, Union[str, bytes]]) -> None:
         ...
 
-    async def add_elements(self, elements: List[str]) -> None:
+    async def commit_staged_elements(self) -> None:
+        ...
+
+    async def data_exists(self, restriction_key: Optional[str] = None) -> bool:
+        ...
+
+    async def add_elements(self, elements: List[Union[str, bytes]]) -> None:
         ...
 
     async def del_elements(
-        self, elements: List[str], user_id: Optional[int] = None
+        self, elements: List[str], restriction_key: Optional[str] = None
     ) -> None:
         ...
 
@@ -41,35 +52,63 @@ class ElementCacheProvider(Protocol):
     ) -> int:
         ...
 
-    async def get_all_data(self, user_id: Optional[int] = None) -> Dict[bytes, bytes]:
+    async def get_all_data(
+        self, restriction_key: Optional[str] = None
+    ) -> Dict[bytes, bytes]:
+        ...
+
+    async def get_collection_data(
+        self, collection_string: str, restriction_key: Optional[str] = None
+    ) -> Dict[bytes, bytes]:
+        ...
+
+    async def scan_data(
+        self,
+        cursor: int,
+        count: int,
+        collection_string: str = "",
+        restriction_key: Optional[str] = None,
+    ) -> Tuple[int, Dict[bytes, bytes]]:
         ...
 
     async def get_data_since(
-        self, change_id: int, user_id: Optional[int] = None, max_change_id: int = -1
+        self,
+        change_id: int,
+        restriction_key: Optional[str] = None,
+        max_change_id: int = -1,
     ) -> Tuple[Dict[str, List[bytes]], List[str]]:
         ...
 
     async def get_element(
-        self, element_id: str, user_id: Optional[int] = None
+        self, element_id: str, restriction_key: Optional[str] = None
     ) -> Optional[bytes]:
         ...
 
-    async def del_restricted_data(self, user_id: int) -> None:
+    async def del_restricted_data(self, restriction_key: str) -> None:
         ...
 
-    async def set_lock(self, lock_name: str) -> bool:
+    async def set_lock(self, lock_name: str, timeout: float) -> Optional[str]:
         ...
 
     async def get_lock(self, lock_name: str) -> bool:
         ...
 
-    async def del_lock(self, lock_name: str) -> None:
+    async def del_lock(self, lock_name: str, token: Optional[str] = None) -> None:
+        ...
+
+    async def wait_for_lock(self, lock_name: str) -> None:
         ...
 
-    async def get_change_id_user(self, user_id: int) -> Optional[int]:
+    async def get_restricted_data_changes(
+        self, restriction_key: str
+    ) -> Tuple[
+        Optional[int], Optional[int], Optional[Tuple[Dict[str, List[bytes]], List[str]]]
+    ]:
         ...
 
-    async def update_restricted_data(self, user_id: int, data: Dict[str, str]) -> None:
+    async def update_restricted_data(
+        self, restriction_key: str, data: Dict[str, Union[str, bytes]]
+    ) -> None:
         ...
 
     async def get_current_change_id(self) -> List[Tuple[str, int]]:
@@ -78,99 +117,333 @@ class ElementCacheProvider(Protocol):
     async def get_lowest_change_id(self) -> Optional[int]:
         ...
 
+    async def compact_change_ids(self, lowest_change_id: int) -> int:
+        ...
+
+    async def get_change_id_log_size(self) -> int:
+        ...
+
+    async def update_projector_hashes(self, hashes: Dict[int, str]) -> List[int]:
+        ...
+
 
 class RedisCacheProvider:
     """
     Cache provider that loads and saves the data to redis.
+
+    The full_data is saved in one hash per collection. The names of all
+    collections are saved in a set, so all full_data can be found. The same
+    way, the restriction_keys of all restricted_data_caches and the names of
+    all locks are saved in sets. So the cache can be reset without the KEYS
+    command, that blocks redis for all its keys.
+
+    Some lua_scripts build the names of the hashes from the prefixes in ARGV
+    and the members of the sets, so they can not declare all keys in KEYS.
+    Therefore the provider needs a single redis node and does not work with
+    Redis Cluster.
     """
 
-    full_data_cache_key: str = "full_data"
-    restricted_user_cache_key: str = "restricted_data:{user_id}"
+    full_data_cache_key: str = "full_data:{collection_string}"
+    full_data_collections_cache_key: str = "full_data_collections"
+    staged_data_cache_key: str = "staged_data:{collection_string}"
+    staged_data_collections_cache_key: str = "staged_data_collections"
+    restricted_data_cache_key: str = "restricted_data:{restriction_key}"
+    restricted_data_keys_cache_key: str = "restricted_data_keys"
     change_id_cache_key: str = "change_id"
+    projector_hashes_cache_key: str = "projector_hashes"
+    lock_cache_key: str = "lock_{lock_name}"
+    lock_names_cache_key: str = "lock_names"
+    lock_channel_key: str = "lock_released:{lock_name}"
+    layout_cache_key: str = "layout"
     prefix: str = "element_cache_"
 
-    def get_full_data_cache_key(self) -> str:
-        return "".join((self.prefix, self.full_data_cache_key))
+    # Version of the key layout. clear_cache only knows the keys of this
+    # layout from the tracked sets. When the version in redis differs, for
+    # example after an upgrade, all keys with the prefix are scanned once.
+    layout_version: str = "1"
+
+    # Seconds after which a waiter looks at a lock again, even when there was
+    # no message that it was released. For example when the lock was deleted
+    # with clear_cache.
+    lock_check_interval: float = 1
+
+    def get_full_data_cache_key(self, collection_string: str) -> str:
+        return "".join(
+            (
+                self.prefix,
+                self.full_data_cache_key.format(collection_string=collection_string),
+            )
+        )
+
+    def get_full_data_collections_cache_key(self) -> str:
+        return "".join((self.prefix, self.full_data_collections_cache_key))
+
+    def get_staged_data_cache_key(self, collection_string: str) -> str:
+        return "".join(
+            (
+                self.prefix,
+                self.staged_data_cache_key.format(collection_string=collection_string),
+            )
+        )
+
+    def get_staged_data_collections_cache_key(self) -> str:
+        return "".join((self.prefix, self.staged_data_collections_cache_key))
 
-    def get_restricted_data_cache_key(self, user_id: int) -> str:
+    def get_restricted_data_cache_key(self, restriction_key: str) -> str:
         return "".join(
-            (self.prefix, self.restricted_user_cache_key.format(user_id=user_id))
+            (
+                self.prefix,
+                self.restricted_data_cache_key.format(restriction_key=restriction_key),
+            )
         )
 
+    def get_restricted_data_keys_cache_key(self) -> str:
+        return "".join((self.prefix, self.restricted_data_keys_cache_key))
+
     def get_change_id_cache_key(self) -> str:
         return "".join((self.prefix, self.change_id_cache_key))
 
+    def get_projector_hashes_cache_key(self) -> str:
+        return "".join((self.prefix, self.projector_hashes_cache_key))
+
+    def get_lock_cache_key(self, lock_name: str) -> str:
+        return "".join((self.prefix, self.lock_cache_key.format(lock_name=lock_name)))
+
+    def get_lock_names_cache_key(self) -> str:
+        return "".join((self.prefix, self.lock_names_cache_key))
+
+    def get_lock_channel_key(self, lock_name: str) -> str:
+        return "".join((self.prefix, self.lock_channel_key.format(lock_name=lock_name)))
+
+    def get_layout_cache_key(self) -> str:
+        return "".join((self.prefix, self.layout_cache_key))
+
+    async def eval(
+        self,
+        redis: "aioredis.Redis",
+        script_name: str,
+        keys: List[str] = [],
+        args: List[Any] = [],
+    ) -> Any:
+        """
+        Runs one of the lua_scripts by its sha1 hash with EVALSHA.
+
+        If redis does not know the script, for example after redis was
+        restarted, it is loaded with SCRIPT LOAD and run again. So each script
+        is only sent once to redis.
+        """
+        script, sha = lua_scripts[script_name]
+        try:
+            return await redis.evalsha(sha, keys=keys, args=args)
+        except aioredis.errors.ReplyError as error:
+            if not str(error).startswith("NOSCRIPT"):
+                raise
+        await redis.script_load(script)
+        return await redis.evalsha(sha, keys=keys, args=args)
+
     async def clear_cache(self) -> None:
         """
         Deleted all cache entries created with this element cache.
+
+        The keys are built from the tracked collections, restriction_keys and
+        lock names and deleted in batches with UNLINK, so redis is not blocked
+        for other clients. If the layout_version in redis is missing or old,
+        the keys are not all tracked. Then all keys with the prefix are
+        scanned and deleted once.
         """
         async with get_connection() as redis:
-            await redis.eval(
-                "return redis.call('del', 'fake_key', unpack(redis.call('keys', ARGV[1])))",
-                keys=[],
-                args=[f"{self.prefix}*"],
+            if (
+                await redis.get(self.get_layout_cache_key())
+                != self.layout_version.encode()
+            ):
+                await self.clear_cache_by_scan(redis)
+                await redis.set(self.get_layout_cache_key(), self.layout_version)
+                return
+
+            tr = redis.multi_exec()
+            full_data_collections = tr.smembers(
+                self.get_full_data_collections_cache_key(), encoding="utf-8"
             )
+            staged_data_collections = tr.smembers(
+                self.get_staged_data_collections_cache_key(), encoding="utf-8"
+            )
+            restriction_keys = tr.smembers(
+                self.get_restricted_data_keys_cache_key(), encoding="utf-8"
+            )
+            lock_names = tr.smembers(self.get_lock_names_cache_key(), encoding="utf-8")
+            await tr.execute()
 
-    async def reset_full_cache(self, data: Dict[str, str]) -> None:
+            keys = [
+                *(
+                    self.get_full_data_cache_key(collection_string)
+                    for collection_string in await full_data_collections
+                ),
+                *(
+                    self.get_staged_data_cache_key(collection_string)
+                    for collection_string in await staged_data_collections
+                ),
+                *(
+                    self.get_restricted_data_cache_key(restriction_key)
+                    for restriction_key in await restriction_keys
+                ),
+                *(self.get_lock_cache_key(lock_name) for lock_name in await lock_names),
+                self.get_change_id_cache_key(),
+                self.get_projector_hashes_cache_key(),
+                # Delete the sets last, so the keys can still be found, if
+                # a batch fails.
+                self.get_full_data_collections_cache_key(),
+                self.get_staged_data_collections_cache_key(),
+                self.get_restricted_data_keys_cache_key(),
+                self.get_lock_names_cache_key(),
+            ]
+            while keys:
+                await redis.unlink(*keys[:1000])
+                keys = keys[1000:]
+
+    async def clear_cache_by_scan(self, redis: "aioredis.Redis") -> None:
         """
-        Deletes the full_data_cache and write new data in it.
+        Deletes all keys with the prefix, also the ones that are not tracked,
+        for example keys of an old layout.
 
-        Also deletes the restricted_data_cache and the change_id_cache.
+        The keys are found with SCAN, so redis is not blocked like with KEYS.
+        """
+        keys: List[bytes] = []
+        async for key in redis.iscan(match=f"{self.prefix}*", count=1000):
+            keys.append(key)
+            if len(keys) >= 1000:
+                await redis.unlink(*keys)
+                keys = []
+        if keys:
+            await redis.unlink(*keys)
+
+    async def del_staged_elements(self) -> None:
+        """
+        Deletes the staged elements, for example of an aborted cache build.
         """
         async with get_connection() as redis:
-            tr = redis.multi_exec()
-            # like clear_cache but does not delete a lock
-            tr.eval(
-                "return redis.call('del', 'fake_key', unpack(redis.call('keys', ARGV[1])))",
-                keys=[],
-                args=[f"{self.prefix}{self.restricted_user_cache_key}*"],
+            await self.eval(
+                redis,
+                "delete_full_data",
+                keys=[self.get_staged_data_collections_cache_key()],
+                args=[self.get_staged_data_cache_key("")],
             )
-            tr.delete(self.get_change_id_cache_key())
-            tr.delete(self.get_full_data_cache_key())
-            tr.hmset_dict(self.get_full_data_cache_key(), data)
+
+    async def add_staged_elements(self, data: Dict[str, Union[str, bytes]]) -> None:
+        """
+        Writes elements to the staging area of the full_data_cache.
+
+        data has to be a dict where the key is an element_id and the value the
+        encoded element. The staged elements can not be read until
+        commit_staged_elements is called.
+        """
+        mapping: Dict[str, Dict[str, Union[str, bytes]]] = defaultdict(dict)
+        for element_id, element in data.items():
+            collection_string, __ = split_element_id(element_id)
+            mapping[collection_string][element_id] = element
+        if not mapping:
+            return
+
+        async with get_connection() as redis:
+            tr = redis.multi_exec()
+            for collection_string, collection_data in mapping.items():
+                tr.hmset_dict(
+                    self.get_staged_data_cache_key(collection_string), collection_data
+                )
+            tr.sadd(self.get_staged_data_collections_cache_key(), *mapping.keys())
             await tr.execute()
 
-    async def data_exists(self, user_id: Optional[int] = None) -> bool:
+    async def commit_staged_elements(self) -> None:
+        """
+        Replaces the full_data_cache with the staged elements.
+
+        Also deletes the restricted_data_cache and the change_id_cache. The
+        hashes are renamed in one lua script, so readers see either the old
+        or the new full_data.
+        """
+        async with get_connection() as redis:
+            await self.eval(
+                redis,
+                "commit_staged_data",
+                keys=[
+                    self.get_full_data_collections_cache_key(),
+                    self.get_staged_data_collections_cache_key(),
+                    self.get_change_id_cache_key(),
+                    self.get_restricted_data_keys_cache_key(),
+                ],
+                args=[
+                    self.get_full_data_cache_key(""),
+                    self.get_staged_data_cache_key(""),
+                    self.get_restricted_data_cache_key(""),
+                ],
+            )
+
+    async def data_exists(self, restriction_key: Optional[str] = None) -> bool:
         """
         Returns True, when there is data in the cache.
 
-        If user_id is None, the method tests for full_data. If user_id is an int, it tests
-        for the restricted_data_cache for the user with the user_id. 0 is for anonymous.
+        If restriction_key is None, the method tests for full_data. If restriction_key is a
+        string, it tests for the restricted_data_cache with this key.
         """
         async with get_connection() as redis:
-            if user_id is None:
-                cache_key = self.get_full_data_cache_key()
+            if restriction_key is None:
+                cache_key = self.get_full_data_collections_cache_key()
             else:
-                cache_key = self.get_restricted_data_cache_key(user_id)
+                cache_key = self.get_restricted_data_cache_key(restriction_key)
             return await redis.exists(cache_key)
 
-    async def add_elements(self, elements: List[str]) -> None:
+    async def add_elements(self, elements: List[Union[str, bytes]]) -> None:
         """
         Add or change elements to the cache.
 
         elements is a list with an even len. the odd values are the element_ids and the even
         values are the elements. The elements have to be encoded, for example with json.
         """
+        mapping: Dict[str, List[Union[str, bytes]]] = defaultdict(list)
+        for i in range(0, len(elements), 2):
+            collection_string, __ = split_element_id(elements[i])
+            mapping[collection_string].extend((elements[i], elements[i + 1]))
+        if not mapping:
+            return
+
         async with get_connection() as redis:
-            await redis.hmset(self.get_full_data_cache_key(), *elements)
+            tr = redis.multi_exec()
+            for collection_string, collection_elements in mapping.items():
+                tr.hmset(
+                    self.get_full_data_cache_key(collection_string),
+                    *collection_elements,
+                )
+            tr.sadd(self.get_full_data_collections_cache_key(), *mapping.keys())
+            await tr.execute()
 
     async def del_elements(
-        self, elements: List[str], user_id: Optional[int] = None
+        self, elements: List[str], restriction_key: Optional[str] = None
     ) -> None:
         """
         Deletes elements from the cache.
 
         elements has to be a list of element_ids.
 
-        If user_id is None, the elements are deleted from the full_data cache. If user_id is an
-        int, the elements are deleted one restricted_data_cache. 0 is for anonymous.
+        If restriction_key is None, the elements are deleted from the full_data cache. If
+        restriction_key is a string, the elements are deleted from the restricted_data_cache
+        with this key.
         """
         async with get_connection() as redis:
-            if user_id is None:
-                cache_key = self.get_full_data_cache_key()
+            if restriction_key is None:
+                mapping: Dict[str, List[str]] = defaultdict(list)
+                for element_id in elements:
+                    collection_string, __ = split_element_id(element_id)
+                    mapping[collection_string].append(element_id)
+
+                tr = redis.multi_exec()
+                for collection_string, element_ids in mapping.items():
+                    tr.hdel(
+                        self.get_full_data_cache_key(collection_string), *element_ids
+                    )
+                await tr.execute()
             else:
-                cache_key = self.get_restricted_data_cache_key(user_id)
-            await redis.hdel(cache_key, *elements)
+                await redis.hdel(
+                    self.get_restricted_data_cache_key(restriction_key), *elements
+                )
 
     async def add_changed_elements(
         self, default_change_id: int, element_ids: Iterable[str]
@@ -182,46 +455,113 @@ class RedisCacheProvider:
         """
         async with get_connection() as redis:
             return int(
-                await redis.eval(
-                    lua_script_change_data,
+                await self.eval(
+                    redis,
+                    "change_data",
                     keys=[self.get_change_id_cache_key()],
                     args=[default_change_id, *element_ids],
                 )
             )
 
-    async def get_all_data(self, user_id: Optional[int] = None) -> Dict[bytes, bytes]:
+    async def get_all_data(
+        self, restriction_key: Optional[str] = None
+    ) -> Dict[bytes, bytes]:
         """
         Returns all data from a cache.
 
-        if user_id is None, then the data is returned from the full_data_cache. If it is and
-        int, it is returned from a restricted_data_cache. 0 is for anonymous.
+        if restriction_key is None, then the data is returned from the full_data_cache. If it
+        is a string, it is returned from the restricted_data_cache with this key.
+        """
+        async with get_connection() as redis:
+            if restriction_key is None:
+                return await aioredis.util.wait_make_dict(
+                    self.eval(
+                        redis,
+                        "get_all_full_data",
+                        keys=[self.get_full_data_collections_cache_key()],
+                        args=[self.get_full_data_cache_key("")],
+                    )
+                )
+            return await redis.hgetall(
+                self.get_restricted_data_cache_key(restriction_key)
+            )
+
+    async def get_collection_data(
+        self, collection_string: str, restriction_key: Optional[str] = None
+    ) -> Dict[bytes, bytes]:
         """
-        if user_id is None:
-            cache_key = self.get_full_data_cache_key()
+        Returns all data of one collection from a cache.
+
+        The keys of the returned dict are the element_ids.
+
+        if restriction_key is None, then the data is returned from the full_data_cache. If it
+        is a string, it is returned from the restricted_data_cache with this key. The
+        restricted_data_cache is not split by collection, so it is scanned on the
+        redis server.
+        """
+        async with get_connection() as redis:
+            if restriction_key is None:
+                return await redis.hgetall(
+                    self.get_full_data_cache_key(collection_string)
+                )
+
+            out: Dict[bytes, bytes] = {}
+            async for element_id, element in redis.ihscan(
+                self.get_restricted_data_cache_key(restriction_key),
+                match=f"{collection_string}:*",
+            ):
+                out[element_id] = element
+            return out
+
+    async def scan_data(
+        self,
+        cursor: int,
+        count: int,
+        collection_string: str = "",
+        restriction_key: Optional[str] = None,
+    ) -> Tuple[int, Dict[bytes, bytes]]:
+        """
+        Returns some elements of a cache and the cursor to get the next
+        elements. Start with the cursor 0. The returned cursor is 0, if all
+        elements were returned.
+
+        If restriction_key is None, the elements of the collection are returned
+        from the full_data_cache. Else all elements of the restricted_data_cache
+        with this key are returned, the collection_string is ignored.
+
+        count is only a hint for redis. It can return more or less elements.
+        """
+        if restriction_key is None:
+            cache_key = self.get_full_data_cache_key(collection_string)
         else:
-            cache_key = self.get_restricted_data_cache_key(user_id)
+            cache_key = self.get_restricted_data_cache_key(restriction_key)
 
         async with get_connection() as redis:
-            return await redis.hgetall(cache_key)
+            cursor, elements = await redis.hscan(cache_key, cursor, count=count)
+        return cursor, dict(elements)
 
     async def get_element(
-        self, element_id: str, user_id: Optional[int] = None
+        self, element_id: str, restriction_key: Optional[str] = None
     ) -> Optional[bytes]:
         """
         Returns one element from the cache.
 
         Returns None, when the element does not exist.
         """
-        if user_id is None:
-            cache_key = self.get_full_data_cache_key()
+        if restriction_key is None:
+            collection_string, __ = split_element_id(element_id)
+            cache_key = self.get_full_data_cache_key(collection_string)
         else:
-            cache_key = self.get_restricted_data_cache_key(user_id)
+            cache_key = self.get_restricted_data_cache_key(restriction_key)
 
         async with get_connection() as redis:
             return await redis.hget(cache_key, element_id)
 
     async def get_data_since(
-        self, change_id: int, user_id: Optional[int] = None, max_change_id: int = -1
+        self,
+        change_id: int,
+        restriction_key: Optional[str] = None,
+        max_change_id: int = -1,
     ) -> Tuple[Dict[str, List[bytes]], List[str]]:
         """
         Returns all elements since a change_id.
@@ -230,15 +570,19 @@ class RedisCacheProvider:
         the key is the collection_string and the value a list of (json-) encoded elements. The
         second element is a list of element_ids, that have been deleted since the change_id.
 
-        if user_id is None, the full_data is returned. If user_id is an int, the restricted_data
-        for an user is used. 0 is for the anonymous user.
+        if restriction_key is None, the full_data is returned. If restriction_key is a string,
+        the restricted_data_cache with this key is used.
         """
-        changed_elements: Dict[str, List[bytes]] = defaultdict(list)
-        deleted_elements: List[str] = []
-        if user_id is None:
-            cache_key = self.get_full_data_cache_key()
+        if restriction_key is None:
+            # The hash of each element is found by its collection_string.
+            keys = [self.get_change_id_cache_key()]
+            args = [self.get_full_data_cache_key("")]
         else:
-            cache_key = self.get_restricted_data_cache_key(user_id)
+            keys = [
+                self.get_change_id_cache_key(),
+                self.get_restricted_data_cache_key(restriction_key),
+            ]
+            args = []
 
         # Convert max_change_id to a string. If its negative, use the string '+inf'
         redis_max_change_id = "+inf" if max_change_id < 0 else str(max_change_id)
@@ -249,90 +593,155 @@ class RedisCacheProvider:
             # even values the element as json. The function wait_make_dict creates
             # a python dict from the returned list.
             elements: Dict[bytes, Optional[bytes]] = await aioredis.util.wait_make_dict(
-                redis.eval(
-                    """
-                -- Get change ids of changed elements
-                local element_ids = redis.call('zrangebyscore', KEYS[1], ARGV[1], ARGV[2])
-
-                -- Save elements in array. Rotate element_id and element_json
-                local elements = {}
-                for _, element_id in pairs(element_ids) do
-                  table.insert(elements, element_id)
-                  table.insert(elements, redis.call('hget', KEYS[2], element_id))
-                end
-                return elements
-                """,
-                    keys=[self.get_change_id_cache_key(), cache_key],
-                    args=[change_id, redis_max_change_id],
+                self.eval(
+                    redis,
+                    "get_data_since",
+                    keys=keys,
+                    args=[change_id, redis_max_change_id, *args],
                 )
             )
+        return split_data_since(elements)
 
-        for element_id, element_json in elements.items():
-            if element_id.startswith(b"_config"):
-                # Ignore config values from the change_id cache key
-                continue
-            if element_json is None:
-                # The element is not in the cache. It has to be deleted.
-                deleted_elements.append(element_id.decode())
-            else:
-                collection_string, id = split_element_id(element_id)
-                changed_elements[collection_string].append(element_json)
-        return changed_elements, deleted_elements
-
-    async def del_restricted_data(self, user_id: int) -> None:
+    async def del_restricted_data(self, restriction_key: str) -> None:
         """
-        Deletes all restricted_data for an user. 0 is for the anonymous user.
+        Deletes one restricted_data_cache.
         """
         async with get_connection() as redis:
-            await redis.delete(self.get_restricted_data_cache_key(user_id))
+            tr = redis.multi_exec()
+            tr.delete(self.get_restricted_data_cache_key(restriction_key))
+            tr.srem(self.get_restricted_data_keys_cache_key(), restriction_key)
+            await tr.execute()
 
-    async def set_lock(self, lock_name: str) -> bool:
+    async def set_lock(self, lock_name: str, timeout: float) -> Optional[str]:
         """
         Tries to sets a lock.
 
-        Returns True when the lock could be set.
+        Returns a random token, when the lock could be set. The token has to
+        be used to release the lock with del_lock.
+
+        Returns None when the lock was already set.
 
-        Returns False when the lock was already set.
+        The lock expires after timeout seconds, so a crashed worker can not
+        block the other workers forever. The lock_name is saved in a set, so
+        clear_cache can find the lock.
         """
-        # TODO: Improve lock. See: https://redis.io/topics/distlock
+        token = uuid4().hex
         async with get_connection() as redis:
-            return await redis.setnx(f"{self.prefix}lock_{lock_name}", 1)
+            tr = redis.multi_exec()
+            lock_set = tr.set(
+                self.get_lock_cache_key(lock_name),
+                token,
+                pexpire=int(timeout * 1000),
+                exist=redis.SET_IF_NOT_EXIST,
+            )
+            tr.sadd(self.get_lock_names_cache_key(), lock_name)
+            await tr.execute()
+            if await lock_set:
+                return token
+        return None
 
     async def get_lock(self, lock_name: str) -> bool:
         """
-        Returns True, when the lock for the restricted_data of an user is set. Else False.
+        Returns True, when the lock is set. Else False.
         """
         async with get_connection() as redis:
-            return await redis.get(f"{self.prefix}lock_{lock_name}")
+            return bool(await redis.exists(self.get_lock_cache_key(lock_name)))
 
-    async def del_lock(self, lock_name: str) -> None:
+    async def del_lock(self, lock_name: str, token: Optional[str] = None) -> None:
         """
-        Deletes the lock for the restricted_data of an user. Does nothing when the
-        lock is not set.
+        Deletes the lock and wakes up all waiters.
+
+        Does nothing when the lock is not set or when it is set with an other
+        token then the given one, for example because it expired and was set
+        by an other worker. Without a token, the lock is always deleted.
         """
         async with get_connection() as redis:
-            await redis.delete(f"{self.prefix}lock_{lock_name}")
+            await self.eval(
+                redis,
+                "del_lock",
+                keys=[self.get_lock_cache_key(lock_name)],
+                args=[self.get_lock_channel_key(lock_name), token or ""],
+            )
 
-    async def get_change_id_user(self, user_id: int) -> Optional[int]:
+    async def wait_for_lock(self, lock_name: str) -> None:
         """
-        Get the change_id for the restricted_data of an user.
+        Waits until the lock is released or expired.
 
-        This is the change_id where the restricted_data was last calculated.
+        The waiter is woken up by a message on the lock channel, that is sent
+        by del_lock.
+        """
+        async with get_connection(exclusive=True) as subscriber:
+            # Subscribe before looking at the lock, so the message can not be
+            # missed.
+            channel_key = self.get_lock_channel_key(lock_name)
+            channel, = await subscriber.subscribe(channel_key)
+            try:
+                async with get_connection() as redis:
+                    while True:
+                        ttl = await redis.pttl(self.get_lock_cache_key(lock_name))
+                        if ttl == -2:
+                            # The lock does not exist.
+                            return
+                        timeout = self.lock_check_interval
+                        if ttl >= 0:
+                            timeout = min(timeout, ttl / 1000)
+                        try:
+                            await asyncio.wait_for(channel.get(), timeout)
+                        except asyncio.TimeoutError:
+                            pass
+            finally:
+                # Give the connection back to the pool in a usable state.
+                await subscriber.unsubscribe(channel_key)
+
+    async def get_restricted_data_changes(
+        self, restriction_key: str
+    ) -> Tuple[
+        Optional[int], Optional[int], Optional[Tuple[Dict[str, List[bytes]], List[str]]]
+    ]:
+        """
+        Returns the change_id of a restricted_data_cache, the current change_id
+        and the full_data, that was changed since the restricted_data_cache was
+        updated, in one lua script.
+
+        The full_data is returned like in get_data_since. It is None, if the
+        restricted_data_cache has no change_id, if it is up to date or if its
+        change_id is lower then the lowest change_id. In the last case, the
+        restricted_data_cache has to be rebuild from all full_data.
         """
         async with get_connection() as redis:
-            return await redis.hget(
-                self.get_restricted_data_cache_key(user_id), "_config:change_id"
+            result = await self.eval(
+                redis,
+                "get_restricted_data_changes",
+                keys=[
+                    self.get_change_id_cache_key(),
+                    self.get_restricted_data_cache_key(restriction_key),
+                ],
+                args=[self.get_full_data_cache_key("")],
             )
+        restricted_change_id, current_change_id, has_data, *elements = result
+        data = None
+        if has_data:
+            data = split_data_since(dict(zip(elements[::2], elements[1::2])))
+        return (
+            int(restricted_change_id) if restricted_change_id is not None else None,
+            int(float(current_change_id)) if current_change_id is not None else None,
+            data,
+        )
 
-    async def update_restricted_data(self, user_id: int, data: Dict[str, str]) -> None:
+    async def update_restricted_data(
+        self, restriction_key: str, data: Dict[str, Union[str, bytes]]
+    ) -> None:
         """
-        Updates the restricted_data for an user.
+        Updates a restricted_data_cache.
 
         data has to be a dict where the key is an element_id and the value the (json-) encoded
         element.
         """
         async with get_connection() as redis:
-            await redis.hmset_dict(self.get_restricted_data_cache_key(user_id), data)
+            tr = redis.multi_exec()
+            tr.hmset_dict(self.get_restricted_data_cache_key(restriction_key), data)
+            tr.sadd(self.get_restricted_data_keys_cache_key(), restriction_key)
+            await tr.execute()
 
     async def get_current_change_id(self) -> List[Tuple[str, int]]:
         """
@@ -354,6 +763,51 @@ class RedisCacheProvider:
                 self.get_change_id_cache_key(), "_config:lowest_change_id"
             )
 
+    async def compact_change_ids(self, lowest_change_id: int) -> int:
+        """
+        Removes all change_ids lower then lowest_change_id and sets it as the
+        new lowest change_id.
+
+        Does nothing, if the lowest change_id is already higher, for example
+        because an other process has compacted the change_ids. Returns the
+        lowest change_id after the call or 0, if there are no change_ids.
+        """
+        async with get_connection() as redis:
+            return await self.eval(
+                redis,
+                "compact_change_ids",
+                keys=[self.get_change_id_cache_key()],
+                args=[lowest_change_id],
+            )
+
+    async def get_change_id_log_size(self) -> int:
+        """
+        Returns the number of element_ids in the change_id log.
+        """
+        async with get_connection() as redis:
+            # The lowest_change_id is not an element_id.
+            return max(await redis.zcard(self.get_change_id_cache_key()) - 1, 0)
+
+    async def update_projector_hashes(self, hashes: Dict[int, str]) -> List[int]:
+        """
+        Saves the hashes of the data of all projectors.
+
+        Returns the ids of the projectors, whose hash has changed. This
+        includes the projectors, that have no hash anymore. Their saved hash is
+        deleted.
+        """
+        args: List[Any] = []
+        for projector_id, projector_hash in hashes.items():
+            args.extend((projector_id, projector_hash))
+        async with get_connection() as redis:
+            changed = await self.eval(
+                redis,
+                "update_projector_hashes",
+                keys=[self.get_projector_hashes_cache_key()],
+                args=args,
+            )
+        return [int(projector_id) for projector_id in changed]
+
 
 class MemmoryCacheProvider:
     """
@@ -363,47 +817,84 @@ class MemmoryCacheProvider:
 
     This provider supports only one process. It saves the data into the memory.
     When you use different processes they will use diffrent data.
+
+    The change_ids are kept in a sorted list next to change_id_data, so the
+    current and the lowest change_id and the change_ids of a range can be
+    found without looking at all change_ids. change_id_data must not be
+    changed in place. Assign a new dict to rebuild the sorted list.
+
+    The waiters of a lock wait for an asyncio.Event, that is set when the lock
+    is released or expires.
     """
 
     def __init__(self) -> None:
+        self.lock_waiters: Dict[
+            str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]
+        ] = defaultdict(list)
         self.set_data_dicts()
 
     def set_data_dicts(self) -> None:
-        self.full_data: Dict[str, str] = {}
-        self.restricted_data: Dict[int, Dict[str, str]] = {}
+        for lock_name in list(self.lock_waiters):
+            self.wake_lock_waiters(lock_name)
+        self.full_data: Dict[str, Union[str, bytes]] = {}
+        self.restricted_data: Dict[str, Dict[str, Union[str, bytes]]] = {}
         self.change_id_data: Dict[int, Set[str]] = {}
-        self.locks: Dict[str, str] = {}
+        self.locks: Dict[str, Tuple[str, float]] = {}
+        self.staged_data: Dict[str, Union[str, bytes]] = {}
+        self.projector_hashes: Dict[int, str] = {}
+
+    @property
+    def change_id_data(self) -> Dict[int, Set[str]]:
+        return self._change_id_data
+
+    @change_id_data.setter
+    def change_id_data(self, change_id_data: Dict[int, Set[str]]) -> None:
+        self._change_id_data = change_id_data
+        self.change_ids = sorted(change_id_data)
+        self.change_id_log_size = sum(
+            len(element_ids) for element_ids in change_id_data.values()
+        )
 
     async def clear_cache(self) -> None:
         self.set_data_dicts()
 
-    async def reset_full_cache(self, data: Dict[str, str]) -> None:
-        self.full_data = data
+    async def del_staged_elements(self) -> None:
+        self.staged_data = {}
+
+    async def add_staged_elements(self, data: Dict[str, Union[str, bytes]]) -> None:
+        self.staged_data.update(data)
+
+    async def commit_staged_elements(self) -> None:
+        self.full_data = self.staged_data
+        self.staged_data = {}
+        self.restricted_data = {}
+        self.change_id_data = {}
 
-    async def data_exists(self, user_id: Optional[int] = None) -> bool:
-        if user_id is None:
+    async def data_exists(self, restriction_key: Optional[str] = None) -> bool:
+        if restriction_key is None:
             cache_dict = self.full_data
         else:
-            cache_dict = self.restricted_data.get(user_id, {})
+            cache_dict = self.restricted_data.get(restriction_key, {})
 
         return bool(cache_dict)
 
-    async def add_elements(self, elements: List[str]) -> None:
+    async def add_elements(self, elements: List[Union[str, bytes]]) -> None:
         if len(elements) % 2:
             raise ValueError(
                 "The argument elements of add_elements has to be a list with an even number of elements."
             )
 
         for i in range(0, len(elements), 2):
-            self.full_data[elements[i]] = elements[i + 1]
+            # The odd values are the element_ids, so they are strings.
+            self.full_data[cast(str, elements[i])] = elements[i + 1]
 
     async def del_elements(
-        self, elements: List[str], user_id: Optional[int] = None
+        self, elements: List[str], restriction_key: Optional[str] = None
     ) -> None:
-        if user_id is None:
+        if restriction_key is None:
             cache_dict = self.full_data
         else:
-            cache_dict = self.restricted_data.get(user_id, {})
+            cache_dict = self.restricted_data.get(restriction_key, {})
 
         for element in elements:
             try:
@@ -414,54 +905,107 @@ class MemmoryCacheProvider:
     async def add_changed_elements(
         self, default_change_id: int, element_ids: Iterable[str]
     ) -> int:
-        element_ids = list(element_ids)
-        try:
-            change_id = (await self.get_current_change_id())[0][1] + 1
-        except IndexError:
+        if self.change_ids:
+            change_id = self.change_ids[-1] + 1
+        else:
             change_id = default_change_id
 
-        for element_id in element_ids:
-            if change_id in self.change_id_data:
-                self.change_id_data[change_id].add(element_id)
-            else:
-                self.change_id_data[change_id] = {element_id}
+        new_element_ids = set(element_ids)
+        if new_element_ids:
+            self._change_id_data[change_id] = new_element_ids
+            # The new change_id is the highest one, so the list stays sorted.
+            self.change_ids.append(change_id)
+            self.change_id_log_size += len(new_element_ids)
         return change_id
 
-    async def get_all_data(self, user_id: Optional[int] = None) -> Dict[bytes, bytes]:
-        if user_id is None:
+    async def get_all_data(
+        self, restriction_key: Optional[str] = None
+    ) -> Dict[bytes, bytes]:
+        if restriction_key is None:
             cache_dict = self.full_data
         else:
-            cache_dict = self.restricted_data.get(user_id, {})
+            cache_dict = self.restricted_data.get(restriction_key, {})
 
         return str_dict_to_bytes(cache_dict)
 
+    async def get_collection_data(
+        self, collection_string: str, restriction_key: Optional[str] = None
+    ) -> Dict[bytes, bytes]:
+        if restriction_key is None:
+            cache_dict = self.full_data
+        else:
+            cache_dict = self.restricted_data.get(restriction_key, {})
+
+        prefix = f"{collection_string}:"
+        return str_dict_to_bytes(
+            {
+                element_id: element
+                for element_id, element in cache_dict.items()
+                if element_id.startswith(prefix)
+            }
+        )
+
+    async def scan_data(
+        self,
+        cursor: int,
+        count: int,
+        collection_string: str = "",
+        restriction_key: Optional[str] = None,
+    ) -> Tuple[int, Dict[bytes, bytes]]:
+        if restriction_key is None:
+            prefix = f"{collection_string}:"
+            element_ids = sorted(
+                element_id
+                for element_id in self.full_data
+                if element_id.startswith(prefix)
+            )
+            cache_dict = self.full_data
+        else:
+            cache_dict = self.restricted_data.get(restriction_key, {})
+            element_ids = sorted(cache_dict)
+
+        next_cursor = cursor + count
+        out = str_dict_to_bytes(
+            {
+                element_id: cache_dict[element_id]
+                for element_id in element_ids[cursor:next_cursor]
+            }
+        )
+        return (next_cursor if next_cursor < len(element_ids) else 0), out
+
     async def get_element(
-        self, element_id: str, user_id: Optional[int] = None
+        self, element_id: str, restriction_key: Optional[str] = None
     ) -> Optional[bytes]:
-        if user_id is None:
+        if restriction_key is None:
             cache_dict = self.full_data
         else:
-            cache_dict = self.restricted_data.get(user_id, {})
+            cache_dict = self.restricted_data.get(restriction_key, {})
 
         value = cache_dict.get(element_id, None)
-        return value.encode() if value is not None else None
+        return to_bytes(value) if value is not None else None
 
     async def get_data_since(
-        self, change_id: int, user_id: Optional[int] = None, max_change_id: int = -1
+        self,
+        change_id: int,
+        restriction_key: Optional[str] = None,
+        max_change_id: int = -1,
     ) -> Tuple[Dict[str, List[bytes]], List[str]]:
         changed_elements: Dict[str, List[bytes]] = defaultdict(list)
         deleted_elements: List[str] = []
-        if user_id is None:
+        if restriction_key is None:
             cache_dict = self.full_data
         else:
-            cache_dict = self.restricted_data.get(user_id, {})
+            cache_dict = self.restricted_data.get(restriction_key, {})
+
+        start = bisect_left(self.change_ids, change_id)
+        if max_change_id == -1:
+            end = len(self.change_ids)
+        else:
+            end = bisect_right(self.change_ids, max_change_id)
 
         all_element_ids: Set[str] = set()
-        for data_change_id, element_ids in self.change_id_data.items():
-            if data_change_id >= change_id and (
-                max_change_id == -1 or data_change_id <= max_change_id
-            ):
-                all_element_ids.update(element_ids)
+        for data_change_id in self.change_ids[start:end]:
+            all_element_ids.update(self._change_id_data[data_change_id])
 
         for element_id in all_element_ids:
             element_json = cache_dict.get(element_id, None)
@@ -469,51 +1013,127 @@ class MemmoryCacheProvider:
                 deleted_elements.append(element_id)
             else:
                 collection_string, id = split_element_id(element_id)
-                changed_elements[collection_string].append(element_json.encode())
+                changed_elements[collection_string].append(to_bytes(element_json))
         return changed_elements, deleted_elements
 
-    async def del_restricted_data(self, user_id: int) -> None:
+    async def del_restricted_data(self, restriction_key: str) -> None:
         try:
-            del self.restricted_data[user_id]
+            del self.restricted_data[restriction_key]
         except KeyError:
             pass
 
-    async def set_lock(self, lock_name: str) -> bool:
-        if lock_name in self.locks:
-            return False
-        self.locks[lock_name] = "1"
-        return True
+    async def set_lock(self, lock_name: str, timeout: float) -> Optional[str]:
+        if await self.get_lock(lock_name):
+            return None
+        token = uuid4().hex
+        self.locks[lock_name] = (token, monotonic() + timeout)
+        return token
 
     async def get_lock(self, lock_name: str) -> bool:
-        return lock_name in self.locks
-
-    async def del_lock(self, lock_name: str) -> None:
-        try:
+        lock = self.locks.get(lock_name)
+        if lock is None:
+            return False
+        if lock[1] <= monotonic():
+            # The lock is expired.
             del self.locks[lock_name]
-        except KeyError:
-            pass
-
-    async def get_change_id_user(self, user_id: int) -> Optional[int]:
-        data = self.restricted_data.get(user_id, {})
-        change_id = data.get("_config:change_id", None)
-        return int(change_id) if change_id is not None else None
+            self.wake_lock_waiters(lock_name)
+            return False
+        return True
 
-    async def update_restricted_data(self, user_id: int, data: Dict[str, str]) -> None:
-        redis_data = self.restricted_data.setdefault(user_id, {})
+    async def del_lock(self, lock_name: str, token: Optional[str] = None) -> None:
+        lock = self.locks.get(lock_name)
+        if lock is None or (token is not None and lock[0] != token):
+            return
+        del self.locks[lock_name]
+        self.wake_lock_waiters(lock_name)
+
+    async def wait_for_lock(self, lock_name: str) -> None:
+        while await self.get_lock(lock_name):
+            # The event is bound to the loop of the waiter. The lock could be
+            # released in an other thread, so the event is set with
+            # call_soon_threadsafe.
+            waiter = (asyncio.get_event_loop(), asyncio.Event())
+            self.lock_waiters[lock_name].append(waiter)
+            try:
+                await asyncio.wait_for(
+                    waiter[1].wait(), self.locks[lock_name][1] - monotonic()
+                )
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if waiter in self.lock_waiters.get(lock_name, []):
+                    self.lock_waiters[lock_name].remove(waiter)
+
+    def wake_lock_waiters(self, lock_name: str) -> None:
+        for loop, event in self.lock_waiters.pop(lock_name, []):
+            loop.call_soon_threadsafe(event.set)
+
+    async def get_restricted_data_changes(
+        self, restriction_key: str
+    ) -> Tuple[
+        Optional[int], Optional[int], Optional[Tuple[Dict[str, List[bytes]], List[str]]]
+    ]:
+        change_id = self.restricted_data.get(restriction_key, {}).get(
+            "_config:change_id", None
+        )
+        restricted_change_id = int(change_id) if change_id is not None else None
+        current_change_id = self.change_ids[-1] if self.change_ids else None
+        lowest_change_id = await self.get_lowest_change_id()
+
+        data = None
+        if (
+            restricted_change_id is not None
+            and current_change_id is not None
+            and lowest_change_id is not None
+            and restricted_change_id < current_change_id
+            and restricted_change_id + 1 >= lowest_change_id
+        ):
+            data = await self.get_data_since(restricted_change_id + 1)
+        return restricted_change_id, current_change_id, data
+
+    async def update_restricted_data(
+        self, restriction_key: str, data: Dict[str, Union[str, bytes]]
+    ) -> None:
+        redis_data = self.restricted_data.setdefault(restriction_key, {})
         redis_data.update(data)
 
     async def get_current_change_id(self) -> List[Tuple[str, int]]:
-        change_data = self.change_id_data
-        if change_data:
-            return [("no_usefull_value", max(change_data.keys()))]
+        if self.change_ids:
+            return [("no_usefull_value", self.change_ids[-1])]
         return []
 
     async def get_lowest_change_id(self) -> Optional[int]:
-        change_data = self.change_id_data
-        if change_data:
-            return min(change_data.keys())
+        if self.change_ids:
+            return self.change_ids[0]
         return None
 
+    async def compact_change_ids(self, lowest_change_id: int) -> int:
+        if not self.change_ids:
+            return 0
+        if lowest_change_id <= self.change_ids[0]:
+            return self.change_ids[0]
+        end = bisect_left(self.change_ids, lowest_change_id)
+        for change_id in self.change_ids[:end]:
+            self.change_id_log_size -= len(self._change_id_data.pop(change_id))
+        del self.change_ids[:end]
+        # The lowest change_id is the first one in the list.
+        if not self.change_ids or self.change_ids[0] != lowest_change_id:
+            self._change_id_data[lowest_change_id] = set()
+            self.change_ids.insert(0, lowest_change_id)
+        return lowest_change_id
+
+    async def get_change_id_log_size(self) -> int:
+        return self.change_id_log_size
+
+    async def update_projector_hashes(self, hashes: Dict[int, str]) -> List[int]:
+        changed = [
+            projector_id
+            for projector_id in self.projector_hashes.keys() | hashes.keys()
+            if self.projector_hashes.get(projector_id) != hashes.get(projector_id)
+        ]
+        self.projector_hashes = dict(hashes)
+        return sorted(changed)
+
 
 class Cachable(Protocol):
     """
@@ -527,9 +1147,11 @@ class Cachable(Protocol):
         Returns the string representing the name of the cachable.
         """
 
-    def get_elements(self) -> List[Dict[str, Any]]:
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
         """
         Returns all elements of the cachable.
+
+        If ids is given, only the elements with this ids are returned.
         """
 
     async def restrict_elements(
@@ -542,6 +1164,22 @@ class Cachable(Protocol):
         elements of the cachable.
         """
 
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Like restrict_elements but returns only the elements that depend on the
+        groups of the user. The result is shared between users with the same groups.
+        """
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Like restrict_elements but returns only the elements that the user can see
+        because of his identity.
+        """
+
 
 def get_all_cachables() -> List[Cachable]:
     """
@@ -560,6 +1198,28 @@ def get_all_cachables() -> List[Cachable]:
     return out
 
 
+def split_data_since(
+    elements: Dict[bytes, Optional[bytes]]
+) -> Tuple[Dict[str, List[bytes]], List[str]]:
+    """
+    Splits the result of the lua script get_data_since into the changed
+    elements by collection_string and the deleted element_ids.
+    """
+    changed_elements: Dict[str, List[bytes]] = defaultdict(list)
+    deleted_elements: List[str] = []
+    for element_id, element_json in elements.items():
+        if element_id.startswith(b"_config"):
+            # Ignore config values from the change_id cache key
+            continue
+        if element_json is None:
+            # The element is not in the cache. It has to be deleted.
+            deleted_elements.append(element_id.decode())
+        else:
+            collection_string, id = split_element_id(element_id)
+            changed_elements[collection_string].append(element_json)
+    return changed_elements, deleted_elements
+
+
 lua_script_change_data = """
 -- Generate a new change_id
 local tmp = redis.call('zrevrangebyscore', KEYS[1], '+inf', '-inf', 'WITHSCORES', 'LIMIT', 0, 1)
@@ -583,3 +1243,169 @@ redis.call('zadd', KEYS[1], 'NX', change_id, '_config:lowest_change_id')
 
 return change_id
 """
+
+
+lua_script_compact_change_ids = """
+-- Remove all change_ids lower then ARGV[1] and set it as lowest_change_id.
+-- Returns the lowest_change_id after the call or 0, if there is none.
+local lowest_change_id = redis.call('zscore', KEYS[1], '_config:lowest_change_id')
+if lowest_change_id == false then
+    return 0
+end
+if tonumber(ARGV[1]) <= tonumber(lowest_change_id) then
+    return tonumber(lowest_change_id)
+end
+redis.call('zremrangebyscore', KEYS[1], '-inf', '(' .. ARGV[1])
+redis.call('zadd', KEYS[1], ARGV[1], '_config:lowest_change_id')
+return tonumber(ARGV[1])
+"""
+
+
+lua_script_del_lock = """
+-- Delete the lock KEYS[1], if it has the token ARGV[2] or if ARGV[2] is empty.
+-- Then wake up the waiters on the channel ARGV[1].
+if ARGV[2] ~= '' and redis.call('get', KEYS[1]) ~= ARGV[2] then
+    return 0
+end
+if redis.call('del', KEYS[1]) == 1 then
+    redis.call('publish', ARGV[1], 1)
+end
+return 1
+"""
+
+
+lua_script_commit_staged_data = """
+-- Delete the hashes of the full_data and rename the staged hashes to them.
+-- KEYS[1] and KEYS[2] are the sets of the collections of the full_data and
+-- the staged data. ARGV[1] and ARGV[2] are the prefixes of the hashes.
+-- Also deletes the change_ids in KEYS[3] and the restricted_data_caches,
+-- whose restriction_keys are in the set KEYS[4]. ARGV[3] is their prefix.
+for _, restriction_key in ipairs(redis.call('smembers', KEYS[4])) do
+    redis.call('del', ARGV[3] .. restriction_key)
+end
+redis.call('del', KEYS[3], KEYS[4])
+for _, collection_string in pairs(redis.call('smembers', KEYS[1])) do
+    redis.call('del', ARGV[1] .. collection_string)
+end
+redis.call('del', KEYS[1])
+for _, collection_string in pairs(redis.call('smembers', KEYS[2])) do
+    redis.call('rename', ARGV[2] .. collection_string, ARGV[1] .. collection_string)
+end
+if redis.call('exists', KEYS[2]) == 1 then
+    redis.call('rename', KEYS[2], KEYS[1])
+end
+"""
+
+
+lua_script_get_all_full_data = """
+-- Get all elements from the hashes of all collections. The fields of the
+-- hashes are the element_ids. Returns a list where the odd values are the
+-- element_ids and the even values the elements.
+local elements = {}
+for _, collection_string in pairs(redis.call('smembers', KEYS[1])) do
+    for _, value in pairs(redis.call('hgetall', ARGV[1] .. collection_string)) do
+        table.insert(elements, value)
+    end
+end
+return elements
+"""
+
+
+lua_script_delete_full_data = """
+-- Delete the hashes of all collections and the set of collections
+for _, collection_string in pairs(redis.call('smembers', KEYS[1])) do
+    redis.call('del', ARGV[1] .. collection_string)
+end
+redis.call('del', KEYS[1])
+"""
+
+
+lua_script_get_data_since = """
+-- Get change ids of changed elements
+local element_ids = redis.call('zrangebyscore', KEYS[1], ARGV[1], ARGV[2])
+
+-- Save elements in array. Rotate element_id and element_json
+local elements = {}
+for _, element_id in pairs(element_ids) do
+    local cache_key = KEYS[2]
+    if cache_key == nil then
+        -- Full data is saved in one hash per collection. Use the
+        -- collection_string in front of the last colon.
+        cache_key = ARGV[3] .. string.match(element_id, '^(.*):')
+    end
+    table.insert(elements, element_id)
+    table.insert(elements, redis.call('hget', cache_key, element_id))
+end
+return elements
+"""
+
+
+lua_script_get_restricted_data_changes = """
+-- Returns the change_id of the restricted_data_cache KEYS[2], the current
+-- change_id from KEYS[1] and 1 if the changed full_data follows, else 0. Then
+-- the changed element_ids and elements follow like in get_data_since. ARGV[1]
+-- is the prefix of the full_data hashes.
+local restricted_change_id = redis.call('hget', KEYS[2], '_config:change_id')
+local current_change_id = false
+local current = redis.call('zrevrangebyscore', KEYS[1], '+inf', '-inf', 'WITHSCORES', 'LIMIT', 0, 1)
+if next(current) ~= nil then
+    current_change_id = current[2]
+end
+local lowest_change_id = redis.call('zscore', KEYS[1], '_config:lowest_change_id')
+
+local result = {restricted_change_id, current_change_id, 0}
+if restricted_change_id and current_change_id and lowest_change_id
+        and tonumber(restricted_change_id) < tonumber(current_change_id)
+        and tonumber(restricted_change_id) + 1 >= tonumber(lowest_change_id) then
+    result[3] = 1
+    local element_ids = redis.call('zrangebyscore', KEYS[1], restricted_change_id + 1, '+inf')
+    for _, element_id in ipairs(element_ids) do
+        table.insert(result, element_id)
+        table.insert(result, redis.call('hget', ARGV[1] .. string.match(element_id, '^(.*):'), element_id))
+    end
+end
+return result
+"""
+
+
+lua_script_update_projector_hashes = """
+-- Saves the hashes of the projectors in the hash KEYS[1]. The odd values of
+-- ARGV are the projector ids and the even values their hashes. Deletes the
+-- hashes of all other projectors. Returns the ids of the changed projectors.
+local changed = {}
+local new_hashes = {}
+for i = 1, #ARGV, 2 do
+    new_hashes[ARGV[i]] = ARGV[i + 1]
+    if redis.call('hget', KEYS[1], ARGV[i]) ~= ARGV[i + 1] then
+        redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 1])
+        table.insert(changed, ARGV[i])
+    end
+end
+for _, projector_id in ipairs(redis.call('hkeys', KEYS[1])) do
+    if new_hashes[projector_id] == nil then
+        redis.call('hdel', KEYS[1], projector_id)
+        table.insert(changed, projector_id)
+    end
+end
+return changed
+"""
+
+
+# The lua scripts of the RedisCacheProvider by name, with their sha1 hash to
+# call them with EVALSHA. The scripts commit_staged_data, get_all_full_data,
+# delete_full_data, get_data_since and get_restricted_data_changes access keys,
+# that are not in KEYS, so they only work on a single redis node.
+lua_scripts: Dict[str, Tuple[str, str]] = {
+    name: (script, hashlib.sha1(script.encode()).hexdigest())
+    for name, script in (
+        ("change_data", lua_script_change_data),
+        ("compact_change_ids", lua_script_compact_change_ids),
+        ("del_lock", lua_script_del_lock),
+        ("commit_staged_data", lua_script_commit_staged_data),
+        ("get_all_full_data", lua_script_get_all_full_data),
+        ("delete_full_data", lua_script_delete_full_data),
+        ("get_data_since", lua_script_get_data_since),
+        ("get_restricted_data_changes", lua_script_get_restricted_data_changes),
+        ("update_projector_hashes", lua_script_update_projector_hashes),
+    )
+}
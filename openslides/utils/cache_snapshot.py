@@ -0,0 +1,168 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+
+from django.conf import settings
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+
+
+SNAPSHOT_MAGIC = b"OSECSNAP"
+SNAPSHOT_VERSION = 1
+
+# Length of the header and lengths of the element_id and the element.
+header_struct = struct.Struct(">I")
+element_struct = struct.Struct(">II")
+
+
+class SnapshotData(NamedTuple):
+    fingerprint: str
+    change_id: int
+    position: int
+    elements: Dict[bytes, bytes]
+
+
+class ElementCacheSnapshot:
+    """
+    Saves the full_data of the element cache into a file, so it does not have
+    to be rebuild from the database when OpenSlides restarts.
+
+    The elements are saved as they are encoded in the cache provider. The
+    snapshot is only valid for the fingerprint it was created with. The
+    fingerprint changes, when OpenSlides is updated, when a migration is
+    applied or when another database or codec is used.
+
+    The position is the id of the newest history entry when the snapshot was
+    created. All elements with a newer history entry have to be loaded from
+    the database again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def get_fingerprint(
+        self, collection_strings: Iterable[str], codec_name: str
+    ) -> str:
+        """
+        Returns a hash over everything that has to be the same to use a
+        snapshot.
+        """
+        from .. import __version__
+
+        applied_migrations = MigrationRecorder(connection).applied_migrations()
+        fingerprint_data = {
+            "snapshot_version": SNAPSHOT_VERSION,
+            "openslides_version": __version__,
+            "database": [connection.vendor, str(settings.DATABASES["default"]["NAME"])],
+            "migrations": sorted(f"{app}.{name}" for app, name in applied_migrations),
+            "collection_strings": sorted(collection_strings),
+            "codec": codec_name,
+        }
+        return hashlib.sha256(
+            json.dumps(fingerprint_data, sort_keys=True).encode()
+        ).hexdigest()
+
+    def get_position(self) -> int:
+        """
+        Returns the id of the newest history entry or 0 if there is none.
+        """
+        from ..core.models import History
+
+        return History.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+    def get_changed_element_ids(self, position: int) -> Set[str]:
+        """
+        Returns the element_ids of all elements, that where changed after the
+        history entry with the id position.
+        """
+        from ..core.models import History
+
+        return set(
+            History.objects.filter(id__gt=position).values_list("element_id", flat=True)
+        )
+
+    def read(self) -> Optional[SnapshotData]:
+        """
+        Reads the snapshot file with mmap.
+
+        Returns None, if there is no snapshot or if it is invalid.
+        """
+        try:
+            with open(self.path, "rb") as snapshot_file, mmap.mmap(
+                snapshot_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as data:
+                with memoryview(data) as view:  # type: ignore
+                    return self.parse(view)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def parse(self, data: memoryview) -> SnapshotData:
+        """
+        Parses the content of a snapshot file.
+
+        Raises ValueError or struct.error, if the content is invalid.
+        """
+        offset = len(SNAPSHOT_MAGIC)
+        if data[:offset] != SNAPSHOT_MAGIC:
+            raise ValueError("Invalid snapshot file.")
+        header_length, = header_struct.unpack_from(data, offset)
+        offset += header_struct.size
+        end = offset + header_length
+        header = json.loads(bytes(data[offset:end]))
+        offset = end
+
+        elements: Dict[bytes, bytes] = {}
+        for __ in range(header["element_count"]):
+            key_length, value_length = element_struct.unpack_from(data, offset)
+            offset += element_struct.size
+            end = offset + key_length
+            key = bytes(data[offset:end])
+            offset = end
+            end = offset + value_length
+            elements[key] = bytes(data[offset:end])
+            offset = end
+        if offset != len(data):
+            raise ValueError("Invalid snapshot file.")
+
+        return SnapshotData(
+            fingerprint=header["fingerprint"],
+            change_id=header["change_id"],
+            position=header["position"],
+            elements=elements,
+        )
+
+    def write(
+        self,
+        fingerprint: str,
+        change_id: int,
+        position: int,
+        elements: Dict[bytes, bytes],
+    ) -> None:
+        """
+        Writes the snapshot file.
+
+        The file is written to a temporary file first, so a reader never sees
+        a half written snapshot.
+        """
+        header = json.dumps(
+            {
+                "fingerprint": fingerprint,
+                "change_id": change_id,
+                "position": position,
+                "element_count": len(elements),
+            }
+        ).encode()
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as snapshot_file:
+            snapshot_file.write(SNAPSHOT_MAGIC)
+            snapshot_file.write(header_struct.pack(len(header)))
+            snapshot_file.write(header)
+            for key, value in elements.items():
+                snapshot_file.write(element_struct.pack(len(key), len(value)))
+                snapshot_file.write(key)
+                snapshot_file.write(value)
+        os.replace(tmp_path, self.path)
@@ -1,11 +1,16 @@
-from collections import defaultdict
 from typing import Any, Dict, List
 from urllib.parse import parse_qs
 
 from .auth import async_anonymous_is_enabled
-from .autoupdate import AutoupdateFormat
-from .cache import element_cache, split_element_id
-from .websocket import ProtocollAsyncJsonWebsocketConsumer, get_element_data
+from .autoupdate import autoupdate_fanout, encode_autoupdate, format_autoupdate
+from .cache import element_cache
+from .projector import get_projector_group_name
+from .websocket import (
+    ProtocollAsyncJsonWebsocketConsumer,
+    QueuedAutoupdate,
+    get_user_group_name,
+    send_element_data,
+)
 
 
 class SiteConsumer(ProtocollAsyncJsonWebsocketConsumer):
@@ -16,7 +21,7 @@ class SiteConsumer(ProtocollAsyncJsonWebsocketConsumer):
     groups = ["site"]
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
-        self.projector_hash: Dict[int, int] = {}
+        self.listen_projector_ids: List[int] = []
         super().__init__(*args, **kwargs)
 
     async def connect(self) -> None:
@@ -25,7 +30,8 @@ class SiteConsumer(ProtocollAsyncJsonWebsocketConsumer):
 
         If it is an anonymous user and anonymous is disabled, the connection is closed.
 
-        Sends the startup data to the user.
+        Sends the startup data to the user. With a positive value in the query
+        parameter stream, all data is sent in chunks. See send_element_data().
         """
         # self.scope['user'] is the full_data dict of the user. For an
         # anonymous user is it the dict {'id': 0}
@@ -34,7 +40,7 @@ class SiteConsumer(ProtocollAsyncJsonWebsocketConsumer):
             await self.close()
             return
 
-        query_string = parse_qs(self.scope["query_string"])
+        query_string: Dict[bytes, List[bytes]] = parse_qs(self.scope["query_string"])
         if b"change_id" in query_string:
             try:
                 change_id = int(query_string[b"change_id"][0])
@@ -48,82 +54,99 @@ class SiteConsumer(ProtocollAsyncJsonWebsocketConsumer):
             # a positive value in autoupdate. Start autoupdate
             await self.channel_layer.group_add("autoupdate", self.channel_name)
 
+        # Join the group for the notify messages to the user.
+        await self.channel_layer.group_add(
+            get_user_group_name(self.scope["user"]["id"]), self.channel_name
+        )
+
+        stream: bool = b"stream" in query_string and query_string[b"stream"][
+            0
+        ].lower() not in [b"0", b"off", b"false"]
+
         await self.accept()
 
         if change_id is not None:
             try:
-                data = await get_element_data(self.scope["user"]["id"], change_id)
+                await send_element_data(self, change_id, stream)
             except ValueError:
                 # When the change_id is to big, do nothing
                 pass
-            else:
-                await self.send_json(type="autoupdate", content=data)
 
     async def disconnect(self, close_code: int) -> None:
         """
-        A user disconnects. Remove it from autoupdate.
+        A user disconnects. Remove it from all groups.
         """
         await self.channel_layer.group_discard("autoupdate", self.channel_name)
+        await self.channel_layer.group_discard(
+            get_user_group_name(self.scope["user"]["id"]), self.channel_name
+        )
+        for projector_id in self.listen_projector_ids:
+            await self.channel_layer.group_discard(
+                get_projector_group_name(projector_id), self.channel_name
+            )
+        await super().disconnect(close_code)
 
     async def send_notify(self, event: Dict[str, Any]) -> None:
         """
         Send a notify message to the user.
+
+        The message is only sent to the groups and channels of the recipients.
+        See NotifyWebsocketClientMessage.
         """
-        user_id = self.scope["user"]["id"]
         item = event["incomming"]
-
         users = item.get("users")
-        reply_channels = item.get("replyChannels")
         if (
-            (isinstance(users, bool) and users)
-            or (isinstance(users, list) and user_id in users)
-            or (
-                isinstance(reply_channels, list) and self.channel_name in reply_channels
-            )
-            or (users is None and reply_channels is None)
+            event.get("replyChannel")
+            and isinstance(users, list)
+            and self.scope["user"]["id"] in users
         ):
-            item["senderChannelName"] = event["senderChannelName"]
-            item["senderUserId"] = event["senderUserId"]
-            await self.send_json(type="notify", content=item)
+            # The user gets the message also from his user group.
+            return
+
+        item["senderChannelName"] = event["senderChannelName"]
+        item["senderUserId"] = event["senderUserId"]
+        await self.send_json(type="notify", content=item)
 
     async def send_data(self, event: Dict[str, Any]) -> None:
         """
         Send changed or deleted elements to the user.
+
+        The message is built, when it is sent. See get_autoupdate_message().
         """
-        change_id = event["change_id"]
-        changed_elements, deleted_elements_ids = await element_cache.get_restricted_data(
-            self.scope["user"]["id"], change_id, max_change_id=change_id
-        )
+        self.send_autoupdate(event["change_id"])
 
-        deleted_elements: Dict[str, List[int]] = defaultdict(list)
-        for element_id in deleted_elements_ids:
-            collection_string, id = split_element_id(element_id)
-            deleted_elements[collection_string].append(id)
-        await self.send_json(
-            type="autoupdate",
-            content=AutoupdateFormat(
-                changed=changed_elements,
-                deleted=deleted_elements,
-                from_change_id=change_id,
-                to_change_id=change_id,
-                all_data=False,
-            ),
+    async def get_autoupdate_message(self, autoupdate: QueuedAutoupdate) -> str:
+        """
+        Returns the message with the changed or deleted elements of the queued
+        autoupdate.
+        """
+        user_id = self.scope["user"]["id"]
+        try:
+            if len(autoupdate) == 1:
+                # The message is built only once for all users with the same
+                # permissions.
+                return await autoupdate_fanout.get_message(
+                    user_id, autoupdate.to_change_id
+                )
+
+            changed_elements, deleted_element_ids = await element_cache.get_restricted_data(
+                user_id, autoupdate.from_change_id, autoupdate.to_change_id
+            )
+        except RuntimeError:
+            # The change_id is not in the cache anymore. The client has to
+            # request all data.
+            return await self.get_resync_message(autoupdate.from_change_id)
+        return encode_autoupdate(
+            format_autoupdate(
+                changed_elements,
+                deleted_element_ids,
+                autoupdate.to_change_id,
+                autoupdate.from_change_id,
+            )
         )
 
     async def projector_changed(self, event: Dict[str, Any]) -> None:
         """
-        The projector has changed.
+        A projector, that the user listens to, has changed.
         """
-        all_projector_data = event["data"]
-        projector_data: Dict[int, Dict[str, Any]] = {}
-        for projector_id in self.listen_projector_ids:
-            data = all_projector_data.get(
-                projector_id, {"error": f"No data for projector {projector_id}"}
-            )
-            new_hash = hash(str(data))
-            if new_hash != self.projector_hash.get(projector_id):
-                projector_data[projector_id] = data
-                self.projector_hash[projector_id] = new_hash
-
-        if projector_data:
-            await self.send_json(type="projector", content=projector_data)
+        await self.send_json(type="projector", content=event["data"])
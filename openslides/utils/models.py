@@ -1,7 +1,7 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Type
 
 from django.core.exceptions import ImproperlyConfigured
-from django.db import models
+from django.db import connections, models, router
 
 from .access_permissions import BaseAccessPermissions
 from .rest_api import model_serializer_classes
@@ -25,6 +25,39 @@ class MinMaxIntegerField(models.IntegerField):
         return super(MinMaxIntegerField, self).formfield(**defaults)
 
 
+def bulk_create_with_pks(
+    model: Type[models.Model], instances: List[models.Model]
+) -> List[models.Model]:
+    """
+    Inserts the instances with bulk_create and sets their primary keys.
+
+    Django only sets the primary keys on databases that return them from a
+    bulk insert, like PostgreSQL. On SQLite, the database is locked for
+    other writers until the end of the transaction, so the newest rows are
+    the inserted ones. On other databases the instances are saved one by one.
+
+    Has to be called inside of a transaction.
+    """
+    if not instances:
+        return instances
+    connection = connections[router.db_for_write(model)]
+    if connection.features.can_return_ids_from_bulk_insert:
+        return model.objects.bulk_create(instances)  # type: ignore
+    if connection.vendor != "sqlite":
+        for instance in instances:
+            # Call the save method of django without the autoupdate of
+            # RESTModelMixin.save().
+            models.Model.save(instance)
+        return instances
+
+    model.objects.bulk_create(instances)  # type: ignore
+    query = model.objects.order_by("-pk").values_list("pk", flat=True)  # type: ignore
+    pks = list(query[: len(instances)])
+    for instance, pk in zip(instances, reversed(pks)):
+        instance.pk = pk
+    return instances
+
+
 class RESTModelMixin:
     """
     Mixin for Django models which are used in our REST API.
@@ -115,9 +148,11 @@ class RESTModelMixin:
         return return_value
 
     @classmethod
-    def get_elements(cls) -> List[Dict[str, Any]]:
+    def get_elements(cls, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
         """
         Returns all elements as full_data.
+
+        If ids is given, only the elements with this ids are returned.
         """
         # Get the query to receive all data from the database.
         try:
@@ -127,8 +162,13 @@ class RESTModelMixin:
             # the default queryset from django.
             query = cls.objects  # type: ignore
 
+        if ids is None:
+            query = query.all()
+        else:
+            query = query.filter(pk__in=ids)
+
         # Build a dict from the instance id to the full_data
-        return [instance.get_full_data() for instance in query.all()]
+        return [instance.get_full_data() for instance in query]
 
     @classmethod
     async def restrict_elements(
@@ -139,6 +179,30 @@ class RESTModelMixin:
         """
         return await cls.get_access_permissions().get_restricted_data(elements, user_id)
 
+    @classmethod
+    async def restrict_elements_shared(
+        cls, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Like restrict_elements but only the part that depends on the groups of
+        the user.
+        """
+        return await cls.get_access_permissions().get_shared_restricted_data(
+            elements, user_id
+        )
+
+    @classmethod
+    async def restrict_elements_personal(
+        cls, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Like restrict_elements but only the elements that the user can see
+        because of his identity.
+        """
+        return await cls.get_access_permissions().get_personal_restricted_data(
+            elements, user_id
+        )
+
     def get_full_data(self) -> Dict[str, Any]:
         """
         Returns the full_data of the instance.
@@ -5,7 +5,8 @@ Functions  that handel the registration of projector elements and the rendering
 of the data to present it on the projector.
 """
 
-from typing import Any, Callable, Dict, List
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
 
 from .cache import element_cache
 
@@ -58,10 +59,20 @@ async def get_projectot_data(
         ],
     }
     """
+    all_data = await element_cache.get_all_full_data_ordered()
+    return render_projectors(all_data, projector_ids)
+
+
+def render_projectors(
+    all_data: AllData, projector_ids: Optional[List[int]] = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Calculates the data for one or all projectors from all_data. See
+    get_projectot_data().
+    """
     if projector_ids is None:
         projector_ids = []
 
-    all_data = await element_cache.get_all_full_data_ordered()
     projector_data: Dict[int, List[Dict[str, Any]]] = {}
 
     for projector_id, projector in all_data.get("core/projector", {}).items():
@@ -83,6 +94,36 @@ async def get_projectot_data(
     return projector_data
 
 
+async def get_changed_projector_data() -> Dict[int, Any]:
+    """
+    Returns the data of all projectors, that have changed since the last call.
+
+    The data is calculated once for all clients. Deleted projectors and
+    projectors without elements get an error message as data.
+    """
+    all_data = await element_cache.get_all_full_data_ordered()
+    projector_data = render_projectors(all_data)
+    hashes = {
+        projector_id: hashlib.sha1(str(data).encode()).hexdigest()
+        for projector_id, data in projector_data.items()
+    }
+    changed_projector_ids = await element_cache.update_projector_hashes(hashes)
+    return {
+        projector_id: projector_data.get(
+            projector_id, {"error": f"No data for projector {projector_id}"}
+        )
+        for projector_id in changed_projector_ids
+    }
+
+
+def get_projector_group_name(projector_id: int) -> str:
+    """
+    Returns the name of the channel group of the clients, that listen to the
+    projector.
+    """
+    return f"projector-{projector_id}"
+
+
 def get_config(all_data: AllData, key: str) -> Any:
     """
     Returns a config value from all_data.
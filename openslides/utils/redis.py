@@ -1,4 +1,5 @@
-from typing import Any
+import asyncio
+from typing import Any, AsyncGenerator, Dict
 
 from django.conf import settings
 
@@ -12,27 +13,104 @@ else:
     redis_address = getattr(settings, "REDIS_ADDRESS", "")
     use_redis = bool(redis_address)
 
+# Maximum number of connections to redis of each event loop.
+redis_pool_size = getattr(settings, "REDIS_POOL_SIZE", 10)
+
+# The connection pools for each event loop. The values are futures, so
+# concurrent callers do not create more then one pool.
+pools: Dict[asyncio.AbstractEventLoop, asyncio.Future] = {}
+pool_closers: Dict[asyncio.AbstractEventLoop, AsyncGenerator] = {}
+
+
+async def close_pool_on_shutdown(
+    pool: "aioredis.Redis", loop: asyncio.AbstractEventLoop
+) -> AsyncGenerator:
+    """
+    Async generator, that closes the pool of the loop when it is closed.
+
+    The event loop closes all async generators in shutdown_asyncgens(), which
+    is called by asyncio.run() and async_to_sync before the loop is closed. So
+    the temporary loops of async_to_sync do not leave open connections.
+    """
+    try:
+        yield
+    finally:
+        future = pools.get(loop)
+        if future is not None and future.done() and future.result() is pool:
+            del pools[loop]
+        pool_closers.pop(loop, None)
+        pool.close()
+        await pool.wait_closed()
+
+
+async def create_pool() -> "aioredis.Redis":
+    """
+    Creates a connection pool for the current event loop.
+    """
+    pool = await aioredis.create_redis_pool(
+        redis_address, minsize=1, maxsize=redis_pool_size
+    )
+    loop = asyncio.get_event_loop()
+    closer = close_pool_on_shutdown(pool, loop)
+    await closer.asend(None)
+    pool_closers[loop] = closer
+    return pool
+
+
+async def get_pool() -> "aioredis.Redis":
+    """
+    Returns the connection pool of the current event loop.
+
+    The connections of a pool are shared by concurrent callers. Use
+    redis.pipeline() or redis.multi_exec() to send more then one command at
+    once.
+    """
+    loop = asyncio.get_event_loop()
+    future = pools.get(loop)
+    if future is None or (future.done() and future.result().closed):
+        # Forget the pools of event loops that were closed without
+        # shutdown_asyncgens(). Normally close_pool_on_shutdown removes them.
+        for closed_loop in [other for other in pools if other.is_closed()]:
+            del pools[closed_loop]
+            pool_closers.pop(closed_loop, None)
+        future = pools[loop] = asyncio.ensure_future(create_pool())
+    try:
+        return await asyncio.shield(future)
+    except Exception:
+        # Try again with the next call.
+        if pools.get(loop) is future:
+            del pools[loop]
+        raise
+
 
 class RedisConnectionContextManager:
     """
     Async context manager for connections
+
+    Returns the pool of the current event loop. If exclusive is True, it
+    returns a connection of the pool, that is not used by other callers,
+    for example for transactions or pub/sub.
     """
 
     # TODO: contextlib.asynccontextmanager can be used in python 3.7
 
-    def __init__(self, redis_address: str) -> None:
-        self.redis_address = redis_address
+    def __init__(self, exclusive: bool = False) -> None:
+        self.exclusive = exclusive
 
-    async def __aenter__(self) -> "aioredis.RedisConnection":
-        self.conn = await aioredis.create_redis(self.redis_address)
-        return self.conn
+    async def __aenter__(self) -> "aioredis.Redis":
+        self.pool = await get_pool()
+        if not self.exclusive:
+            return self.pool
+        self.conn = await self.pool.connection.acquire()
+        return aioredis.Redis(self.conn)
 
     async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
-        self.conn.close()
+        if self.exclusive:
+            self.pool.connection.release(self.conn)
 
 
-def get_connection() -> RedisConnectionContextManager:
+def get_connection(exclusive: bool = False) -> RedisConnectionContextManager:
     """
     Returns contextmanager for a redis connection.
     """
-    return RedisConnectionContextManager(redis_address)
+    return RedisConnectionContextManager(exclusive)
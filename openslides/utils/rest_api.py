@@ -244,10 +244,10 @@ class ListModelMixin(_ListModelMixin):
             # The corresponding queryset does not support caching.
             response = super().list(request, *args, **kwargs)
         else:
-            all_restricted_data = async_to_sync(element_cache.get_all_restricted_data)(
-                request.user.pk or 0
-            )
-            response = Response(all_restricted_data.get(collection_string, []))
+            restricted_data = async_to_sync(
+                element_cache.get_collection_restricted_data
+            )(request.user.pk or 0, collection_string)
+            response = Response(restricted_data)
         return response
 
 
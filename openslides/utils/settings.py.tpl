@@ -97,11 +97,18 @@ if use_redis:
     # a Redis URI — "redis://host:6379/0?encoding=utf-8";
     # a (host, port) tuple — ('localhost', 6379);
     # or a unix domain socket path string — "/path/to/redis.sock".
+    # It has to be a single redis node. Redis Cluster is not supported.
     REDIS_ADDRESS = "redis://127.0.0.1"
 
-    # When use_redis is True, the restricted data cache caches the data individuel
-    # for each user. This requires a lot of memory if there are a lot of active
-    # users.
+    # Maximum number of connections to redis of each event loop.
+    REDIS_POOL_SIZE = 10
+
+    # When use_redis is True, the restricted data cache caches the restricted
+    # data once for each permission class, that means for all users with the
+    # same groups. Each user gets only a small personal overlay with the
+    # elements he can see because of his identity, e. g. his own user element.
+    # The memory grows with the number of different group combinations, not
+    # with the number of active users.
     RESTRICTED_DATA_CACHE = True
 
     # Session backend
@@ -117,6 +124,79 @@ if use_redis:
     }
 
 
+# Element cache
+
+# Maximum number of elements that each process keeps decoded in memory. Set
+# it to 0 to disable the decoded data cache.
+
+DECODED_DATA_CACHE_SIZE = 100000
+
+# Codec to encode the elements in the cache. Can be 'json', 'orjson' or
+# 'msgpack'. If the library of the codec is not installed, json is used.
+# When redis is used, the cache has to be cleared after the codec is changed.
+# With 'orjson', the messages to the clients are also encoded with orjson.
+
+ELEMENT_CACHE_CODEC = 'json'
+
+# Number of change ids and age in seconds of the change ids that are kept to
+# send only the changed elements to reconnecting clients. Clients with an older
+# change id get all data. Set a value to None to keep the change ids forever.
+
+CHANGE_ID_RETENTION_COUNT = 100000
+CHANGE_ID_RETENTION_AGE = None
+
+# Number of threads that load the elements from the database when the cache
+# is built.
+
+ELEMENT_CACHE_BUILD_WORKERS = 4
+
+# File to save a snapshot of the cache. On the next start, the snapshot is read
+# instead of building the cache, if OpenSlides and the database schema did not
+# change. The changes since the snapshot are read from the history. Changes
+# without history, for example after the history was cleared, are missing.
+# So only use the snapshot, if the history is kept. It is disabled by default.
+
+# ELEMENT_CACHE_SNAPSHOT_PATH = os.path.join(OPENSLIDES_USER_DATA_DIR, 'element_cache.snapshot')
+
+
+# Autoupdate
+
+# Set it to True to save the history, update the cache and send the autoupdate
+# in the background, so the response of a request does not wait for it. The
+# changes of the requests are handled in order. If more then
+# AUTOUPDATE_QUEUE_SIZE changes are waiting, new requests wait until there is
+# space in the queue.
+# The REST views read from the cache. So with True, a GET request directly
+# after a change can still return the old data, until the change has reached
+# the cache. Clients should use the autoupdate to see their own changes.
+
+AUTOUPDATE_IN_BACKGROUND = False
+AUTOUPDATE_QUEUE_SIZE = 1000
+
+# Seconds to wait for further changes after a change in the background, so
+# they are sent with one autoupdate. A change waits at most
+# AUTOUPDATE_COALESCE_MAX_DELAY seconds. Set the window to 0 to send each
+# change as soon as possible. The changes are only coalesced, if
+# AUTOUPDATE_IN_BACKGROUND is True. Else each request sends its own
+# autoupdate before the response.
+
+AUTOUPDATE_COALESCE_WINDOW = 0.05
+AUTOUPDATE_COALESCE_MAX_DELAY = 0.2
+
+# Number of elements in one websocket message, when a client requests all data
+# in chunks.
+
+INITIAL_DATA_CHUNK_SIZE = 500
+
+# Maximum number of messages in the send queue of a websocket connection.
+# Autoupdates, that come in while a client is busy, are merged. If a client
+# lags more then WEBSOCKET_RESYNC_THRESHOLD changes behind, it gets one message
+# to request the changes again.
+
+WEBSOCKET_SEND_QUEUE_SIZE = 100
+WEBSOCKET_RESYNC_THRESHOLD = 100
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.10/topics/i18n/
 
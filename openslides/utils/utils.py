@@ -1,5 +1,6 @@
 import re
-from typing import Dict, Generator, Tuple, Type, Union
+from difflib import SequenceMatcher
+from typing import Any, Dict, Generator, List, Tuple, Type, Union
 
 import roman
 from django.apps import apps
@@ -9,6 +10,11 @@ from django.db.models import Model
 CAMEL_CASE_TO_PSEUDO_SNAKE_CASE_CONVERSION_REGEX_1 = re.compile("(.)([A-Z][a-z]+)")
 CAMEL_CASE_TO_PSEUDO_SNAKE_CASE_CONVERSION_REGEX_2 = re.compile("([a-z0-9])([A-Z])")
 
+TEXT_DIFF_SPLIT_REGEX = re.compile(r"(\s+)")
+
+# Strings that are longer are saved as text diff in get_json_diff().
+MIN_TEXT_DIFF_LENGTH = 200
+
 
 def convert_camel_case_to_pseudo_snake_case(text: str) -> str:
     """
@@ -52,13 +58,106 @@ def split_element_id(element_id: Union[str, bytes]) -> Tuple[str, int]:
     return (collection_str, int(id))
 
 
-def str_dict_to_bytes(str_dict: Dict[str, str]) -> Dict[bytes, bytes]:
+def get_json_diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the difference between two dicts, that apply_json_diff() needs to
+    create new from old.
+
+    Changed dicts are compared recursively and saved in "dicts". Changed
+    strings with more then MIN_TEXT_DIFF_LENGTH characters are saved as text
+    diff in "texts", if it is shorter then the string. All other changed
+    values are saved completely.
+    """
+    diff: Dict[str, Any] = {"set": {}, "unset": [key for key in old if key not in new]}
+    for key, value in new.items():
+        if key not in old:
+            diff["set"][key] = value
+            continue
+        old_value = old[key]
+        if old_value == value:
+            continue
+        if isinstance(old_value, dict) and isinstance(value, dict):
+            diff.setdefault("dicts", {})[key] = get_json_diff(old_value, value)
+            continue
+        if (
+            isinstance(old_value, str)
+            and isinstance(value, str)
+            and len(value) > MIN_TEXT_DIFF_LENGTH
+        ):
+            text_diff = get_text_diff(old_value, value)
+            # Each change needs about 16 characters for the offsets.
+            if sum(len(change[2]) + 16 for change in text_diff) < len(value):
+                diff.setdefault("texts", {})[key] = text_diff
+                continue
+        diff["set"][key] = value
+    return diff
+
+
+def apply_json_diff(old: Dict[str, Any], diff: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a new dict with the diff of get_json_diff() applied to old.
+    """
+    unset = set(diff["unset"])
+    new = {key: value for key, value in old.items() if key not in unset}
+    new.update(diff["set"])
+    for key, dict_diff in diff.get("dicts", {}).items():
+        new[key] = apply_json_diff(old[key], dict_diff)
+    for key, text_diff in diff.get("texts", {}).items():
+        new[key] = apply_text_diff(old[key], text_diff)
+    return new
+
+
+def get_text_diff(old: str, new: str) -> List[List[Any]]:
+    """
+    Returns the changes from old to new. Each change is a list with the start
+    and the end of the replaced part of old and the new text for it.
+
+    The texts are compared word by word, so long texts are compared fast.
+    """
+    old_words = TEXT_DIFF_SPLIT_REGEX.split(old)
+    new_words = TEXT_DIFF_SPLIT_REGEX.split(new)
+    offsets = [0]
+    for word in old_words:
+        offsets.append(offsets[-1] + len(word))
+
+    matcher = SequenceMatcher(None, old_words, new_words, autojunk=False)
+    return [
+        [offsets[old_start], offsets[old_end], "".join(new_words[new_start:new_end])]
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_text_diff(old: str, text_diff: List[List[Any]]) -> str:
+    """
+    Returns the text with the changes of get_text_diff() applied to old.
+    """
+    parts = []
+    position = 0
+    for start, end, text in text_diff:
+        parts.append(old[position:start])
+        parts.append(text)
+        position = end
+    parts.append(old[position:])
+    return "".join(parts)
+
+
+def to_bytes(value: Union[str, bytes]) -> bytes:
+    """
+    Converts a str to bytes. Bytes are returned unchanged.
+    """
+    return value.encode() if isinstance(value, str) else value
+
+
+def str_dict_to_bytes(str_dict: Dict[str, Union[str, bytes]]) -> Dict[bytes, bytes]:
     """
     Converts the key and the value of a dict from str to bytes.
+
+    Values, that are already bytes, are not changed.
     """
     out = {}
     for key, value in str_dict.items():
-        out[key.encode()] = value.encode()
+        out[key.encode()] = to_bytes(value)
     return out
 
 
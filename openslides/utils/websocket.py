@@ -1,19 +1,112 @@
-from collections import defaultdict
-from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import weakref
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Union
 
 import jsonschema
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
 
 from .autoupdate import AutoupdateFormat
 from .cache import element_cache
+from .cache_codecs import dumps_json
 from .utils import split_element_id
 
 
+logger = logging.getLogger(__name__)
+
+
+def get_user_group_name(user_id: int) -> str:
+    """
+    Returns the name of the channel group of all connections of the user.
+    """
+    return f"user-{user_id}"
+
+
+class QueuedAutoupdate:
+    """
+    Autoupdate in the send queue of a consumer for all change_ids from
+    from_change_id until to_change_id.
+
+    The message is built when it is sent, so the autoupdates of change_ids
+    that come in while the consumer is busy are merged.
+    """
+
+    def __init__(self, change_id: int) -> None:
+        self.from_change_id = self.to_change_id = change_id
+
+    def __len__(self) -> int:
+        return self.to_change_id - self.from_change_id + 1
+
+
+class SendQueueMetrics:
+    """
+    Metrics about the send queues of all consumers of this process.
+    """
+
+    def __init__(self) -> None:
+        self.consumers: "weakref.WeakSet[ProtocollAsyncJsonWebsocketConsumer]" = (
+            weakref.WeakSet()
+        )
+        self.max_depth = 0
+        self.merged_messages = 0
+        self.resyncs = 0
+
+    def observe(self, consumer: "ProtocollAsyncJsonWebsocketConsumer") -> None:
+        """
+        Registers the consumer and its current queue depth.
+        """
+        self.consumers.add(consumer)
+        self.max_depth = max(self.max_depth, len(consumer.send_queue))
+
+    def get_data(self) -> Dict[str, int]:
+        """
+        Returns the current metrics.
+        """
+        depths = [len(consumer.send_queue) for consumer in self.consumers]
+        return {
+            "consumers": len(depths),
+            "queued_messages": sum(depths),
+            "current_max_depth": max(depths, default=0),
+            "max_depth": self.max_depth,
+            "merged_messages": self.merged_messages,
+            "resyncs": self.resyncs,
+        }
+
+
+send_queue_metrics = SendQueueMetrics()
+
+
 class ProtocollAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
     """
     Mixin for JSONWebsocketConsumers, that speaks the a special protocol.
+
+    All messages are put into a send queue and sent by a background task, so
+    a slow client does not block the handling of other messages. The send
+    queue holds at most settings.WEBSOCKET_SEND_QUEUE_SIZE messages. If it is
+    full, send_json() waits. Consecutive autoupdates and messages with a type
+    in merged_message_types are merged in the queue. If the queued autoupdates
+    lag more then settings.WEBSOCKET_RESYNC_THRESHOLD change_ids behind, they
+    are replaced by one message of the type resync. Then the client has to
+    request the changes since the change_id in the content.
+    """
+
+    merged_message_types = ["projector"]
+    """
+    Types of messages with a dict as content, that are merged with the last
+    message in the send queue, if it has the same type. The values of the newer
+    message win.
     """
 
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.send_queue: Deque[Union[Dict[str, Any], QueuedAutoupdate]] = deque()
+        self.send_queue_size = getattr(settings, "WEBSOCKET_SEND_QUEUE_SIZE", 100)
+        self.resync_threshold = getattr(settings, "WEBSOCKET_RESYNC_THRESHOLD", 100)
+        self.send_queue_space = asyncio.Event()
+        self.send_task: Optional[asyncio.Future] = None
+        super().__init__(*args, **kwargs)
+
     async def send_json(
         self,
         type: str,
@@ -23,20 +116,148 @@ class ProtocollAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
     ) -> None:
         """
         Sends the data with the type.
+
+        Waits while the send queue is full.
         """
         out = {"type": type, "content": content}
         if id:
             out["id"] = id
         if in_response:
             out["in_response"] = in_response
-        await super().send_json(out)
+
+        last_message = self.send_queue[-1] if self.send_queue else None
+        if (
+            type in self.merged_message_types
+            and isinstance(last_message, dict)
+            and last_message.keys() == out.keys() == {"type", "content"}
+            and last_message["type"] == type
+        ):
+            last_message["content"] = {**last_message["content"], **content}
+            send_queue_metrics.merged_messages += 1
+            return
+
+        while len(self.send_queue) >= self.send_queue_size:
+            self.send_queue_space.clear()
+            await self.send_queue_space.wait()
+        self.put_in_send_queue(out)
+
+    def send_autoupdate(self, change_id: int) -> None:
+        """
+        Puts the autoupdate of the change_id into the send queue.
+
+        Does not wait, if the send queue is full. The autoupdate is merged with
+        the last message, if it is also an autoupdate. If the client lags too
+        far behind, a resync message is sent instead.
+        """
+        queued_autoupdates = []
+        for message in self.send_queue:
+            if isinstance(message, QueuedAutoupdate):
+                queued_autoupdates.append(message)
+            elif message["type"] == "resync":
+                # The client requests this change later.
+                return
+
+        if queued_autoupdates and self.send_queue[-1] is queued_autoupdates[-1]:
+            queued_autoupdates[-1].to_change_id = change_id
+            send_queue_metrics.merged_messages += 1
+        else:
+            queued_autoupdates.append(QueuedAutoupdate(change_id))
+            self.put_in_send_queue(queued_autoupdates[-1])
+
+        lag = sum(len(autoupdate) for autoupdate in queued_autoupdates)
+        if lag > self.resync_threshold:
+            # Replace the first queued autoupdate with the resync message and
+            # remove the others.
+            first = queued_autoupdates[0]
+            resync = {"type": "resync", "content": {"change_id": first.from_change_id}}
+            self.send_queue = deque(
+                resync if message is first else message
+                for message in self.send_queue
+                if message is first or not isinstance(message, QueuedAutoupdate)
+            )
+            send_queue_metrics.resyncs += 1
+
+    def put_in_send_queue(
+        self, message: Union[Dict[str, Any], QueuedAutoupdate]
+    ) -> None:
+        """
+        Puts a message into the send queue and starts the task to send it.
+        """
+        self.send_queue.append(message)
+        send_queue_metrics.observe(self)
+        if self.send_task is None:
+            self.send_task = asyncio.ensure_future(self.send_queued_messages())
+
+    async def send_queued_messages(self) -> None:
+        """
+        Sends the messages of the send queue until it is empty.
+        """
+        try:
+            while self.send_queue:
+                message = self.send_queue.popleft()
+                self.send_queue_space.set()
+                try:
+                    if isinstance(message, QueuedAutoupdate):
+                        try:
+                            text_data = await self.get_autoupdate_message(message)
+                        except asyncio.CancelledError:
+                            raise
+                        except Exception:
+                            # Do not drop the autoupdate silently. The client
+                            # requests the changes again.
+                            logger.exception("Error while building an autoupdate.")
+                            text_data = await self.get_resync_message(
+                                message.from_change_id
+                            )
+                    else:
+                        text_data = await self.encode_json(message)
+                    await self.send(text_data=text_data)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Error while sending a websocket message.")
+        finally:
+            self.send_task = None
+
+    async def get_resync_message(self, change_id: int) -> str:
+        """
+        Returns the encoded message, that tells the client to request all
+        changes since the change_id.
+        """
+        send_queue_metrics.resyncs += 1
+        return await self.encode_json(
+            {"type": "resync", "content": {"change_id": change_id}}
+        )
+
+    async def get_autoupdate_message(self, autoupdate: QueuedAutoupdate) -> str:
+        """
+        Returns the encoded message of a queued autoupdate.
+        """
+        raise NotImplementedError(
+            "Consumers that send autoupdates need the method get_autoupdate_message()."
+        )
+
+    async def disconnect(self, close_code: int) -> None:
+        """
+        Stops sending the queued messages.
+        """
+        if self.send_task is not None:
+            self.send_task.cancel()
+        self.send_queue.clear()
+
+    @classmethod
+    async def encode_json(cls, content: Any) -> str:
+        """
+        Encodes the data with orjson if it is installed.
+        """
+        return dumps_json(content)
 
     async def receive_json(self, content: Any) -> None:
         """
         Receives the json data, parses it and calls receive_content.
         """
         try:
-            jsonschema.validate(content, schema)
+            validate_client_message(content)
         except jsonschema.ValidationError as err:
             try:
                 in_response = content["id"]
@@ -109,6 +330,19 @@ websocket_client_messages: Dict[str, BaseWebsocketClientMessage] = {}
 Saves all websocket client message object ordered by there identifier.
 """
 
+websocket_client_message_validators: Dict[str, jsonschema.Draft7Validator] = {}
+"""
+Saves the compiled validators of all websocket client messages ordered by
+there identifier.
+"""
+
+envelope_validator = jsonschema.Draft7Validator(
+    {key: value for key, value in schema.items() if key != "anyOf"}
+)
+"""
+Validator for the parts of schema, that all messages have in common.
+"""
+
 
 def register_client_message(
     websocket_client_message: BaseWebsocketClientMessage
@@ -138,34 +372,140 @@ def register_client_message(
 
     schema["anyOf"].append(message_schema)
 
+    # Compile the validator once. The schema of the message is checked, so an
+    # invalid schema fails at the start and not with the first message.
+    jsonschema.Draft7Validator.check_schema(message_schema)
+    websocket_client_message_validators[
+        websocket_client_message.identifier
+    ] = jsonschema.Draft7Validator(message_schema)
+
+
+def validate_client_message(message: Any) -> None:
+    """
+    Validates a message from a client.
+
+    First the message is validated against the schema without the types of
+    the messages. Then it is validated only against the schema of its type.
+    Both validators are compiled once.
+
+    Raises a jsonschema.ValidationError, if the message is invalid.
+    """
+    envelope_validator.validate(message)
+    try:
+        validator = websocket_client_message_validators[message["type"]]
+    except KeyError:
+        raise jsonschema.ValidationError(
+            f"{message['type']!r} is not a known message type."
+        )
+    validator.validate(message)
+
 
 async def get_element_data(user_id: int, change_id: int = 0) -> AutoupdateFormat:
     """
     Returns all element data since a change_id.
     """
+    current_change_id = await get_checked_change_id(change_id)
+    element_data = await get_changed_element_data(user_id, change_id, current_change_id)
+    if element_data is None:
+        element_data = AutoupdateFormat(
+            changed=await element_cache.get_all_restricted_data(user_id),
+            deleted={},
+            from_change_id=change_id,
+            to_change_id=current_change_id,
+            all_data=True,
+        )
+    return element_data
+
+
+async def send_element_data(
+    consumer: ProtocollAsyncJsonWebsocketConsumer,
+    change_id: int = 0,
+    stream: bool = False,
+    in_response: Optional[str] = None,
+) -> None:
+    """
+    Sends all element data since a change_id to the user of the consumer.
+
+    If stream is True and all data has to be sent, the elements are sent in
+    messages of the type autoupdateChunk with about
+    settings.INITIAL_DATA_CHUNK_SIZE elements each. The following autoupdate
+    message without elements marks the end of the data. So the data of all
+    collections is never in memory at once.
+
+    Raises a ValueError, if the change_id is higher then the current change_id.
+    """
+    user_id = consumer.scope["user"]["id"]
+    if not stream:
+        element_data = await get_element_data(user_id, change_id)
+        await consumer.send_json(
+            type="autoupdate", content=element_data, in_response=in_response
+        )
+        return
+
+    current_change_id = await get_checked_change_id(change_id)
+    changed_element_data = None
+    if change_id:
+        changed_element_data = await get_changed_element_data(
+            user_id, change_id, current_change_id
+        )
+    if changed_element_data is not None:
+        element_data = changed_element_data
+    else:
+        chunk_size = getattr(settings, "INITIAL_DATA_CHUNK_SIZE", 500)
+        async for chunk in element_cache.iter_all_restricted_data(user_id, chunk_size):
+            await consumer.send_json(
+                type="autoupdateChunk", content=chunk, in_response=in_response
+            )
+        element_data = AutoupdateFormat(
+            changed={},
+            deleted={},
+            from_change_id=change_id,
+            to_change_id=current_change_id,
+            all_data=True,
+        )
+    await consumer.send_json(
+        type="autoupdate", content=element_data, in_response=in_response
+    )
+
+
+async def get_checked_change_id(change_id: int) -> int:
+    """
+    Returns the current change_id.
+
+    Raises a ValueError, if the requested change_id is higher.
+    """
     current_change_id = await element_cache.get_current_change_id()
     if change_id > current_change_id:
         raise ValueError("Requested change_id is higher this highest change_id.")
+    return current_change_id
+
+
+async def get_changed_element_data(
+    user_id: int, change_id: int, current_change_id: int
+) -> Optional[AutoupdateFormat]:
+    """
+    Returns the element data since a change_id until current_change_id.
+
+    Returns None, if the change_id is lower then the lowest change_id in the
+    cache. In this case all data has to be sent.
+    """
     try:
         changed_elements, deleted_element_ids = await element_cache.get_restricted_data(
             user_id, change_id, current_change_id
         )
     except RuntimeError:
-        # The change_id is lower the the lowerst change_id in redis. Return all data
-        changed_elements = await element_cache.get_all_restricted_data(user_id)
-        all_data = True
-        deleted_elements: Dict[str, List[int]] = {}
-    else:
-        all_data = False
-        deleted_elements = defaultdict(list)
-        for element_id in deleted_element_ids:
-            collection_string, id = split_element_id(element_id)
-            deleted_elements[collection_string].append(id)
+        # The change_id is lower the the lowerst change_id in redis.
+        return None
+
+    deleted_elements: Dict[str, List[int]] = defaultdict(list)
+    for element_id in deleted_element_ids:
+        collection_string, id = split_element_id(element_id)
+        deleted_elements[collection_string].append(id)
 
     return AutoupdateFormat(
         changed=changed_elements,
         deleted=deleted_elements,
         from_change_id=change_id,
         to_change_id=current_change_id,
-        all_data=all_data,
+        all_data=False,
     )
@@ -0,0 +1,57 @@
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand
+
+from openslides.utils.cache import element_cache
+from openslides.utils.cache_codecs import get_available_codecs
+
+
+DEFAULT_ROUNDS = 5
+
+
+class Command(BaseCommand):
+    """
+    Command to compare the codecs of the element cache.
+
+    Run create-example-data first to get a meeting of a realistic size.
+    """
+
+    help = "Measures the codecs of the element cache with the data in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-r",
+            "--rounds",
+            type=int,
+            default=DEFAULT_ROUNDS,
+            help=f"Number of rounds for each codec (default {DEFAULT_ROUNDS}).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Load elements from the database ...")
+        elements = []
+        for cachable in element_cache.cachables.values():
+            elements.extend(cachable.get_elements())
+        self.stdout.write(f"{len(elements)} elements loaded.")
+
+        rounds = options["rounds"]
+        self.stdout.write(
+            f"{'codec':<10}{'size (KB)':>12}{'dumps (ms)':>14}{'loads (ms)':>14}"
+        )
+        for name, codec in get_available_codecs().items():
+            start = default_timer()
+            for __ in range(rounds):
+                encoded = [codec.dumps(element) for element in elements]
+            dumps_time = (default_timer() - start) / rounds
+
+            start = default_timer()
+            for __ in range(rounds):
+                for value in encoded:
+                    codec.loads(value)
+            loads_time = (default_timer() - start) / rounds
+
+            size = sum(len(value) for value in encoded)
+            self.stdout.write(
+                f"{name:<10}{size / 1024:>12.1f}"
+                f"{dumps_time * 1000:>14.1f}{loads_time * 1000:>14.1f}"
+            )
@@ -0,0 +1,102 @@
+import json
+from timeit import default_timer
+from typing import Any, Dict
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from openslides.core.models import History, HistoryData
+from openslides.utils.autoupdate import Element
+from openslides.utils.cache import element_cache
+
+
+DEFAULT_VERSIONS = 20
+
+
+def get_size(data):
+    return len(json.dumps(data, cls=DjangoJSONEncoder)) if data is not None else 0
+
+
+class Command(BaseCommand):
+    """
+    Command to measure the size of the history and the time to read it.
+
+    Adds some versions of all elements to the history. Each version changes
+    one small field of each element, like most changes in a meeting. Run
+    create-example-data first. The created history entries are deleted
+    afterwards.
+    """
+
+    help = "Measures the size of the history and the time to read it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--versions",
+            type=int,
+            default=DEFAULT_VERSIONS,
+            help=f"Number of versions of each element (default {DEFAULT_VERSIONS}).",
+        )
+        parser.add_argument(
+            "--without-diff",
+            action="store_true",
+            help="Save the full data of each entry, like before the diffs.",
+        )
+
+    def handle(self, *args, **options):
+        if options["without_diff"]:
+            HistoryData.max_diff_ratio = 0
+        element_cache.ensure_cache()
+        all_full_data = async_to_sync(element_cache.get_all_full_data)()
+        last_history_id = (
+            History.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        )
+        last_history_data_id = (
+            HistoryData.objects.order_by("-id").values_list("id", flat=True).first()
+            or 0
+        )
+
+        try:
+            for version in range(options["versions"]):
+                History.objects.add_elements(
+                    [
+                        Element(
+                            id=full_data["id"],
+                            collection_string=collection_string,
+                            full_data=dict(full_data, benchmark_version=version),
+                            information="",
+                            user_id=None,
+                            disable_history=False,
+                        )
+                        for collection_string, data in all_full_data.items()
+                        for full_data in data
+                    ]
+                )
+
+            stored_size = 0
+            for full_data, diff in HistoryData.objects.filter(
+                id__gt=last_history_data_id
+            ).values_list("full_data", "diff"):
+                stored_size += get_size(full_data) + get_size(diff)
+
+            start = default_timer()
+            snapshots: Dict[int, Any] = {}
+            history_full_data = [
+                instance.full_data.get_full_data(snapshots)
+                for instance in History.objects.filter(id__gt=last_history_id)
+                .select_related("full_data")
+                .order_by("id")
+            ]
+            read_duration = default_timer() - start
+            full_size = sum(get_size(full_data) for full_data in history_full_data)
+        finally:
+            with transaction.atomic():
+                History.objects.filter(id__gt=last_history_id).delete()
+                HistoryData.objects.filter(id__gt=last_history_data_id).delete()
+
+        self.stdout.write(f"History entries:          {len(history_full_data)}")
+        self.stdout.write(f"Size of the full data:    {full_size / 1024:.0f} KB")
+        self.stdout.write(f"Size of the stored data:  {stored_size / 1024:.0f} KB")
+        self.stdout.write(f"Read all entries:         {read_duration * 1000:.0f} ms")
@@ -0,0 +1,129 @@
+from timeit import default_timer
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from openslides.core.models import History, HistoryData
+from openslides.utils.autoupdate import AutoupdateDispatcher, Element, save_history
+from openslides.utils.cache import element_cache
+
+
+DEFAULT_SIZES = [10, 100, 1000]
+DEFAULT_ROUNDS = 5
+
+
+async def handle_nothing(elements):
+    """
+    Replaces the update of the cache and the autoupdate, so only the history
+    is measured.
+    """
+
+
+class Command(BaseCommand):
+    """
+    Command to measure the saving of the history for bundles of different
+    sizes.
+
+    In the mode "request", the history is saved in the request, like with
+    AUTOUPDATE_IN_BACKGROUND = False. In the mode "background", the request
+    only waits until the bundle is in the queue of the autoupdate dispatcher.
+
+    Run create-example-data first. The created history entries are deleted
+    afterwards.
+    """
+
+    help = "Measures the saving of the history for bundles of different sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-s",
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=DEFAULT_SIZES,
+            help=f"Numbers of elements in a bundle (default {DEFAULT_SIZES}).",
+        )
+        parser.add_argument(
+            "-r",
+            "--rounds",
+            type=int,
+            default=DEFAULT_ROUNDS,
+            help=f"Number of rounds for each size (default {DEFAULT_ROUNDS}).",
+        )
+
+    def handle(self, *args, **options):
+        element_cache.ensure_cache()
+        all_elements = []
+        for collection_string, data in async_to_sync(
+            element_cache.get_all_full_data
+        )().items():
+            for full_data in data:
+                all_elements.append(
+                    Element(
+                        id=full_data["id"],
+                        collection_string=collection_string,
+                        full_data=full_data,
+                        information="",
+                        user_id=None,
+                        disable_history=False,
+                    )
+                )
+
+        last_history_id = (
+            History.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        )
+        last_history_data_id = (
+            HistoryData.objects.order_by("-id").values_list("id", flat=True).first()
+            or 0
+        )
+
+        self.stdout.write(
+            f"{'size':>8}{'mode':>12}{'request (ms)':>16}{'total (ms)':>14}"
+        )
+        try:
+            for size in options["sizes"]:
+                elements = (all_elements * (size // len(all_elements) + 1))[:size]
+                for mode in ("request", "background"):
+                    request_duration = 0.0
+                    total_duration = 0.0
+                    for __ in range(options["rounds"]):
+                        if mode == "request":
+                            start = default_timer()
+                            save_history(elements)
+                            request_duration += default_timer() - start
+                            total_duration += default_timer() - start
+                        else:
+                            durations = async_to_sync(self.dispatch)(elements)
+                            request_duration += durations[0]
+                            total_duration += durations[1]
+                    rounds = options["rounds"]
+                    self.stdout.write(
+                        f"{size:>8}{mode:>12}"
+                        f"{request_duration / rounds * 1000:>16.2f}"
+                        f"{total_duration / rounds * 1000:>14.2f}"
+                    )
+        finally:
+            with transaction.atomic():
+                History.objects.filter(id__gt=last_history_id).delete()
+                HistoryData.objects.filter(id__gt=last_history_data_id).delete()
+
+    async def dispatch(self, elements):
+        """
+        Dispatches the elements like AutoupdateBundleMiddleware in the
+        background mode.
+
+        Returns the time the request waits and the time until the history is
+        saved.
+        """
+        dispatcher = AutoupdateDispatcher()
+        with patch(
+            "openslides.utils.autoupdate.async_handle_changed_elements", handle_nothing
+        ):
+            start = default_timer()
+            await sync_to_async(dispatcher.dispatch)(elements)
+            request_duration = default_timer() - start
+            await dispatcher.join()
+            total_duration = default_timer() - start
+        return request_duration, total_duration
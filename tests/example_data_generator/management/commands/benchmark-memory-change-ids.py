@@ -0,0 +1,77 @@
+from timeit import default_timer
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from openslides.utils.cache_providers import MemmoryCacheProvider
+
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+DEFAULT_QUERIES = 1000
+
+
+class Command(BaseCommand):
+    """
+    Command to measure the change_id lookups of the MemmoryCacheProvider.
+
+    This does not need any data in the database.
+    """
+
+    help = "Measures the change_id lookups of the memory cache provider."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-s",
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=DEFAULT_SIZES,
+            help=f"Numbers of change_ids (default {DEFAULT_SIZES}).",
+        )
+        parser.add_argument(
+            "-q",
+            "--queries",
+            type=int,
+            default=DEFAULT_QUERIES,
+            help=f"Number of queries for each measurement (default {DEFAULT_QUERIES}).",
+        )
+
+    def handle(self, *args, **options):
+        async_to_sync(self.benchmark)(options["sizes"], options["queries"])
+
+    async def benchmark(self, sizes, queries):
+        self.stdout.write(
+            f"{'change_ids':>12}{'current (us)':>16}{'lowest (us)':>16}"
+            f"{'since (us)':>16}"
+        )
+        for size in sizes:
+            provider = MemmoryCacheProvider()
+            provider.full_data = {
+                f"app/collection:{id}": f'{{"id": {id}}}' for id in range(100)
+            }
+            for change_id in range(size):
+                await provider.add_changed_elements(
+                    1, [f"app/collection:{change_id % 100}"]
+                )
+            current_change_id = (await provider.get_current_change_id())[0][1]
+
+            start = default_timer()
+            for __ in range(queries):
+                await provider.get_current_change_id()
+            current_time = (default_timer() - start) / queries
+
+            start = default_timer()
+            for __ in range(queries):
+                await provider.get_lowest_change_id()
+            lowest_time = (default_timer() - start) / queries
+
+            # Get the last ten changes, like a reconnecting client.
+            start = default_timer()
+            for __ in range(queries):
+                await provider.get_data_since(current_change_id - 9)
+            since_time = (default_timer() - start) / queries
+
+            self.stdout.write(
+                f"{size:>12}{current_time * 1e6:>16.2f}{lowest_time * 1e6:>16.2f}"
+                f"{since_time * 1e6:>16.2f}"
+            )
@@ -0,0 +1,85 @@
+import asyncio
+from timeit import default_timer
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+
+from openslides.utils.cache import element_cache
+from openslides.utils.redis import use_redis
+
+
+DEFAULT_CALLS = 2000
+DEFAULT_CONCURRENCY = [1, 50]
+
+
+class Command(BaseCommand):
+    """
+    Command to measure the calls per second of the element cache against redis.
+
+    REDIS_ADDRESS has to be set in the settings. Run create-example-data first
+    to get a meeting of a realistic size.
+    """
+
+    help = "Measures the calls per second of the element cache against redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--calls",
+            type=int,
+            default=DEFAULT_CALLS,
+            help=f"Number of calls for each measurement (default {DEFAULT_CALLS}).",
+        )
+        parser.add_argument(
+            "-c",
+            "--concurrency",
+            nargs="+",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help=f"Numbers of concurrent callers (default {DEFAULT_CONCURRENCY}).",
+        )
+
+    def handle(self, *args, **options):
+        if not use_redis:
+            raise CommandError("REDIS_ADDRESS has to be set in the settings.")
+        element_cache.ensure_cache(reset=True)
+        async_to_sync(self.benchmark)(options["calls"], options["concurrency"])
+
+    async def benchmark(self, calls, concurrencies):
+        cache_provider = element_cache.cache_provider
+        element = await element_cache.get_element_full_data("users/user", 1)
+
+        async def get_current_change_id(number):
+            await cache_provider.get_current_change_id()
+
+        async def get_element(number):
+            await cache_provider.get_element("users/user:1")
+
+        async def update_restricted_data(number):
+            # Like an autoupdate: one changed element and the restricted data
+            # of one user.
+            await element_cache.change_elements({"users/user:1": element})
+            await element_cache.update_restricted_data(number % 10 + 1)
+
+        self.stdout.write(
+            f"{'call':<26}{'concurrency':>12}{'calls/s':>12}{'ms/call':>12}"
+        )
+        for name, function in (
+            ("get_current_change_id", get_current_change_id),
+            ("get_element", get_element),
+            ("update_restricted_data", update_restricted_data),
+        ):
+            for concurrency in concurrencies:
+                numbers = iter(range(calls))
+
+                async def caller():
+                    for number in numbers:
+                        await function(number)
+
+                start = default_timer()
+                await asyncio.gather(*(caller() for __ in range(concurrency)))
+                duration = default_timer() - start
+                self.stdout.write(
+                    f"{name:<26}{concurrency:>12}{calls / duration:>12.0f}"
+                    f"{duration / calls * 1000:>12.2f}"
+                )
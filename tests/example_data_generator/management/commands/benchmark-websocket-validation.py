@@ -0,0 +1,64 @@
+from timeit import default_timer
+
+import jsonschema
+from django.core.management.base import BaseCommand
+
+from openslides.utils.websocket import schema, validate_client_message
+
+
+DEFAULT_MESSAGES = 10000
+
+# Messages like the client sends them, with the most frequent types.
+MESSAGES = [
+    {"type": "getElements", "content": {"change_id": 42}, "id": "id1"},
+    {"type": "listenToProjectors", "content": {"projector_ids": [1]}, "id": "id2"},
+    {
+        "type": "notify",
+        "content": {"name": "vote", "content": {"value": "Y"}, "users": [1, 2, 3]},
+        "id": "id3",
+    },
+    {"type": "autoupdate", "content": "on", "id": "id4"},
+    {"type": "constants", "content": "", "id": "id5"},
+]
+
+
+def validate_with_combined_schema(message):
+    """
+    The validation before the validators were compiled: the message is
+    validated against the schema of all types and the validator is built for
+    each message.
+    """
+    jsonschema.validate(message, schema)
+
+
+class Command(BaseCommand):
+    """
+    Command to measure the validation of websocket messages from clients on
+    one worker.
+
+    This does not need any data in the database.
+    """
+
+    help = "Measures the validated websocket messages per second."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-m",
+            "--messages",
+            type=int,
+            default=DEFAULT_MESSAGES,
+            help=f"Number of messages for each measurement (default {DEFAULT_MESSAGES}).",
+        )
+
+    def handle(self, *args, **options):
+        count = options["messages"]
+        self.stdout.write(f"{'validation':>12}{'messages/s':>14}")
+        for name, validate in (
+            ("combined", validate_with_combined_schema),
+            ("compiled", validate_client_message),
+        ):
+            start = default_timer()
+            for index in range(count):
+                validate(MESSAGES[index % len(MESSAGES)])
+            duration = default_timer() - start
+            self.stdout.write(f"{name:>12}{count / duration:>14.0f}")
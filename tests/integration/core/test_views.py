@@ -7,7 +7,8 @@ from rest_framework.test import APIClient
 
 from openslides import __license__ as license, __url__ as url, __version__ as version
 from openslides.core.config import ConfigVariable, config
-from openslides.core.models import Projector
+from openslides.core.models import History, Projector
+from openslides.utils.autoupdate import Element
 from openslides.utils.rest_api import ValidationError
 from openslides.utils.test import TestCase
 
@@ -105,6 +106,92 @@ def test_project_view(client):
     assert projector.elements_preview == [[{"name": "topics/topic", "id": 3}]]
 
 
+def add_history(name, ids=range(1, 6)):
+    History.objects.add_elements(
+        [
+            Element(
+                id=id,
+                collection_string="core/tag",
+                full_data={"id": id, "name": f"{name}{id}"},
+                information="",
+                user_id=None,
+                disable_history=False,
+            )
+            for id in ids
+        ]
+    )
+
+
+def get_history(client, **params):
+    response = client.get(reverse("core_history"), params)
+    assert response.status_code == 200
+    return json.loads(b"".join(response.streaming_content))
+
+
+@pytest.mark.django_db(transaction=False)
+def test_history_view(client):
+    client.login(username="admin", password="admin")
+    add_history("tag")
+    add_history("changed", [1])
+
+    history = get_history(client, element_id="core/tag:1")
+
+    assert [entry["full_data"] for entry in history] == [
+        {"id": 1, "name": "tag1"},
+        {"id": 1, "name": "changed1"},
+    ]
+    assert history[0]["user_id"] is None
+
+
+@pytest.mark.django_db(transaction=False)
+def test_history_view_pagination(client):
+    client.login(username="admin", password="admin")
+    cursor = History.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    add_history("tag")
+
+    first_page = get_history(client, limit=3, cursor=cursor)
+    second_page = get_history(client, limit=3, cursor=first_page["next_cursor"])
+
+    assert [entry["element_id"] for entry in first_page["results"]] == [
+        "core/tag:1",
+        "core/tag:2",
+        "core/tag:3",
+    ]
+    assert [entry["element_id"] for entry in second_page["results"]] == [
+        "core/tag:4",
+        "core/tag:5",
+    ]
+    assert second_page["next_cursor"] is None
+
+
+@pytest.mark.django_db(transaction=False)
+def test_history_view_invalid_limit(client):
+    client.login(username="admin", password="admin")
+
+    response = client.get(reverse("core_history"), {"limit": "a"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db(transaction=False)
+def test_websocket_metrics_view(client):
+    client.login(username="admin", password="admin")
+
+    response = client.get(reverse("core_websocket_metrics"))
+
+    assert response.status_code == 200
+    assert "queued_messages" in response.data
+    assert "resyncs" in response.data
+    assert response.data["change_id_log_size"] >= 0
+
+
+@pytest.mark.django_db(transaction=False)
+def test_websocket_metrics_view_anonymous(client):
+    response = client.get(reverse("core_websocket_metrics"))
+
+    assert response.status_code == 403
+
+
 class VersionView(TestCase):
     """
     Tests the version info view.
@@ -1,10 +1,15 @@
+import json
+from typing import Any, Dict
+
 import pytest
 from django.urls import reverse
 from rest_framework import status
 
 from openslides.core.config import config
-from openslides.core.models import ChatMessage, Projector, Tag
+from openslides.core.models import ChatMessage, History, Projector, Tag
+from openslides.core.websocket import GetHistoryWebsocketClientMessage
 from openslides.users.models import User
+from openslides.utils.autoupdate import Element
 from openslides.utils.test import TestCase
 
 from ..helpers import count_queries
@@ -59,6 +64,167 @@ def test_config_db_queries():
     assert count_queries(Tag.get_elements) == 1
 
 
+def get_tag_elements(name):
+    return [
+        Element(
+            id=index,
+            collection_string="core/tag",
+            full_data={"id": index, "name": f"{name}{index}", "text": "x" * 100},
+            information="",
+            user_id=None,
+            disable_history=False,
+        )
+        for index in range(1, 11)
+    ]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_history_add_elements_db_queries():
+    """
+    Tests that only the following db queries are done:
+    * 1 request to get the snapshots of the elements,
+    * 1 request to insert the history data,
+    * 1 request to get the ids of the history data,
+    * 1 request to insert the history,
+    * 1 request to get the ids of the history,
+    * 2 requests to create and release the savepoint.
+    """
+    elements = get_tag_elements("tag")
+
+    assert count_queries(History.objects.add_elements, elements) == 7
+
+
+@pytest.mark.django_db(transaction=False)
+def test_history_add_elements_diff():
+    History.objects.add_elements(get_tag_elements("tag"))
+    instances = History.objects.add_elements(get_tag_elements("changed"))
+
+    data = (
+        History.objects.select_related("full_data", "full_data__base")
+        .get(pk=instances[0].pk)
+        .full_data
+    )
+    assert data.full_data is None
+    assert data.diff == {"set": {"name": "changed1"}, "unset": []}
+    assert data.get_full_data() == {"id": 1, "name": "changed1", "text": "x" * 100}
+    assert [
+        (instance.element_id, instance.full_data.get_full_data()["name"])
+        for instance in History.objects.select_related(
+            "full_data", "full_data__base"
+        ).filter(pk__in=[instance.pk for instance in instances])
+    ] == [(f"core/tag:{index}", f"changed{index}") for index in range(1, 11)]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_history_motion_text_edit_is_saved_as_diff():
+    text = "".join(
+        f"<p>Paragraph {index} of the motion text.</p>" for index in range(50)
+    )
+    motion: Dict[str, Any] = {
+        "id": 1,
+        "title": "Motion",
+        "text": text,
+        "reason": "<p>Reason</p>",
+    }
+    changed_motion = {**motion, "text": text.replace("Paragraph 20", "Section 20")}
+    History.objects.add_elements(get_motion_elements(motion))
+    instances = History.objects.add_elements(get_motion_elements(changed_motion))
+
+    data = (
+        History.objects.select_related("full_data", "full_data__base")
+        .get(pk=instances[0].pk)
+        .full_data
+    )
+    assert data.full_data is None
+    assert data.diff["set"] == {}
+    assert "text" in data.diff["texts"]
+    assert data.get_full_data() == changed_motion
+
+
+def get_motion_elements(full_data):
+    return [
+        Element(
+            id=full_data["id"],
+            collection_string="motions/motion",
+            full_data=full_data,
+            information="",
+            user_id=None,
+            disable_history=False,
+        )
+    ]
+
+
+class HistoryViewSet(TestCase):
+    """
+    Tests requests to the history, that is not in the element cache.
+    """
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username="admin"))
+        self.instances = History.objects.add_elements(get_tag_elements("tag"))
+
+    def get_list(self, **params):
+        response = self.client.get(reverse("history-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_list(self):
+        entries = self.get_list()
+        self.assertEqual(
+            [entry["element_id"] for entry in entries],
+            [f"core/tag:{index}" for index in range(1, 11)],
+        )
+        self.assertNotIn("full_data", entries[0])
+
+    def test_list_pages(self):
+        page = self.get_list(limit=6)
+        self.assertEqual(len(page["results"]), 6)
+        self.assertEqual(page["next_cursor"], page["results"][-1]["id"])
+
+        page = self.get_list(limit=6, cursor=page["next_cursor"])
+        self.assertEqual(
+            [entry["element_id"] for entry in page["results"]],
+            [f"core/tag:{index}" for index in range(7, 11)],
+        )
+        self.assertIsNone(page["next_cursor"])
+
+    def test_list_element_id(self):
+        entries = self.get_list(element_id="core/tag:2")
+        self.assertEqual([entry["id"] for entry in entries], [self.instances[1].pk])
+
+    def test_retrieve(self):
+        response = self.client.get(
+            reverse("history-detail", args=[self.instances[0].pk])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["element_id"], "core/tag:1")
+
+    def test_retrieve_unknown(self):
+        response = self.client.get(reverse("history-detail", args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_get_history_websocket_page():
+    instances = History.objects.add_elements(get_tag_elements("tag"))
+    message = GetHistoryWebsocketClientMessage()
+
+    page = message.get_page(6)
+    assert [entry["id"] for entry in page["results"]] == [
+        instance.pk for instance in instances[:6]
+    ]
+    assert page["next_cursor"] == instances[5].pk
+
+    page = message.get_page(6, cursor=page["next_cursor"])
+    assert [entry["id"] for entry in page["results"]] == [
+        instance.pk for instance in instances[6:]
+    ]
+    assert page["next_cursor"] is None
+
+    page = message.get_page(6, element_id="core/tag:3")
+    assert [entry["id"] for entry in page["results"]] == [instances[2].pk]
+
+
 class ChatMessageViewSet(TestCase):
     """
     Tests requests to deal with chat messages.
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
 
 from django.db import DEFAULT_DB_ALIAS, connections
 from django.test.utils import CaptureQueriesContext
@@ -9,6 +9,17 @@ from openslides.users.models import User
 from openslides.utils.projector import get_config, register_projector_element
 
 
+def filter_elements(
+    elements: List[Dict[str, Any]], ids: Optional[Iterable[int]]
+) -> List[Dict[str, Any]]:
+    """
+    Returns only the elements with the ids, if ids is not None.
+    """
+    if ids is None:
+        return elements
+    return [element for element in elements if element["id"] in ids]
+
+
 class TConfig:
     """
     Cachable, that fills the cache with the default values of the config variables.
@@ -17,7 +28,7 @@ class TConfig:
     def get_collection_string(self) -> str:
         return config.get_collection_string()
 
-    def get_elements(self) -> List[Dict[str, Any]]:
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
         elements = []
         config.key_to_id = {}
         for id, item in enumerate(config.config_variables.values()):
@@ -25,13 +36,23 @@ class TConfig:
                 {"id": id + 1, "key": item.name, "value": item.default_value}
             )
             config.key_to_id[item.name] = id + 1
-        return elements
+        return filter_elements(elements, ids)
 
     async def restrict_elements(
         self, user_id: int, elements: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         return elements
 
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return elements
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return []
+
 
 class TUser:
     """
@@ -41,8 +62,8 @@ class TUser:
     def get_collection_string(self) -> str:
         return User.get_collection_string()
 
-    def get_elements(self) -> List[Dict[str, Any]]:
-        return [
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        elements = [
             {
                 "id": 1,
                 "username": "admin",
@@ -63,12 +84,23 @@ class TUser:
                 "session_auth_hash": "362d4f2de1463293cb3aaba7727c967c35de43ee",
             }
         ]
+        return filter_elements(elements, ids)
 
     async def restrict_elements(
         self, user_id: int, elements: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         return elements
 
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return elements
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return []
+
 
 class TProjector:
     """
@@ -78,17 +110,28 @@ class TProjector:
     def get_collection_string(self) -> str:
         return Projector.get_collection_string()
 
-    def get_elements(self) -> List[Dict[str, Any]]:
-        return [
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        elements = [
             {"id": 1, "elements": [{"name": "test/slide1", "id": 1}]},
             {"id": 2, "elements": [{"name": "test/slide2", "id": 1}]},
         ]
+        return filter_elements(elements, ids)
 
     async def restrict_elements(
         self, user_id: int, elements: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         return elements
 
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return elements
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return []
+
 
 def slide1(
     config: Dict[str, Any], all_data: Dict[str, Dict[int, Dict[str, Any]]]
@@ -1,5 +1,6 @@
 import asyncio
 from importlib import import_module
+from typing import Any, Dict, List
 from unittest.mock import patch
 
 import pytest
@@ -118,6 +119,27 @@ async def test_connection_with_change_id(get_communicator, set_config):
     assert TUser().get_collection_string() in content["changed"]
 
 
+@pytest.mark.asyncio
+async def test_connection_with_stream(get_communicator, set_config, settings):
+    settings.INITIAL_DATA_CHUNK_SIZE = 1
+    await set_config("general_system_enable_anonymous", True)
+    communicator = get_communicator("change_id=0&stream=1")
+    await communicator.connect()
+
+    changed: Dict[str, List[Dict[str, Any]]] = {}
+    response = await communicator.receive_json_from()
+    while response["type"] == "autoupdateChunk":
+        for collection_string, elements in response["content"].items():
+            assert len(elements) == 1
+            changed.setdefault(collection_string, []).extend(elements)
+        response = await communicator.receive_json_from()
+
+    assert response["type"] == "autoupdate"
+    assert response["content"]["changed"] == {}
+    assert response["content"]["all_data"]
+    assert changed == (await element_cache.get_all_restricted_data(0))
+
+
 @pytest.mark.asyncio
 async def test_connection_with_change_id_get_restricted_data_with_restricted_data_cache(
     get_communicator, set_config
@@ -221,6 +243,25 @@ async def test_with_user():
     await communicator.disconnect()
 
 
+@pytest.mark.asyncio
+async def test_receive_resync_for_compacted_change_id(get_communicator, set_config):
+    await set_config("general_system_enable_anonymous", True)
+    communicator = get_communicator("autoupdate=on")
+    await communicator.connect()
+
+    async def get_message(user_id, change_id):
+        raise RuntimeError("change_id is not in the cache anymore")
+
+    with patch("openslides.utils.consumers.autoupdate_fanout.get_message", get_message):
+        with patch("openslides.utils.autoupdate.save_history"):
+            await sync_to_async(inform_deleted_data)(
+                [(Collection1().get_collection_string(), 1)]
+            )
+        response = await communicator.receive_json_from()
+
+    assert response["type"] == "resync"
+
+
 @pytest.mark.asyncio
 async def test_receive_deleted_data(get_communicator, set_config):
     await set_config("general_system_enable_anonymous", True)
@@ -262,6 +303,74 @@ async def test_send_notify(communicator, set_config):
     assert content["senderUserId"] == 0
 
 
+@pytest.mark.asyncio
+async def test_send_notify_to_users(communicator, set_config):
+    await set_config("general_system_enable_anonymous", True)
+    await communicator.connect()
+
+    await communicator.send_json_to(
+        {
+            "type": "notify",
+            "content": {"content": "to other", "name": "message_name", "users": [5]},
+            "id": "test",
+        }
+    )
+    await communicator.send_json_to(
+        {
+            "type": "notify",
+            "content": {"content": "to me", "name": "message_name", "users": [0]},
+            "id": "test",
+        }
+    )
+
+    response = await communicator.receive_json_from()
+    assert response["content"]["content"] == "to me"
+    assert await communicator.receive_nothing()
+
+
+@pytest.mark.asyncio
+async def test_send_notify_to_reply_channels(communicator, set_config):
+    await set_config("general_system_enable_anonymous", True)
+    await communicator.connect()
+    await communicator.send_json_to(
+        {"type": "notify", "content": {"content": "", "name": "ping"}, "id": "test"}
+    )
+    channel_name = (await communicator.receive_json_from())["content"][
+        "senderChannelName"
+    ]
+
+    await communicator.send_json_to(
+        {
+            "type": "notify",
+            "content": {
+                "content": "to my channel",
+                "name": "message_name",
+                "users": [0],
+                "replyChannels": [channel_name, "invalid channel name"],
+            },
+            "id": "test",
+        }
+    )
+
+    await communicator.send_json_to(
+        {
+            "type": "notify",
+            "content": {
+                "content": "only to my channel",
+                "name": "message_name",
+                "replyChannels": [channel_name],
+            },
+            "id": "test",
+        }
+    )
+
+    response = await communicator.receive_json_from()
+    assert response["content"]["content"] == "to my channel"
+    response = await communicator.receive_json_from()
+    assert response["content"]["content"] == "only to my channel"
+    assert await communicator.receive_nothing()
+
+
 @pytest.mark.asyncio
 async def test_invalid_websocket_message_type(communicator, set_config):
     await set_config("general_system_enable_anonymous", True)
@@ -317,6 +426,20 @@ async def test_request_constants(communicator, settings, set_config):
     assert response["content"] == {"constant1": "value1", "constant2": "value2"}
 
 
+@pytest.mark.asyncio
+async def test_get_history_as_anonymous(communicator, set_config):
+    await set_config("general_system_enable_anonymous", True)
+    await communicator.connect()
+
+    await communicator.send_json_to(
+        {"type": "getHistory", "content": {}, "id": "test_id"}
+    )
+
+    response = await communicator.receive_json_from()
+    assert response["type"] == "error"
+    assert response["in_response"] == "test_id"
+
+
 @pytest.mark.asyncio
 async def test_send_get_elements(communicator, set_config):
     await set_config("general_system_enable_anonymous", True)
@@ -340,6 +463,24 @@ async def test_send_get_elements(communicator, set_config):
     assert TUser().get_collection_string() in content["changed"]
 
 
+@pytest.mark.asyncio
+async def test_send_get_elements_stream(communicator, set_config):
+    await set_config("general_system_enable_anonymous", True)
+    await communicator.connect()
+
+    await communicator.send_json_to(
+        {"type": "getElements", "content": {"stream": True}, "id": "test_id"}
+    )
+
+    response = await communicator.receive_json_from()
+    assert response["type"] == "autoupdateChunk"
+    assert response["in_response"] == "test_id"
+    while response["type"] == "autoupdateChunk":
+        response = await communicator.receive_json_from()
+    assert response["type"] == "autoupdate"
+    assert response["in_response"] == "test_id"
+
+
 @pytest.mark.asyncio
 async def test_send_get_elements_to_big_change_id(communicator, set_config):
     await set_config("general_system_enable_anonymous", True)
@@ -571,6 +712,28 @@ async def test_update_projector(communicator, set_config):
     }
 
 
+@pytest.mark.asyncio
+async def test_update_other_projector(communicator, set_config):
+    """
+    A client gets only the data of the projectors, it listens to.
+    """
+    await set_config("general_system_enable_anonymous", True)
+    await communicator.connect()
+    await communicator.send_json_to(
+        {
+            "type": "listenToProjectors",
+            "content": {"projector_ids": [2]},
+            "id": "test_id",
+        }
+    )
+    await communicator.receive_json_from()
+
+    # Change a config value, that is only shown on projector 1
+    await set_config("general_event_name", "Test Event")
+
+    assert await communicator.receive_nothing()
+
+
 @pytest.mark.asyncio
 async def test_update_projector_to_current_value(communicator, set_config):
     """
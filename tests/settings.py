@@ -73,3 +73,6 @@ PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 
 # Deactivate restricted_data_cache
 RESTRICTED_DATA_CACHE = False
+
+# The test database can not be read from other threads.
+ELEMENT_CACHE_BUILD_WORKERS = 1
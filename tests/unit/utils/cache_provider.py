@@ -1,5 +1,5 @@
 import asyncio
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from openslides.utils.cache_providers import Cachable, MemmoryCacheProvider
 
@@ -20,31 +20,66 @@ def restrict_elements(elements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return out
 
 
+def filter_elements(
+    elements: List[Dict[str, Any]], ids: Optional[Iterable[int]]
+) -> List[Dict[str, Any]]:
+    """
+    Returns only the elements with the ids, if ids is not None.
+    """
+    if ids is None:
+        return elements
+    return [element for element in elements if element["id"] in ids]
+
+
 class Collection1:
     def get_collection_string(self) -> str:
         return "app/collection1"
 
-    def get_elements(self) -> List[Dict[str, Any]]:
-        return [{"id": 1, "value": "value1"}, {"id": 2, "value": "value2"}]
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        return filter_elements(
+            [{"id": 1, "value": "value1"}, {"id": 2, "value": "value2"}], ids
+        )
 
     async def restrict_elements(
         self, user_id: int, elements: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         return restrict_elements(elements)
 
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return restrict_elements(elements)
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return []
+
 
 class Collection2:
     def get_collection_string(self) -> str:
         return "app/collection2"
 
-    def get_elements(self) -> List[Dict[str, Any]]:
-        return [{"id": 1, "key": "value1"}, {"id": 2, "key": "value2"}]
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        return filter_elements(
+            [{"id": 1, "key": "value1"}, {"id": 2, "key": "value2"}], ids
+        )
 
     async def restrict_elements(
         self, user_id: int, elements: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         return restrict_elements(elements)
 
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return restrict_elements(elements)
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return []
+
 
 def get_cachable_provider(
     cachables: List[Cachable] = [Collection1(), Collection2()]
@@ -0,0 +1,343 @@
+import asyncio
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+import pytest
+from asgiref.sync import sync_to_async
+
+from openslides.utils import autoupdate
+from openslides.utils.autoupdate import (
+    AutoupdateDispatcher,
+    AutoupdateFanout,
+    Element,
+    encode_autoupdate,
+    format_autoupdate,
+)
+from openslides.utils.cache import ElementCache
+
+from .cache_provider import TTestCacheProvider, filter_elements, get_cachable_provider
+
+
+class PersonalCollection:
+    """
+    Cachable where every user can see the elements with an odd id and the
+    element with his own id.
+    """
+
+    def get_collection_string(self) -> str:
+        return "app/personal"
+
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        return filter_elements(
+            [{"id": id, "value": f"value{id}"} for id in range(1, 5)], ids
+        )
+
+    async def restrict_elements(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return [
+            element
+            for element in elements
+            if element["id"] % 2 or element["id"] == user_id
+        ]
+
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return [element for element in elements if element["id"] % 2]
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return [element for element in elements if element["id"] == user_id]
+
+
+class PlainCollection:
+    """
+    Cachable where every user can see all elements.
+    """
+
+    def __init__(self, collection_string: str, elements: List[Dict[str, Any]]):
+        self.collection_string = collection_string
+        self.elements = elements
+
+    def get_collection_string(self) -> str:
+        return self.collection_string
+
+    def get_elements(self, ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        return filter_elements(self.elements, ids)
+
+    async def restrict_elements(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return elements
+
+    async def restrict_elements_shared(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return elements
+
+    async def restrict_elements_personal(
+        self, user_id: int, elements: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return []
+
+
+def sort_content(content: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Helper function that sorts the elements and ids in an autoupdate.
+    """
+    for key in ("changed", "deleted"):
+        content[key] = {
+            collection_string: sorted(
+                values, key=lambda x: x["id"] if isinstance(x, dict) else x
+            )
+            for collection_string, values in content[key].items()
+            if values or key == "changed"
+        }
+    return content
+
+
+@pytest.fixture(params=[False, True], ids=["without_cache", "with_cache"])
+def element_cache(request):
+    element_cache = ElementCache(
+        use_restricted_data_cache=request.param,
+        cache_provider_class=TTestCacheProvider,
+        cachable_provider=get_cachable_provider(
+            [
+                PersonalCollection(),
+                PlainCollection(
+                    "users/user", [{"id": id, "groups_id": [2]} for id in range(1, 4)]
+                ),
+                PlainCollection("users/group", [{"id": 2, "permissions": ["a"]}]),
+            ]
+        ),
+        start_time=0,
+    )
+    element_cache.ensure_cache()
+    return element_cache
+
+
+@pytest.mark.asyncio
+async def test_fanout_equals_restricted_data(element_cache):
+    fanout = AutoupdateFanout(element_cache)
+    # Fill the restricted_data_cache with the first change.
+    await element_cache.change_elements(
+        {"app/personal:1": {"id": 1, "value": "updated"}}
+    )
+    for user_id in (0, 1, 2, 3):
+        await element_cache.update_restricted_data(user_id)
+
+    change_id = await element_cache.change_elements(
+        {
+            "app/personal:1": {"id": 1, "value": "updated again"},
+            "app/personal:2": {"id": 2, "value": "updated"},
+            "app/personal:3": None,
+            "app/personal:4": {"id": 4, "value": "updated"},
+        }
+    )
+
+    for user_id in (0, 1, 2, 3):
+        message = await fanout.get_message(user_id, change_id)
+
+        changed, deleted = await element_cache.get_restricted_data(
+            user_id, change_id, max_change_id=change_id
+        )
+        expected = encode_autoupdate(format_autoupdate(changed, deleted, change_id))
+        assert json.loads(message)["type"] == "autoupdate"
+        assert sort_content(json.loads(message)["content"]) == sort_content(
+            json.loads(expected)["content"]
+        )
+
+
+@pytest.mark.asyncio
+async def test_fanout_unknown_user(element_cache):
+    fanout = AutoupdateFanout(element_cache)
+    change_id = await element_cache.change_elements(
+        {"app/personal:4": {"id": 4, "value": "updated"}}
+    )
+
+    message = await fanout.get_message(4, change_id)
+
+    assert json.loads(message)["content"]["changed"] == {
+        "app/personal": [{"id": 4, "value": "updated"}]
+    }
+
+
+@pytest.mark.asyncio
+async def test_fanout_shares_permission_class(element_cache):
+    fanout = AutoupdateFanout(element_cache)
+    change_id = await element_cache.change_elements(
+        {"app/personal:1": {"id": 1, "value": "updated"}}
+    )
+    calls = []
+    get_permission_class = element_cache.get_permission_class
+
+    async def counting_get_permission_class(user_id: int) -> str:
+        calls.append(user_id)
+        return await get_permission_class(user_id)
+
+    element_cache.get_permission_class = counting_get_permission_class
+
+    # Two consumers of user 2 and one of user 3.
+    for user_id in (2, 2, 3):
+        await fanout.get_message(user_id, change_id)
+
+    assert sorted(calls) == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_fanout_shares_message(element_cache):
+    fanout = AutoupdateFanout(element_cache)
+    change_id = await element_cache.change_elements(
+        {"app/personal:1": {"id": 1, "value": "updated"}}
+    )
+
+    message_user_2 = await fanout.get_message(2, change_id)
+    message_user_3 = await fanout.get_message(3, change_id)
+
+    assert message_user_2 is message_user_3
+
+
+@pytest.mark.asyncio
+async def test_fanout_max_change_ids(element_cache):
+    fanout = AutoupdateFanout(element_cache, max_change_ids=2)
+    for value in ("a", "b", "c"):
+        change_id = await element_cache.change_elements(
+            {"app/personal:1": {"id": 1, "value": value}}
+        )
+        await fanout.get_message(1, change_id)
+
+    assert list(fanout.futures) == [change_id - 1, change_id]
+
+
+def get_element(id: int) -> Element:
+    return Element(
+        id=id,
+        collection_string="app/personal",
+        full_data={"id": id},
+        information="",
+        user_id=None,
+        disable_history=False,
+    )
+
+
+@pytest.fixture
+def handled_ids(monkeypatch):
+    """
+    Replaces the handling of changed elements. Returns the list of the ids of
+    the handled elements.
+    """
+    handled_ids: List[List[int]] = []
+
+    async def async_handle_changed_elements(elements):
+        # Let other tasks run, so a wrong order would be noticed.
+        await asyncio.sleep(0)
+        ids = [element["id"] for element in elements]
+        if 0 in ids:
+            raise ValueError("Invalid element")
+        handled_ids.append(ids)
+
+    monkeypatch.setattr(autoupdate, "save_history", lambda elements: [])
+    monkeypatch.setattr(
+        autoupdate, "async_handle_changed_elements", async_handle_changed_elements
+    )
+    return handled_ids
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_keeps_order(handled_ids):
+    dispatcher = AutoupdateDispatcher(max_queue_size=2)
+
+    for id in range(1, 6):
+        await sync_to_async(dispatcher.dispatch)([get_element(id)])
+    await dispatcher.join()
+
+    assert [id for ids in handled_ids for id in ids] == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_continues_after_error(handled_ids):
+    dispatcher = AutoupdateDispatcher()
+
+    await sync_to_async(dispatcher.dispatch)([get_element(0)])
+    await dispatcher.join()
+    await sync_to_async(dispatcher.dispatch)([get_element(1)])
+    await dispatcher.join()
+
+    assert handled_ids == [[1]]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_coalesces_changes(handled_ids):
+    dispatcher = AutoupdateDispatcher(coalesce_window=0.05)
+
+    for id in (1, 2, 1):
+        await sync_to_async(dispatcher.dispatch)([get_element(id)])
+        await asyncio.sleep(0.01)
+    await dispatcher.join()
+
+    assert handled_ids == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_coalesce_max_delay(handled_ids):
+    dispatcher = AutoupdateDispatcher(coalesce_window=0.05, coalesce_max_delay=0.05)
+
+    for id in range(1, 11):
+        await sync_to_async(dispatcher.dispatch)([get_element(id)])
+        await asyncio.sleep(0.01)
+    await dispatcher.join()
+
+    assert len(handled_ids) > 1
+    assert [id for ids in handled_ids for id in ids] == list(range(1, 11))
+
+
+def test_dispatcher_without_event_loop(handled_ids):
+    dispatcher = AutoupdateDispatcher()
+
+    dispatcher.dispatch([get_element(1)])
+
+    assert handled_ids == [[1]]
+    assert dispatcher.queue is None
+
+
+class BundleModel:
+    """
+    Model that counts how often the elements are loaded.
+    """
+
+    loaded_ids: List[List[int]] = []
+
+    def __init__(self, id):
+        self.id = id
+
+    @classmethod
+    def get_collection_string(cls):
+        return "app/model"
+
+    def get_rest_pk(self):
+        return self.id
+
+    @classmethod
+    def get_elements(cls, ids):
+        ids = sorted(ids)
+        cls.loaded_ids.append(ids)
+        # The element with the id 3 does not exist anymore.
+        return [{"id": id, "value": f"value{id}"} for id in ids if id != 3]
+
+
+def test_bundle_serializes_instances_once():
+    BundleModel.loaded_ids = []
+    bundle = autoupdate.AutoupdateBundle()
+
+    for id in (1, 2, 1, 3, 4):
+        bundle.add_instance(BundleModel(id), "", None)
+    bundle.update({"app/model:4": get_element(4)})
+    elements = {element["id"]: element for element in bundle.get_elements()}
+
+    assert BundleModel.loaded_ids == [[1, 2, 3]]
+    assert elements[1]["full_data"] == {"id": 1, "value": "value1"}
+    assert elements[2]["full_data"] == {"id": 2, "value": "value2"}
+    assert elements[3]["full_data"] is None
+    assert elements[4]["full_data"] == {"id": 4}
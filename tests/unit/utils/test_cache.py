@@ -1,15 +1,16 @@
 import asyncio
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping, Union, cast
 
 import pytest
 
 from openslides.utils.cache import ElementCache
+from openslides.utils.cache_providers import MemmoryCacheProvider
 
 from .cache_provider import TTestCacheProvider, example_data, get_cachable_provider
 
 
-def decode_dict(encoded_dict: Dict[str, str]) -> Dict[str, Any]:
+def decode_dict(encoded_dict: Mapping[str, Union[str, bytes]]) -> Dict[str, Any]:
     """
     Helper function that loads the json values of a dict.
     """
@@ -228,11 +229,47 @@ async def test_get_element_full_data_full_redis(element_cache):
     assert result == {"id": 1, "value": "value1"}
 
 
+@pytest.mark.asyncio
+async def test_get_permission_class(element_cache):
+    element_cache.cache_provider.full_data = {
+        "users/user:1": '{"id": 1, "groups_id": [2, 3]}',
+        "users/user:2": '{"id": 2, "groups_id": [3, 2]}',
+        "users/user:3": '{"id": 3, "groups_id": [2]}',
+        "users/group:2": '{"id": 2, "permissions": ["a", "b"]}',
+        "users/group:3": '{"id": 3, "permissions": ["c"]}',
+    }
+
+    key_1 = await element_cache.get_permission_class(1)
+    key_2 = await element_cache.get_permission_class(2)
+    key_3 = await element_cache.get_permission_class(3)
+
+    assert key_1 == key_2
+    assert key_1 != key_3
+    assert key_1.startswith("groups:2,3:")
+
+
+@pytest.mark.asyncio
+async def test_get_permission_class_changed_permissions(element_cache):
+    element_cache.cache_provider.full_data = {
+        "users/user:1": '{"id": 1, "groups_id": [2]}',
+        "users/group:2": '{"id": 2, "permissions": ["a"]}',
+    }
+    old_key = await element_cache.get_permission_class(1)
+    element_cache.cache_provider.full_data[
+        "users/group:2"
+    ] = '{"id": 2, "permissions": ["a", "b"]}'
+
+    new_key = await element_cache.get_permission_class(1)
+
+    assert old_key != new_key
+
+
 @pytest.mark.asyncio
 async def test_exists_restricted_data(element_cache):
     element_cache.use_restricted_data_cache = True
+    key = await element_cache.get_permission_class(0)
     element_cache.cache_provider.restricted_data = {
-        0: {
+        key: {
             "app/collection1:1": '{"id": 1, "value": "value1"}',
             "app/collection1:2": '{"id": 2, "value": "value2"}',
             "app/collection2:1": '{"id": 1, "key": "value1"}',
@@ -266,7 +303,7 @@ async def test_exists_restricted_data_do_not_use_restricted_data(element_cache):
 async def test_del_user(element_cache):
     element_cache.use_restricted_data_cache = True
     element_cache.cache_provider.restricted_data = {
-        0: {
+        "user:1": {
             "app/collection1:1": '{"id": 1, "value": "value1"}',
             "app/collection1:2": '{"id": 2, "value": "value2"}',
             "app/collection2:1": '{"id": 1, "key": "value1"}',
@@ -274,7 +311,7 @@ async def test_del_user(element_cache):
         }
     }
 
-    await element_cache.del_user(0)
+    await element_cache.del_user(1)
 
     assert not element_cache.cache_provider.restricted_data
 
@@ -291,10 +328,13 @@ async def test_del_user_for_empty_user(element_cache):
 @pytest.mark.asyncio
 async def test_update_restricted_data(element_cache):
     element_cache.use_restricted_data_cache = True
+    key = await element_cache.get_permission_class(0)
 
     await element_cache.update_restricted_data(0)
 
-    assert decode_dict(element_cache.cache_provider.restricted_data[0]) == decode_dict(
+    assert decode_dict(
+        element_cache.cache_provider.restricted_data[key]
+    ) == decode_dict(
         {
             "app/collection1:1": '{"id": 1, "value": "restricted_value1"}',
             "app/collection1:2": '{"id": 2, "value": "restricted_value2"}',
@@ -304,9 +344,31 @@ async def test_update_restricted_data(element_cache):
         }
     )
     # Make sure the lock is deleted
-    assert not await element_cache.cache_provider.get_lock("restricted_data_0")
-    # And the future is done
-    assert element_cache.restricted_data_cache_updater[0].done()
+    assert not await element_cache.cache_provider.get_lock(f"restricted_data_{key}")
+    # And the future is removed
+    assert key not in element_cache.restricted_data_cache_updater
+
+
+@pytest.mark.asyncio
+async def test_update_restricted_data_with_error(element_cache):
+    element_cache.use_restricted_data_cache = True
+    key = await element_cache.get_permission_class(0)
+
+    async def restrict_elements_shared(user_id, elements):
+        raise RuntimeError("restricter failed")
+
+    cachable = element_cache.cachables["app/collection1"]
+    restricter = cachable.restrict_elements_shared
+    cachable.restrict_elements_shared = restrict_elements_shared
+    with pytest.raises(RuntimeError):
+        await element_cache.update_restricted_data(0)
+
+    # The lock is released and the future is removed, so the next call works.
+    assert not await element_cache.cache_provider.get_lock(f"restricted_data_{key}")
+    assert key not in element_cache.restricted_data_cache_updater
+    cachable.restrict_elements_shared = restricter
+    await element_cache.update_restricted_data(0)
+    assert element_cache.cache_provider.restricted_data[key]
 
 
 @pytest.mark.asyncio
@@ -321,12 +383,15 @@ async def test_update_restricted_data_disabled_restricted_data(element_cache):
 @pytest.mark.asyncio
 async def test_update_restricted_data_to_low_change_id(element_cache):
     element_cache.use_restricted_data_cache = True
-    element_cache.cache_provider.restricted_data[0] = {"_config:change_id": "1"}
+    key = await element_cache.get_permission_class(0)
+    element_cache.cache_provider.restricted_data[key] = {"_config:change_id": "1"}
     element_cache.cache_provider.change_id_data = {3: {"app/collection1:1"}}
 
     await element_cache.update_restricted_data(0)
 
-    assert decode_dict(element_cache.cache_provider.restricted_data[0]) == decode_dict(
+    assert decode_dict(
+        element_cache.cache_provider.restricted_data[key]
+    ) == decode_dict(
         {
             "app/collection1:1": '{"id": 1, "value": "restricted_value1"}',
             "app/collection1:2": '{"id": 2, "value": "restricted_value2"}',
@@ -340,19 +405,23 @@ async def test_update_restricted_data_to_low_change_id(element_cache):
 @pytest.mark.asyncio
 async def test_update_restricted_data_with_same_id(element_cache):
     element_cache.use_restricted_data_cache = True
-    element_cache.cache_provider.restricted_data[0] = {"_config:change_id": "1"}
+    key = await element_cache.get_permission_class(0)
+    element_cache.cache_provider.restricted_data[key] = {"_config:change_id": "1"}
     element_cache.cache_provider.change_id_data = {1: {"app/collection1:1"}}
 
     await element_cache.update_restricted_data(0)
 
     # Same id means, there is nothing to do
-    assert element_cache.cache_provider.restricted_data[0] == {"_config:change_id": "1"}
+    assert element_cache.cache_provider.restricted_data[key] == {
+        "_config:change_id": "1"
+    }
 
 
 @pytest.mark.asyncio
 async def test_update_restricted_data_with_deleted_elements(element_cache):
     element_cache.use_restricted_data_cache = True
-    element_cache.cache_provider.restricted_data[0] = {
+    key = await element_cache.get_permission_class(0)
+    element_cache.cache_provider.restricted_data[key] = {
         "app/collection1:3": '{"id": 1, "value": "restricted_value1"}',
         "_config:change_id": "1",
     }
@@ -360,7 +429,9 @@ async def test_update_restricted_data_with_deleted_elements(element_cache):
 
     await element_cache.update_restricted_data(0)
 
-    assert element_cache.cache_provider.restricted_data[0] == {"_config:change_id": "2"}
+    assert element_cache.cache_provider.restricted_data[key] == {
+        "_config:change_id": "2"
+    }
 
 
 @pytest.mark.asyncio
@@ -371,14 +442,15 @@ async def test_update_restricted_data_second_worker_on_different_server(element_
     This tests makes use of the redis key as it would on different daphne servers.
     """
     element_cache.use_restricted_data_cache = True
-    element_cache.cache_provider.restricted_data = {0: {}}
-    await element_cache.cache_provider.set_lock("restricted_data_0")
-    await element_cache.cache_provider.del_lock_after_wait("restricted_data_0")
+    key = await element_cache.get_permission_class(0)
+    element_cache.cache_provider.restricted_data = {key: {}}
+    await element_cache.cache_provider.set_lock(f"restricted_data_{key}", 60)
+    await element_cache.cache_provider.del_lock_after_wait(f"restricted_data_{key}")
 
     await element_cache.update_restricted_data(0)
 
     # Restricted_data_should not be set on second worker
-    assert element_cache.cache_provider.restricted_data == {0: {}}
+    assert element_cache.cache_provider.restricted_data == {key: {}}
 
 
 @pytest.mark.asyncio
@@ -389,16 +461,19 @@ async def test_update_restricted_data_second_worker_on_same_server(element_cache
     This tests makes use of the future as it would on the same daphne server.
     """
     element_cache.use_restricted_data_cache = True
-    element_cache.cache_provider.restricted_data = {0: {}}
+    key = await element_cache.get_permission_class(0)
+    element_cache.cache_provider.restricted_data = {key: {}}
     future: asyncio.Future = asyncio.Future()
-    element_cache.restricted_data_cache_updater[0] = future
-    await element_cache.cache_provider.set_lock("restricted_data_0")
-    await element_cache.cache_provider.del_lock_after_wait("restricted_data_0", future)
+    element_cache.restricted_data_cache_updater[key] = future
+    await element_cache.cache_provider.set_lock(f"restricted_data_{key}", 60)
+    await element_cache.cache_provider.del_lock_after_wait(
+        f"restricted_data_{key}", future
+    )
 
     await element_cache.update_restricted_data(0)
 
     # Restricted_data_should not be set on second worker
-    assert element_cache.cache_provider.restricted_data == {0: {}}
+    assert element_cache.cache_provider.restricted_data == {key: {}}
 
 
 @pytest.mark.asyncio
@@ -440,6 +515,63 @@ async def test_get_all_restricted_data_disabled_restricted_data_cache(element_ca
     )
 
 
+def merge_chunks(
+    chunks: List[Dict[str, List[Dict[str, Any]]]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Helper function that merges the chunks of iter_all_restricted_data.
+    """
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for chunk in chunks:
+        for collection_string, elements in chunk.items():
+            out.setdefault(collection_string, []).extend(elements)
+    return out
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_restricted_data_cache", [True, False])
+async def test_iter_all_restricted_data(element_cache, use_restricted_data_cache):
+    element_cache.use_restricted_data_cache = use_restricted_data_cache
+
+    chunks = [chunk async for chunk in element_cache.iter_all_restricted_data(0, 1)]
+
+    assert len(chunks) == 4
+    assert sort_dict(merge_chunks(chunks)) == sort_dict(
+        await element_cache.get_all_restricted_data(0)
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_restricted_data_cache", [True, False])
+async def test_iter_all_restricted_data_scan_duplicates(
+    element_cache, use_restricted_data_cache
+):
+    """
+    Redis can return an element twice, when the hash is rehashed during a scan.
+    """
+    element_cache.use_restricted_data_cache = use_restricted_data_cache
+    element_cache.decoded_full_data = None
+    scan_data = element_cache.cache_provider.scan_data
+    scanned_data: Dict[bytes, bytes] = {}
+
+    async def scan_data_with_duplicates(cursor, *args, **kwargs):
+        if not cursor:
+            # A new scan.
+            scanned_data.clear()
+        cursor, data = await scan_data(cursor, *args, **kwargs)
+        data = {**scanned_data, **data}
+        scanned_data.update(data)
+        return cursor, data
+
+    element_cache.cache_provider.scan_data = scan_data_with_duplicates
+
+    chunks = [chunk async for chunk in element_cache.iter_all_restricted_data(0, 1)]
+
+    assert sort_dict(merge_chunks(chunks)) == sort_dict(
+        await element_cache.get_all_restricted_data(0)
+    )
+
+
 @pytest.mark.asyncio
 async def test_get_restricted_data_change_id_0(element_cache):
     element_cache.use_restricted_data_cache = True
@@ -511,3 +643,191 @@ async def test_lowest_change_id_after_updating_lowest_element(element_cache):
 
     assert first_lowest_change_id == 1
     assert second_lowest_change_id == 1  # The lowest_change_id should not change
+
+
+@pytest.mark.asyncio
+async def test_get_all_full_data_decoded_data_cache(element_cache):
+    element_cache.decoded_data_cache_size = 100
+    await element_cache.get_all_full_data()
+    # Change the data without a new change_id. The decoded data is used.
+    element_cache.cache_provider.full_data = {}
+
+    result = await element_cache.get_all_full_data()
+
+    assert sort_dict(result) == sort_dict(example_data())
+
+
+@pytest.mark.asyncio
+async def test_get_all_full_data_decoded_data_cache_with_changes(element_cache):
+    element_cache.decoded_data_cache_size = 100
+    await element_cache.get_all_full_data()
+
+    await element_cache.change_elements(
+        {
+            "app/collection1:1": {"id": 1, "value": "updated"},
+            "app/collection1:3": {"id": 3, "value": "new"},
+            "app/collection2:2": None,
+        }
+    )
+    result = await element_cache.get_all_full_data()
+
+    assert sort_dict(result) == {
+        "app/collection1": [
+            {"id": 1, "value": "updated"},
+            {"id": 2, "value": "value2"},
+            {"id": 3, "value": "new"},
+        ],
+        "app/collection2": [{"id": 1, "key": "value1"}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_all_full_data_decoded_data_cache_too_small(element_cache):
+    element_cache.decoded_data_cache_size = 3
+
+    await element_cache.get_all_full_data()
+
+    assert element_cache.decoded_full_data is None
+
+
+@pytest.mark.asyncio
+async def test_get_collection_full_data(element_cache):
+    result = await element_cache.get_collection_full_data("app/collection1")
+
+    assert sorted(result, key=lambda x: x["id"]) == example_data()["app/collection1"]
+
+
+@pytest.mark.asyncio
+async def test_get_collection_full_data_unknown_collection(element_cache):
+    result = await element_cache.get_collection_full_data("app/unknown")
+
+    assert result == []
+
+
+@pytest.mark.asyncio
+async def test_get_collection_restricted_data(element_cache):
+    element_cache.use_restricted_data_cache = True
+
+    result = await element_cache.get_collection_restricted_data(0, "app/collection2")
+
+    assert sorted(result, key=lambda x: x["id"]) == [
+        {"id": 1, "key": "restricted_value1"},
+        {"id": 2, "key": "restricted_value2"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compact_change_ids_retention_count(element_cache):
+    element_cache.change_id_retention_count = 2
+    for value in ("a", "b", "c"):
+        change_id = await element_cache.change_elements(
+            {"app/collection1:1": {"id": 1, "value": value}}
+        )
+    await element_cache.change_elements({"app/collection2:1": None})
+
+    assert await element_cache.get_lowest_change_id() == change_id
+    assert await element_cache.get_change_id_log_size() == 2
+    with pytest.raises(RuntimeError):
+        await element_cache.get_full_data(change_id - 1)
+    assert await element_cache.get_full_data(change_id) == (
+        {"app/collection1": [{"id": 1, "value": "c"}]},
+        ["app/collection2:1"],
+    )
+
+
+@pytest.mark.asyncio
+async def test_compact_change_ids_retention_age(element_cache):
+    element_cache.change_id_retention_age = 60
+    first_change_id = await element_cache.change_elements(
+        {"app/collection1:1": {"id": 1, "value": "old"}}
+    )
+    # Let the first change_id look old.
+    element_cache.change_id_times[0] = (0, first_change_id)
+    for __ in range(100):
+        await element_cache.change_elements(
+            {"app/collection1:2": {"id": 2, "value": "new"}}
+        )
+
+    assert await element_cache.get_lowest_change_id() == first_change_id + 1
+    assert await element_cache.get_change_id_log_size() == 100
+
+
+@pytest.mark.asyncio
+async def test_compact_change_ids_of_other_process(element_cache):
+    # A second process, that uses the same cache provider.
+    other_element_cache = ElementCache(
+        cache_provider_class=TTestCacheProvider,
+        cachable_provider=get_cachable_provider(),
+        start_time=0,
+    )
+    other_element_cache.cache_provider = element_cache.cache_provider
+    for value in ("a", "b", "c", "d"):
+        await element_cache.change_elements(
+            {"app/collection1:1": {"id": 1, "value": value}}
+        )
+    element_cache.change_id_retention_count = 1
+    await element_cache.compact_change_ids(4)
+
+    # The other process does not move the lowest change_id back, but learns
+    # it from the provider.
+    other_element_cache.change_id_retention_count = 3
+    await other_element_cache.compact_change_ids(4)
+
+    assert await element_cache.get_lowest_change_id() == 4
+    assert other_element_cache.compacted_change_id == 4
+
+
+@pytest.mark.asyncio
+async def test_compact_change_ids_without_retention(element_cache):
+    for value in ("a", "b", "c"):
+        await element_cache.change_elements(
+            {"app/collection1:1": {"id": 1, "value": value}}
+        )
+
+    assert await element_cache.get_lowest_change_id() == 1
+    assert await element_cache.get_change_id_log_size() == 3
+
+
+def test_build_full_data_cache_with_threads():
+    element_cache = ElementCache(
+        cache_provider_class=TTestCacheProvider,
+        cachable_provider=get_cachable_provider(),
+        start_time=0,
+        build_workers=2,
+        build_batch_size=1,
+    )
+
+    element_cache.ensure_cache()
+    cache_provider = cast(MemmoryCacheProvider, element_cache.cache_provider)
+
+    assert decode_dict(cache_provider.full_data) == decode_dict(
+        {
+            "app/collection1:1": '{"id": 1, "value": "value1"}',
+            "app/collection1:2": '{"id": 2, "value": "value2"}',
+            "app/collection2:1": '{"id": 1, "key": "value1"}',
+            "app/collection2:2": '{"id": 2, "key": "value2"}',
+        }
+    )
+    assert cache_provider.staged_data == {}
+
+
+@pytest.mark.asyncio
+async def test_staged_elements_are_not_visible(element_cache):
+    await element_cache.change_elements(
+        {"app/collection1:1": {"id": 1, "value": "updated"}}
+    )
+    await element_cache.cache_provider.add_staged_elements(
+        {"app/collection1:1": '{"id": 1, "value": "staged"}'}
+    )
+
+    assert await element_cache.get_element_full_data("app/collection1", 1) == {
+        "id": 1,
+        "value": "updated",
+    }
+
+    await element_cache.cache_provider.commit_staged_elements()
+
+    assert element_cache.cache_provider.full_data == {
+        "app/collection1:1": '{"id": 1, "value": "staged"}'
+    }
+    assert element_cache.cache_provider.change_id_data == {}
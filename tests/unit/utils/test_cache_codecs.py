@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from openslides.utils import cache_codecs
+from openslides.utils.cache import ElementCache
+from openslides.utils.cache_codecs import JSONCodec, get_available_codecs, get_codec
+
+from .cache_provider import TTestCacheProvider, get_cachable_provider
+
+
+@pytest.mark.parametrize("name", list(get_available_codecs()))
+def test_codec_roundtrip(name):
+    codec = get_codec(name)
+    element = {"id": 1, "title": "Motion ä", "submitters_id": [1, 2], "text": None}
+
+    assert codec.loads(codec.dumps(element)) == element
+
+
+def test_get_codec_unknown():
+    with pytest.raises(ValueError):
+        get_codec("unknown")
+
+
+def test_get_codec_json():
+    assert isinstance(get_codec("json"), JSONCodec)
+
+
+@pytest.fixture(params=list(get_available_codecs()))
+def element_cache(request):
+    element_cache = ElementCache(
+        cache_provider_class=TTestCacheProvider,
+        cachable_provider=get_cachable_provider(),
+        start_time=0,
+        codec=get_codec(request.param),
+    )
+    element_cache.ensure_cache()
+    return element_cache
+
+
+@pytest.mark.asyncio
+async def test_element_cache_with_codec(element_cache):
+    await element_cache.change_elements(
+        {"app/collection1:1": {"id": 1, "value": "updated"}}
+    )
+
+    assert await element_cache.get_element_full_data("app/collection1", 1) == {
+        "id": 1,
+        "value": "updated",
+    }
+    assert await element_cache.get_all_restricted_data(0) == {
+        "app/collection1": [
+            {"id": 1, "value": "restricted_updated"},
+            {"id": 2, "value": "restricted_value2"},
+        ],
+        "app/collection2": [
+            {"id": 1, "key": "restricted_value1"},
+            {"id": 2, "key": "restricted_value2"},
+        ],
+    }
+
+
+class FakeOrjson:
+    OPT_NON_STR_KEYS = 1
+
+    @staticmethod
+    def dumps(data, option=None):
+        return b"orjson"
+
+
+def test_dumps_json_uses_json_by_default(monkeypatch, settings):
+    monkeypatch.setattr(cache_codecs, "orjson", FakeOrjson)
+    settings.ELEMENT_CACHE_CODEC = "json"
+
+    assert cache_codecs.dumps_json({1: "ä"}) == json.dumps({1: "ä"})
+
+
+def test_dumps_json_uses_orjson_when_configured(monkeypatch, settings):
+    monkeypatch.setattr(cache_codecs, "orjson", FakeOrjson)
+    settings.ELEMENT_CACHE_CODEC = "orjson"
+
+    assert cache_codecs.dumps_json({1: "ä"}) == "orjson"
@@ -0,0 +1,209 @@
+import asyncio
+
+import pytest
+
+from openslides.utils.cache_providers import MemmoryCacheProvider, RedisCacheProvider
+from openslides.utils.redis import get_connection, use_redis
+
+
+@pytest.fixture
+def provider():
+    provider = MemmoryCacheProvider()
+    provider.full_data = {
+        "app/collection1:1": '{"id": 1}',
+        "app/collection1:2": '{"id": 2}',
+    }
+    return provider
+
+
+@pytest.mark.asyncio
+async def test_memory_add_changed_elements(provider):
+    first = await provider.add_changed_elements(5, ["app/collection1:1"])
+    second = await provider.add_changed_elements(5, ["app/collection1:2"])
+
+    assert (first, second) == (5, 6)
+    assert provider.change_ids == [5, 6]
+    assert await provider.get_current_change_id() == [("no_usefull_value", 6)]
+    assert await provider.get_lowest_change_id() == 5
+
+
+@pytest.mark.asyncio
+async def test_memory_assign_change_id_data(provider):
+    provider.change_id_data = {7: {"app/collection1:1"}, 3: {"app/collection1:2"}}
+
+    assert await provider.get_current_change_id() == [("no_usefull_value", 7)]
+    assert await provider.get_lowest_change_id() == 3
+    assert await provider.get_change_id_log_size() == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_get_data_since_range(provider):
+    provider.change_id_data = {
+        1: {"app/collection1:1"},
+        2: {"app/collection1:3"},
+        3: {"app/collection1:2"},
+    }
+
+    changed, deleted = await provider.get_data_since(2, max_change_id=2)
+
+    assert changed == {}
+    assert deleted == ["app/collection1:3"]
+
+    changed, deleted = await provider.get_data_since(3)
+
+    assert changed == {"app/collection1": [b'{"id": 2}']}
+    assert deleted == []
+
+
+@pytest.mark.asyncio
+async def test_memory_compact_change_ids(provider):
+    provider.change_id_data = {
+        1: {"app/collection1:1"},
+        2: {"app/collection1:3"},
+        4: {"app/collection1:2"},
+    }
+
+    await provider.compact_change_ids(3)
+
+    assert provider.change_ids == [3, 4]
+    assert provider.change_id_data == {3: set(), 4: {"app/collection1:2"}}
+    assert await provider.get_change_id_log_size() == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_lock(provider):
+    token = await provider.set_lock("test", 60)
+
+    assert token
+    assert await provider.get_lock("test")
+    assert await provider.set_lock("test", 60) is None
+
+
+@pytest.mark.asyncio
+async def test_memory_del_lock_with_other_token(provider):
+    await provider.set_lock("test", 60)
+
+    await provider.del_lock("test", "other_token")
+
+    assert await provider.get_lock("test")
+
+
+@pytest.mark.asyncio
+async def test_memory_lock_expires(provider):
+    await provider.set_lock("test", 0.01)
+    await asyncio.sleep(0.02)
+
+    assert not await provider.get_lock("test")
+    assert await provider.set_lock("test", 60)
+
+
+@pytest.mark.asyncio
+async def test_memory_wait_for_lock(provider):
+    token = await provider.set_lock("test", 60)
+    asyncio.get_event_loop().call_later(
+        0.01, asyncio.ensure_future, provider.del_lock("test", token)
+    )
+
+    await asyncio.wait_for(provider.wait_for_lock("test"), 1)
+
+    assert not await provider.get_lock("test")
+    assert not provider.lock_waiters["test"]
+
+
+@pytest.mark.asyncio
+async def test_memory_get_restricted_data_changes(provider):
+    provider.restricted_data = {"key": {"_config:change_id": "1"}}
+    provider.change_id_data = {1: {"app/collection1:1"}, 2: {"app/collection1:2"}}
+
+    result = await provider.get_restricted_data_changes("key")
+
+    assert result == (1, 2, ({"app/collection1": [b'{"id": 2}']}, []))
+
+
+@pytest.mark.asyncio
+async def test_memory_get_restricted_data_changes_too_old(provider):
+    provider.restricted_data = {"key": {"_config:change_id": "1"}}
+    provider.change_id_data = {3: {"app/collection1:1"}}
+
+    result = await provider.get_restricted_data_changes("key")
+
+    assert result == (1, 3, None)
+
+
+@pytest.mark.asyncio
+async def test_memory_update_projector_hashes(provider):
+    first = await provider.update_projector_hashes({1: "a", 2: "b"})
+    second = await provider.update_projector_hashes({1: "a", 2: "c"})
+    third = await provider.update_projector_hashes({2: "c"})
+
+    assert first == [1, 2]
+    assert second == [2]
+    assert third == [1]
+
+
+@pytest.mark.asyncio
+async def test_memory_scan_data(provider):
+    cursor, first = await provider.scan_data(0, 1, "app/collection1")
+    cursor, second = await provider.scan_data(cursor, 1, "app/collection1")
+
+    assert cursor == 0
+    assert {**first, **second} == {
+        b"app/collection1:1": b'{"id": 1}',
+        b"app/collection1:2": b'{"id": 2}',
+    }
+
+
+@pytest.fixture
+async def redis_provider():
+    provider = RedisCacheProvider()
+    await provider.clear_cache()
+    yield provider
+    await provider.clear_cache()
+
+
+@pytest.mark.skipif(not use_redis, reason="needs redis")
+@pytest.mark.asyncio
+async def test_redis_compact_change_ids(redis_provider):
+    for element_id in ("app/collection1:1", "app/collection1:2", "app/collection1:3"):
+        await redis_provider.add_changed_elements(1, [element_id])
+
+    assert await redis_provider.compact_change_ids(3) == 3
+    assert await redis_provider.get_lowest_change_id() == 3
+    assert await redis_provider.get_change_id_log_size() == 1
+    # The lowest change_id does not move back.
+    assert await redis_provider.compact_change_ids(2) == 3
+    assert await redis_provider.get_lowest_change_id() == 3
+
+
+@pytest.mark.skipif(not use_redis, reason="needs redis")
+@pytest.mark.asyncio
+async def test_redis_clear_cache_old_layout(redis_provider):
+    async with get_connection() as redis:
+        await redis.hset("element_cache_full_data", "app/collection1:1", "{}")
+        await redis.delete(redis_provider.get_layout_cache_key())
+        await redis.set("other_key", "value")
+
+    await redis_provider.clear_cache()
+
+    async with get_connection() as redis:
+        assert not await redis.exists("element_cache_full_data")
+        assert await redis.get(redis_provider.get_layout_cache_key()) == b"1"
+        assert await redis.get("other_key") == b"value"
+        await redis.delete("other_key")
+
+
+@pytest.mark.skipif(not use_redis, reason="needs redis")
+@pytest.mark.asyncio
+async def test_redis_clear_cache_tracked_keys(redis_provider):
+    await redis_provider.add_staged_elements({"app/collection1:1": "{}"})
+    await redis_provider.commit_staged_elements()
+    await redis_provider.add_changed_elements(1, ["app/collection1:1"])
+
+    await redis_provider.clear_cache()
+
+    async with get_connection() as redis:
+        assert not await redis.exists(
+            redis_provider.get_full_data_cache_key("app/collection1"),
+            redis_provider.get_change_id_cache_key(),
+            redis_provider.get_full_data_collections_cache_key(),
+        )
@@ -0,0 +1,143 @@
+import json
+from typing import Iterable, Set
+
+import pytest
+
+from openslides.utils.cache import ElementCache
+from openslides.utils.cache_snapshot import ElementCacheSnapshot
+
+from .cache_provider import TTestCacheProvider, get_cachable_provider
+
+
+class TTestSnapshot(ElementCacheSnapshot):
+    """
+    Snapshot that does not use the database.
+    """
+
+    fingerprint = "fingerprint"
+    position = 0
+    changed_element_ids: Set[str] = set()
+
+    def get_fingerprint(
+        self, collection_strings: Iterable[str], codec_name: str
+    ) -> str:
+        return self.fingerprint
+
+    def get_position(self) -> int:
+        return self.position
+
+    def get_changed_element_ids(self, position: int) -> Set[str]:
+        return self.changed_element_ids
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    # Do not write the snapshots of the tests when pytest exits.
+    monkeypatch.setattr("openslides.utils.cache.atexit.register", lambda func: None)
+    snapshot = TTestSnapshot(str(tmp_path / "element_cache.snapshot"))
+    snapshot.write(
+        "fingerprint",
+        100,
+        0,
+        {
+            b"app/collection1:1": b'{"id": 1, "value": "snapshot1"}',
+            b"app/collection1:2": b'{"id": 2, "value": "snapshot2"}',
+            b"app/collection2:1": b'{"id": 1, "key": "snapshot1"}',
+        },
+    )
+    return snapshot
+
+
+def get_element_cache(snapshot):
+    return ElementCache(
+        cache_provider_class=TTestCacheProvider,
+        cachable_provider=get_cachable_provider(),
+        start_time=0,
+        snapshot=snapshot,
+    )
+
+
+def decode_full_data(element_cache):
+    return {
+        key: json.loads(value)
+        for key, value in element_cache.cache_provider.full_data.items()
+    }
+
+
+def test_read_write(snapshot):
+    data = snapshot.read()
+
+    assert data.fingerprint == "fingerprint"
+    assert data.change_id == 100
+    assert data.position == 0
+    assert data.elements[b"app/collection1:1"] == b'{"id": 1, "value": "snapshot1"}'
+
+
+def test_read_invalid_file(snapshot):
+    with open(snapshot.path, "r+b") as snapshot_file:
+        snapshot_file.truncate(50)
+
+    assert snapshot.read() is None
+
+
+def test_ensure_cache_loads_snapshot(snapshot):
+    element_cache = get_element_cache(snapshot)
+
+    element_cache.ensure_cache()
+
+    assert decode_full_data(element_cache) == {
+        "app/collection1:1": {"id": 1, "value": "snapshot1"},
+        "app/collection1:2": {"id": 2, "value": "snapshot2"},
+        "app/collection2:1": {"id": 1, "key": "snapshot1"},
+    }
+    assert element_cache.start_time == 100
+
+
+def test_ensure_cache_replays_changed_elements(snapshot):
+    snapshot.position = 5
+    snapshot.changed_element_ids = {
+        "app/collection1:1",
+        "app/collection2:2",
+        "app/collection2:3",
+        "app/unknown:1",
+    }
+    element_cache = get_element_cache(snapshot)
+
+    element_cache.ensure_cache()
+
+    assert decode_full_data(element_cache) == {
+        "app/collection1:1": {"id": 1, "value": "value1"},
+        "app/collection1:2": {"id": 2, "value": "snapshot2"},
+        "app/collection2:1": {"id": 1, "key": "snapshot1"},
+        "app/collection2:2": {"id": 2, "key": "value2"},
+    }
+    assert element_cache.cache_provider.change_ids == [101]
+
+
+def test_ensure_cache_with_other_fingerprint(snapshot):
+    snapshot.fingerprint = "other_fingerprint"
+    element_cache = get_element_cache(snapshot)
+
+    element_cache.ensure_cache()
+
+    assert decode_full_data(element_cache)["app/collection1:1"] == {
+        "id": 1,
+        "value": "value1",
+    }
+    # The snapshot is written again after the cache was built.
+    data = snapshot.read()
+    assert data.fingerprint == "other_fingerprint"
+    assert len(data.elements) == 4
+
+
+def test_ensure_cache_with_old_position(snapshot):
+    # The database is older then the snapshot.
+    snapshot.position = -1
+    element_cache = get_element_cache(snapshot)
+
+    element_cache.ensure_cache()
+
+    assert decode_full_data(element_cache)["app/collection1:1"] == {
+        "id": 1,
+        "value": "value1",
+    }
@@ -0,0 +1,18 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from openslides.utils.redis import get_pool, pool_closers, pools, use_redis
+
+
+@pytest.mark.skipif(not use_redis, reason="needs redis")
+def test_async_to_sync_closes_pool():
+    async def get_pool_and_loop():
+        return await get_pool(), asyncio.get_event_loop()
+
+    pool, loop = async_to_sync(get_pool_and_loop)()
+
+    assert pool.closed
+    assert loop not in pools
+    assert loop not in pool_closers
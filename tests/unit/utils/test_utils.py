@@ -20,3 +20,41 @@ def test_get_model_from_collection_string_known_app():
 def test_get_model_from_collection_string_unknown_app():
     with pytest.raises(ValueError):
         utils.get_model_from_collection_string("invalid/model")
+
+
+def test_json_diff():
+    old = {"id": 1, "title": "old", "text": "text", "removed": True}
+    new = {"id": 1, "title": "new", "text": "text", "added": [1, 2]}
+
+    diff = utils.get_json_diff(old, new)
+
+    assert diff == {"set": {"title": "new", "added": [1, 2]}, "unset": ["removed"]}
+    assert utils.apply_json_diff(old, diff) == new
+
+
+def test_json_diff_nested():
+    text = " ".join(f"word{index}" for index in range(100))
+    old = {"id": 1, "text": text, "data": {"a": 1, "b": {"c": 2, "d": 3}}}
+    new = {
+        "id": 1,
+        "text": text.replace("word50", "changed"),
+        "data": {"a": 1, "b": {"c": 4, "d": 3}},
+    }
+
+    diff = utils.get_json_diff(old, new)
+
+    assert diff["set"] == {}
+    assert diff["dicts"] == {
+        "data": {"set": {}, "unset": [], "dicts": {"b": {"set": {"c": 4}, "unset": []}}}
+    }
+    assert diff["texts"] == {
+        "text": [[text.index("word50"), text.index(" word51"), "changed"]]
+    }
+    assert utils.apply_json_diff(old, diff) == new
+
+
+def test_text_diff():
+    old = "The first line.\n<p>Some text  with spaces</p>"
+    new = "The new line.\n<p>Some text with more spaces</p>\n"
+
+    assert utils.apply_text_diff(old, utils.get_text_diff(old, new)) == new
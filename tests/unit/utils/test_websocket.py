@@ -0,0 +1,138 @@
+import asyncio
+import json
+from typing import List
+
+import jsonschema
+import pytest
+
+from openslides.utils.websocket import (
+    ProtocollAsyncJsonWebsocketConsumer,
+    validate_client_message,
+)
+
+
+class TConsumer(ProtocollAsyncJsonWebsocketConsumer):
+    """
+    Consumer that saves the sent messages instead of sending them.
+    """
+
+    def __init__(self, send_queue_size=100, resync_threshold=100):
+        super().__init__({"type": "websocket"})
+        self.send_queue_size = send_queue_size
+        self.resync_threshold = resync_threshold
+        self.sent: List[str] = []
+
+    async def send(self, text_data):
+        self.sent.append(text_data)
+
+    async def get_autoupdate_message(self, autoupdate):
+        return f"autoupdate {autoupdate.from_change_id}-{autoupdate.to_change_id}"
+
+    async def wait_until_sent(self):
+        while self.send_task is not None:
+            await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_send_json():
+    consumer = TConsumer()
+
+    await consumer.send_json(type="test", content={"a": 1}, in_response="id1")
+    await consumer.wait_until_sent()
+
+    assert [json.loads(message) for message in consumer.sent] == [
+        {"type": "test", "content": {"a": 1}, "in_response": "id1"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_autoupdate_merged():
+    consumer = TConsumer()
+
+    for change_id in range(1, 4):
+        consumer.send_autoupdate(change_id)
+    await consumer.send_json(type="notify", content={})
+    consumer.send_autoupdate(4)
+    await consumer.wait_until_sent()
+
+    assert consumer.sent[0] == "autoupdate 1-3"
+    assert "notify" in consumer.sent[1]
+    assert consumer.sent[2] == "autoupdate 4-4"
+
+
+@pytest.mark.asyncio
+async def test_send_autoupdate_resync():
+    consumer = TConsumer(resync_threshold=2)
+
+    await consumer.send_json(type="notify", content={})
+    for change_id in range(1, 5):
+        consumer.send_autoupdate(change_id)
+    await consumer.wait_until_sent()
+
+    assert len(consumer.sent) == 2
+    assert "notify" in consumer.sent[0]
+    assert json.loads(consumer.sent[1]) == {
+        "type": "resync",
+        "content": {"change_id": 1},
+    }
+
+
+@pytest.mark.asyncio
+async def test_send_autoupdate_error_sends_resync():
+    consumer = TConsumer()
+
+    async def get_autoupdate_message(autoupdate):
+        raise ValueError("broken autoupdate")
+
+    consumer.get_autoupdate_message = get_autoupdate_message  # type: ignore
+    consumer.send_autoupdate(3)
+    await consumer.wait_until_sent()
+
+    assert [json.loads(message) for message in consumer.sent] == [
+        {"type": "resync", "content": {"change_id": 3}}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_json_merged_projector():
+    consumer = TConsumer()
+
+    await consumer.send_json(type="projector", content={1: "old", 2: "data"})
+    await consumer.send_json(type="projector", content={1: "new"})
+    await consumer.wait_until_sent()
+
+    assert [json.loads(message) for message in consumer.sent] == [
+        {"type": "projector", "content": {"1": "new", "2": "data"}}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_json_waits_for_space():
+    consumer = TConsumer(send_queue_size=2)
+
+    for index in range(5):
+        await consumer.send_json(type="notify", content=index)
+        assert len(consumer.send_queue) <= 2
+    await consumer.wait_until_sent()
+
+    assert len(consumer.sent) == 5
+
+
+def test_validate_client_message():
+    validate_client_message(
+        {"type": "getElements", "content": {"change_id": 1}, "id": "test_id"}
+    )
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        [],
+        {"type": "getElements", "content": {}},
+        {"type": "unknown", "content": {}, "id": "test_id"},
+        {"type": "getElements", "content": {"change_id": "a"}, "id": "test_id"},
+    ],
+)
+def test_validate_client_message_invalid(message):
+    with pytest.raises(jsonschema.ValidationError):
+        validate_client_message(message)